@@ -0,0 +1,35 @@
+import hashlib
+from typing import Iterator
+
+import pytest
+
+from benchmarks.synthetic import INDEX_PACKAGES, INDEX_VERSIONS, index_name, make_wheel
+
+
+@pytest.fixture(scope="session")
+def simple_index(tmp_path_factory: pytest.TempPathFactory) -> str:
+    "A PEP 503 simple index on disk, with a few versions of every package, returned as a file:// url"
+    root = tmp_path_factory.mktemp("index")
+    projects = []
+    for i in range(INDEX_PACKAGES):
+        name = index_name(i)
+        project_dir = root / name
+        project_dir.mkdir()
+        requires = [f"{index_name(j)}>=1.0" for j in (2 * i + 1, 2 * i + 2) if j < INDEX_PACKAGES]
+        links = []
+        for version in INDEX_VERSIONS:
+            wheel = make_wheel(project_dir, name, version, requires)
+            sha = hashlib.sha256(wheel.read_bytes()).hexdigest()
+            links.append(f'<a href="{wheel.name}#sha256={sha}">{wheel.name}</a><br/>')
+        (project_dir / "index.html").write_text(f"<!DOCTYPE html><html><body>{''.join(links)}</body></html>\n")
+        projects.append(f'<a href="{name}/">{name}</a><br/>')
+    (root / "index.html").write_text(f"<!DOCTYPE html><html><body>{''.join(projects)}</body></html>\n")
+    return root.as_uri()
+
+
+@pytest.fixture
+def local_index(simple_index: str, monkeypatch: pytest.MonkeyPatch) -> Iterator[str]:
+    "Every pip run in the benchmark only sees the generated index"
+    monkeypatch.setenv("PIP_INDEX_URL", simple_index)
+    monkeypatch.setenv("PIP_DISABLE_PIP_VERSION_CHECK", "1")
+    yield simple_index
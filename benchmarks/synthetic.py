@@ -0,0 +1,88 @@
+"Synthetic projects, wheels and package indexes for the benchmarks"
+import base64
+import hashlib
+import os
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import tomlkit
+
+# packages in the generated index, each depending on the two after it so resolving the first pulls in all of them
+INDEX_PACKAGES = int(os.environ.get("VULCAN_BENCH_INDEX_PACKAGES", "30"))
+INDEX_VERSIONS = ["1.0.0", "1.1.0", "2.0.0"]
+
+
+def index_name(i: int) -> str:
+    return f"bench-pkg{i}"
+
+
+def _record_line(name: str, data: bytes) -> str:
+    digest = base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b"=").decode()
+    return f"{name},sha256={digest},{len(data)}"
+
+
+def make_wheel(directory: Path, name: str, version: str, requires: Sequence[str] = ()) -> Path:
+    "A minimal pure python wheel holding a single module"
+    module = name.replace("-", "_")
+    dist_info = f"{module}-{version}.dist-info"
+    requires_dist = "".join(f"Requires-Dist: {req}\n" for req in requires)
+    files = {
+        f"{module}/__init__.py": f"__version__ = {version!r}\n".encode(),
+        f"{dist_info}/METADATA": f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n{requires_dist}".encode(),
+        f"{dist_info}/WHEEL": b"Wheel-Version: 1.0\nRoot-Is-Purelib: true\nTag: py3-none-any\n",
+    }
+    record = [_record_line(path, data) for path, data in files.items()] + [f"{dist_info}/RECORD,,"]
+    files[f"{dist_info}/RECORD"] = "\n".join(record).encode() + b"\n"
+    wheel = directory / f"{module}-{version}-py3-none-any.whl"
+    with zipfile.ZipFile(wheel, "w") as archive:
+        for path, data in files.items():
+            archive.writestr(path, data)
+    return wheel
+
+
+def write_project(
+    root: Path,
+    modules: int = 1,
+    dependencies: int = 1,
+    extras: int = 0,
+    lock: Optional[Dict[str, List[str]]] = None,
+) -> Path:
+    """
+    A vulcan project in root, with a package of modules files, dependencies on the generated index and extras
+    groups of them, and optionally a lockfile (extra name to pins, the base pins under "")
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    package = root / "benchproject"
+    package.mkdir(exist_ok=True)
+    (package / "__init__.py").write_text("def main():\n    print('ok')\n")
+    for i in range(1, modules):
+        directory = package / f"sub{i // 100}"
+        directory.mkdir(exist_ok=True)
+        (directory / "__init__.py").write_text("")
+        (directory / f"module{i}.py").write_text(f"VALUE = {i}\n")
+
+    names = [index_name(i % INDEX_PACKAGES) if i < INDEX_PACKAGES else f"dep{i}" for i in range(dependencies)]
+    pyproject = tomlkit.document()
+    pyproject["build-system"] = {"requires": ["vulcan-py"], "build-backend": "vulcan.build_backend"}
+    pyproject["project"] = {
+        "name": "benchproject",
+        "version": "1.0.0",
+        "dynamic": ["dependencies", "optional-dependencies"],
+    }
+    vulcan: Dict[str, object] = {
+        # half of them in the table form, so to_pep508 sees both
+        "dependencies": {name: {"version": ">=1.0"} if i % 2 else ">=1.0" for i, name in enumerate(names)},
+        "extras": {f"extra{i}": [f"{name}>=1.0" for name in names[i::extras]] for i in range(extras)},
+        "shiv": [{"bin_name": "benchproject", "entry_point": "benchproject:main"}],
+    }
+    if lock is None:
+        vulcan["no-lock"] = True
+    else:
+        lockfile = tomlkit.document()
+        lockfile["install_requires"] = lock.get("", [])
+        lockfile["extras_require"] = {name: pins for name, pins in lock.items() if name}
+        (root / "vulcan.lock").write_text(tomlkit.dumps(lockfile))
+    pyproject["tool"] = {"vulcan": vulcan}
+    (root / "pyproject.toml").write_text(tomlkit.dumps(pyproject))
+    return root
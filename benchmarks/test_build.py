@@ -0,0 +1,63 @@
+import asyncio
+import itertools
+import os
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from benchmarks.synthetic import INDEX_PACKAGES, index_name, write_project
+from vulcan import Vulcan
+from vulcan.build_backend import build_project
+from vulcan.cli import build_shiv_apps
+
+# modules in the huge project, the small one has a single module
+MODULES = int(os.environ.get("VULCAN_BENCH_MODULES", "5000"))
+SIZES = {"small": 1, "huge": MODULES}
+
+
+def locked_project(root: Path, modules: int) -> Path:
+    # the first index package needs the whole index, so the lock pins all of it
+    pins = sorted(f"{index_name(i)}==2.0.0" for i in range(INDEX_PACKAGES))
+    return write_project(root, modules=modules, dependencies=1, lock={"": pins})
+
+
+@pytest.fixture(scope="module", params=SIZES)
+def project(request: pytest.FixtureRequest, tmp_path_factory: pytest.TempPathFactory) -> Path:
+    return locked_project(tmp_path_factory.mktemp(request.param), SIZES[request.param])
+
+
+@pytest.mark.parametrize("dist_type", ["wheel", "editable", "sdist"])
+def test_build(benchmark: BenchmarkFixture, project: Path, dist_type: str, tmp_path: Path) -> None:
+    outdirs = (tmp_path / f"dist{i}" for i in itertools.count())
+
+    def setup() -> Tuple[Tuple[Path, Path, str], Dict[str, Any]]:
+        return (project, next(outdirs), dist_type), {}
+
+    old = os.getcwd()
+    os.chdir(project)
+    try:
+        dist = benchmark.pedantic(build_project, setup=setup, rounds=3)
+    finally:
+        os.chdir(old)
+    assert dist.exists()
+
+
+@pytest.mark.parametrize("backend", ["shiv", "native"])
+def test_build_shiv_apps(benchmark: BenchmarkFixture, local_index: str, backend: str, tmp_path: Path) -> None:
+    project = locked_project(tmp_path / "project", 1)
+    wheel = build_project(project, tmp_path / "dist", "wheel")
+    config = Vulcan.from_source(project)
+    outdirs = (tmp_path / f"bin{i}" for i in itertools.count())
+
+    def build(outdir: Path) -> None:
+        asyncio.run(build_shiv_apps(str(wheel), config, outdir, use_cache=False, backend=backend))
+
+    def setup() -> Tuple[Tuple[Path], Dict[str, Any]]:
+        outdir = next(outdirs)
+        outdir.mkdir()
+        return (outdir,), {}
+
+    benchmark.pedantic(build, setup=setup, rounds=3)
+    assert (tmp_path / "bin0" / "benchproject").exists()
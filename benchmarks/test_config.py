@@ -0,0 +1,35 @@
+import os
+from pathlib import Path
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from benchmarks.synthetic import write_project
+from vulcan import Vulcan, flatten_reqs, get_requires
+
+# dependencies in the synthetic pyproject.toml and lockfile, spread over EXTRAS extras
+DEPENDENCIES = int(os.environ.get("VULCAN_BENCH_DEPENDENCIES", "2000"))
+EXTRAS = 20
+
+
+@pytest.fixture(scope="module")
+def project(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    pins = [f"dep{i}==1.{i}.0" for i in range(DEPENDENCIES)]
+    lock = {"": pins, **{f"extra{i}": pins[i::EXTRAS] for i in range(EXTRAS)}}
+    return write_project(tmp_path_factory.mktemp("config"), dependencies=DEPENDENCIES, extras=EXTRAS, lock=lock)
+
+
+def test_from_source(benchmark: BenchmarkFixture, project: Path) -> None:
+    config = benchmark(Vulcan.from_source, project)
+    assert config.dependencies is not None and len(config.dependencies) == DEPENDENCIES
+
+
+def test_get_requires(benchmark: BenchmarkFixture, project: Path) -> None:
+    install_requires, extras_require = benchmark(get_requires, project / "vulcan.lock")
+    assert len(install_requires) == DEPENDENCIES and len(extras_require) == EXTRAS
+
+
+def test_flatten_reqs(benchmark: BenchmarkFixture, project: Path) -> None:
+    # to_pep508 for every configured dependency, half of them in the table form
+    configured = Vulcan.from_source(project).configured_dependencies
+    assert len(benchmark(flatten_reqs, configured)) == DEPENDENCIES
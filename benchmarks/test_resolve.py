@@ -0,0 +1,19 @@
+import asyncio
+from typing import Dict, List, Tuple
+
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from benchmarks.synthetic import INDEX_PACKAGES, index_name
+from vulcan.builder import resolve_deps
+
+
+def resolve(install_requires: List[str], extras: Dict[str, List[str]]) -> Tuple[List[str], Dict[str, List[str]]]:
+    return asyncio.run(resolve_deps(install_requires, extras))
+
+
+def test_resolve_deps(benchmark: BenchmarkFixture, local_index: str) -> None:
+    # the first package pulls in the whole index, the extras each a subtree of it
+    extras = {"one": [f"{index_name(1)}<2"], "two": [f"{index_name(2)}>=1.1"]}
+    install_requires, extras_require = benchmark.pedantic(resolve, ([f"{index_name(0)}<2"], extras), rounds=3)
+    assert len(install_requires) == INDEX_PACKAGES
+    assert f"{index_name(0)}==1.1.0" in install_requires and f"{index_name(1)}==1.1.0" in extras_require["one"]
@@ -0,0 +1,63 @@
+import os
+import subprocess
+from pathlib import Path
+from typing import Callable, Iterator, List
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+from setuptools.command.egg_info import FileList
+
+from vulcan.gitfiles import GitFileList, tracked_files
+
+# total number of files in the synthetic checkout, half of them in an untracked virtualenv
+FILES = int(os.environ.get("VULCAN_BENCH_FILES", "100000"))
+
+TEMPLATE = [
+    "graft pkg",
+    "recursive-include data *.json",
+    "global-include *.typed",
+    "global-exclude *.pyc",
+]
+
+
+@pytest.fixture(scope="module")
+def checkout(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    root = tmp_path_factory.mktemp("checkout")
+    layout = [("pkg", ".py", FILES // 10), ("data", ".json", FILES * 2 // 10), ("data", ".csv", FILES * 2 // 10)]
+    layout.append((".venv/lib/site-packages", ".py", FILES - sum(n for _, _, n in layout)))
+    for top, suffix, count in layout:
+        for i in range(count):
+            directory = root / top / f"d{i // 100}"
+            directory.mkdir(parents=True, exist_ok=True)
+            (directory / f"f{i}{suffix}").write_text("")
+    (root / "pkg" / "py.typed").write_text("")
+    (root / ".gitignore").write_text(".venv/\n")
+    subprocess.check_call(["git", "init", "-q", str(root)])
+    subprocess.check_call(["git", "-C", str(root), "add", "."])
+    return root
+
+
+@pytest.fixture
+def in_checkout(checkout: Path) -> Iterator[Path]:
+    old = os.getcwd()
+    os.chdir(checkout)
+    yield checkout
+    os.chdir(old)
+
+
+def apply_template(make_filelist: Callable[[], FileList]) -> List[str]:
+    files = make_filelist()
+    for line in TEMPLATE:
+        files.process_template_line(line)
+    files.sort()
+    files.remove_duplicates()
+    return list(files.files)
+
+
+def test_setuptools_walk(benchmark: BenchmarkFixture, in_checkout: Path) -> None:
+    benchmark(apply_template, FileList)
+
+
+def test_git_index(benchmark: BenchmarkFixture, in_checkout: Path) -> None:
+    files = benchmark(apply_template, lambda: GitFileList(tracked_files(in_checkout)))
+    assert files == apply_template(FileList)
@@ -0,0 +1,94 @@
+import itertools
+import os
+import shutil
+import subprocess
+import sys
+import sysconfig
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from vulcan import ShivOpts
+from vulcan.zipapp import build_zipapp
+
+# pure python stdlib modules, copied as dependencies that have to be compiled on first import
+MODULES = [
+    "argparse",
+    "ast",
+    "calendar",
+    "configparser",
+    "csv",
+    "dataclasses",
+    "difflib",
+    "doctest",
+    "fractions",
+    "ftplib",
+    "gettext",
+    "imaplib",
+    "inspect",
+    "ipaddress",
+    "mailbox",
+    "optparse",
+    "pathlib",
+    "pickletools",
+    "pydoc",
+    "smtplib",
+    "statistics",
+    "tarfile",
+    "textwrap",
+    "zipfile",
+]
+VARIANTS = {
+    "plain": ShivOpts("plain", entry_point="app:main"),
+    "compile-pyc": ShivOpts("compile-pyc", entry_point="app:main", extra_args="--compile-pyc"),
+    "precompile": ShivOpts("precompile", entry_point="app:main", precompile=True, prune=True),
+}
+
+
+@pytest.fixture(scope="module")
+def binaries(tmp_path_factory: pytest.TempPathFactory) -> Dict[str, Path]:
+    sp = tmp_path_factory.mktemp("site-packages")
+    stdlib = Path(sysconfig.get_paths()["stdlib"])
+    (sp / "deps").mkdir()
+    (sp / "deps" / "__init__.py").write_text("")
+    for module in MODULES:
+        shutil.copy(stdlib / f"{module}.py", sp / "deps" / f"{module}.py")
+    imports = "".join(f"    import deps.{module}\n" for module in MODULES)
+    (sp / "app.py").write_text(f"def main():\n{imports}")
+    out = tmp_path_factory.mktemp("binaries")
+    for name, app in VARIANTS.items():
+        build_zipapp(app, [sp], out / name)
+    return {name: out / name for name in VARIANTS}
+
+
+def environ(root: Path, **extra: str) -> Dict[str, str]:
+    # the runs after the first should be able to cache their bytecode like they would anywhere else
+    env = {key: value for key, value in os.environ.items() if key != "PYTHONDONTWRITEBYTECODE"}
+    return {**env, "SHIV_ROOT": str(root), **extra}
+
+
+def start(binary: Path, root: Path) -> None:
+    subprocess.check_call([sys.executable, str(binary)], env=environ(root))
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_cold_start(benchmark: BenchmarkFixture, binaries: Dict[str, Path], variant: str, tmp_path: Path) -> None:
+    roots = (tmp_path / f"root{i}" for i in itertools.count())
+
+    # a new root every round, so every run extracts (and compiles) from scratch
+    def setup() -> Tuple[Tuple[Path, Path], Dict[str, Any]]:
+        return (binaries[variant], next(roots)), {}
+
+    benchmark.pedantic(start, setup=setup, rounds=5)
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_warm_start(benchmark: BenchmarkFixture, binaries: Dict[str, Path], variant: str, tmp_path: Path) -> None:
+    # extracted ahead of time, the way an install step would. For precompile this is already the first run, the
+    # others only get here once they've cached their own bytecode
+    subprocess.check_call(
+        [sys.executable, str(binaries[variant]), "-c", ""], env=environ(tmp_path, SHIV_INTERPRETER="1")
+    )
+    benchmark.pedantic(start, (binaries[variant], tmp_path), rounds=10, warmup_rounds=1)
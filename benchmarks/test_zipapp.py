@@ -0,0 +1,45 @@
+import os
+import shutil
+import subprocess
+import sys
+import sysconfig
+from pathlib import Path
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from vulcan import ShivOpts
+from vulcan.zipapp import build_zipapp
+
+# each copy of the stdlib packages below is about 175 files and 4MB of mostly python source
+COPIES = int(os.environ.get("VULCAN_BENCH_ZIPAPP_COPIES", "4"))
+PACKAGES = ["asyncio", "email", "json", "logging", "unittest", "xml", "http", "concurrent", "importlib", "pydoc_data"]
+APP = ShivOpts("app", entry_point="app:main", interpreter="/usr/bin/env python3")
+
+
+@pytest.fixture(scope="module")
+def site_packages(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    sp = tmp_path_factory.mktemp("site-packages")
+    stdlib = Path(sysconfig.get_paths()["stdlib"])
+    for i in range(COPIES):
+        for package in PACKAGES:
+            shutil.copytree(stdlib / package, sp / f"copy{i}" / package, ignore=shutil.ignore_patterns("__pycache__"))
+        (sp / f"copy{i}" / "__init__.py").write_text("")
+    (sp / "app.py").write_text("def main():\n    print('ok')\n")
+    return sp
+
+
+def shiv_subprocess(site_packages: Path, output: Path) -> None:
+    assert APP.entry_point is not None and APP.interpreter is not None
+    cmd = [sys.executable, "-m", "shiv", "--site-packages", str(site_packages), "-o", str(output)]
+    subprocess.check_call(cmd + ["-e", APP.entry_point, "-p", APP.interpreter])
+
+
+def test_shiv(benchmark: BenchmarkFixture, site_packages: Path, tmp_path: Path) -> None:
+    benchmark.pedantic(shiv_subprocess, (site_packages, tmp_path / "app"), rounds=3)
+    assert subprocess.check_output([sys.executable, str(tmp_path / "app")], text=True) == "ok\n"
+
+
+def test_native(benchmark: BenchmarkFixture, site_packages: Path, tmp_path: Path) -> None:
+    benchmark.pedantic(build_zipapp, (APP, [site_packages], tmp_path / "app"), rounds=3)
+    assert subprocess.check_output([sys.executable, str(tmp_path / "app")], text=True) == "ok\n"
@@ -8,7 +8,17 @@ import pytest
 from pkg_resources import Requirement
 from pkginfo import Wheel
 
-from vulcan.builder import resolve_deps
+from vulcan import VulcanConfigError
+from vulcan.builder import (
+    Resolution,
+    merge_platforms,
+    platform_marker,
+    reachable,
+    resolve,
+    resolve_deps,
+    resolve_platforms,
+    upgrade,
+)
 from vulcan.isolation import get_executable
 
 
@@ -86,3 +96,75 @@ class TestResolveDeps:
             resolved, _ = await resolve_deps([spec], {}, python_version="3.9")
         print(resolved)
         assert "traitlets==5.0.5" in resolved
+
+
+REQUESTS_DEPS = ["certifi>=2017.4.17", "chardet<5,>=3.0.2", "idna<3,>=2.5", "urllib3<1.27,>=1.21.1"]
+OLD_LOCK = Resolution(
+    ["certifi==2020.12.5", "chardet==4.0.0", "idna==2.10", "requests==2.25.1", "urllib3==1.26.0"],
+    {},
+    {"certifi": [], "chardet": [], "idna": [], "requests": REQUESTS_DEPS, "urllib3": []},
+)
+
+
+class TestUpgrade:
+    def test_reachable(self) -> None:
+        graph = {"a": ["b>=1", "c[x]"], "b": [], "c": ["d"], "d": []}
+        assert reachable(graph, ["A", "e; python_version < '3'"], {"python_version": "3.11"}) == {"a", "b", "c", "d"}
+        assert reachable(graph, ["c"], {}) == {"c", "d"}
+
+    @pytest.mark.asyncio
+    async def test_graph_is_locked(self) -> None:
+        with verbose_called_process_error():
+            resolution = await resolve(["requests==2.25.1"], {})
+        assert resolution.graph["requests"] == REQUESTS_DEPS
+        assert set(resolution.graph) == {"certifi", "chardet", "idna", "requests", "urllib3"}
+
+    @pytest.mark.asyncio
+    async def test_upgrade_keeps_other_pins(self) -> None:
+        with verbose_called_process_error():
+            resolution = await upgrade(["requests==2.25.1"], {}, OLD_LOCK, ["urllib3"])
+        urllib3 = next(pin for pin in resolution.install_requires if pin.startswith("urllib3=="))
+        assert urllib3 != "urllib3==1.26.0" and urllib3.startswith("urllib3==1.26.")
+        assert set(resolution.install_requires) - {urllib3} == set(OLD_LOCK.install_requires) - {"urllib3==1.26.0"}
+        assert resolution.graph == OLD_LOCK.graph
+
+    @pytest.mark.asyncio
+    async def test_upgrade_unknown_package(self) -> None:
+        with pytest.raises(VulcanConfigError, match="nope not in the lockfile"):
+            await upgrade(["requests==2.25.1"], {}, OLD_LOCK, ["nope"])
+
+
+class TestPlatforms:
+    def test_platform_marker(self) -> None:
+        assert platform_marker("manylinux2014_aarch64") == 'sys_platform == "linux" and platform_machine == "aarch64"'
+        assert platform_marker("win_amd64") == 'sys_platform == "win32" and platform_machine == "AMD64"'
+        assert platform_marker("macosx_11_0_universal2") == 'sys_platform == "darwin"'
+        with pytest.raises(VulcanConfigError, match="Unknown platform any"):
+            platform_marker("any")
+
+    def test_merge_platforms(self) -> None:
+        linux = Resolution(["a==1", "b==1"], {"x": ["a==1", "b==1", "c==1"]}, {"a": ["b"], "b": [], "c": []})
+        windows = Resolution(["a==1", "b==2"], {"x": ["a==1", "b==2"]}, {"a": ["b", "w"], "b": [], "w": []})
+        merged = merge_platforms({"manylinux2014_x86_64": linux, "win_amd64": windows})
+        on_linux = '(sys_platform == "linux" and platform_machine == "x86_64")'
+        on_windows = '(sys_platform == "win32" and platform_machine == "AMD64")'
+        assert merged.install_requires == ["a==1", f"b==1; {on_linux}", f"b==2; {on_windows}"]
+        assert merged.extras_require == {"x": ["a==1", f"b==1; {on_linux}", f"b==2; {on_windows}", f"c==1; {on_linux}"]}
+        assert merged.graph == {"a": ["b", "w"], "b": [], "c": [], "w": []}
+        assert merged.platforms == ["manylinux2014_x86_64", "win_amd64"]
+
+    @pytest.mark.asyncio
+    async def test_resolve_platforms(self) -> None:
+        with verbose_called_process_error():
+            resolution = await resolve_platforms(
+                ["requests==2.25.1"],
+                {"win": ["colorama==0.4.6; sys_platform == 'win32'"]},
+                ["manylinux2014_aarch64", "win_amd64"],
+                "3.9",
+            )
+        # the same on both platforms, so without markers
+        assert {pin.split("==")[0] for pin in resolution.install_requires} == set(OLD_LOCK.graph)
+        assert 'colorama==0.4.6; (sys_platform == "win32" and platform_machine == "AMD64")' in (
+            resolution.extras_require["win"]
+        )
+        assert resolution.graph["requests"] == REQUESTS_DEPS
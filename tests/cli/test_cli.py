@@ -7,8 +7,10 @@ from typing import Generator
 import pytest
 from click.testing import CliRunner, Result
 
-from vulcan import Vulcan, cli
+from vulcan import ShivOpts, Vulcan, cli, get_platforms
+from vulcan.builder import Resolution, merge_platforms
 from vulcan.isolation import create_venv, get_executable
+from vulcan.staging import pip_install_target, staging_pip_args
 
 
 def versions_exist(*versions: str) -> bool:
@@ -59,6 +61,20 @@ class TestCli:
         config = Vulcan.from_source(test_application)
         assert "switch-config-render" in config.configured_dependencies
 
+    def test_add_several_without_relocking(self, runner: CliRunner, test_application: Path) -> None:
+        lockfile = (test_application / "vulcan.lock").read_text()
+        with cd(test_application), create_venv() as venv:
+            res = successful(
+                runner.invoke(
+                    cli.main, ["add", "idna==2.10", "urllib3>=1.26,<1.27"], env={"VIRTUAL_ENV": venv.context.env_dir}
+                )
+            )
+        assert "not relocking" in res.output
+        assert (test_application / "vulcan.lock").read_text() == lockfile
+        config = Vulcan.from_source(test_application)
+        assert config.configured_dependencies["idna"] == "==2.10"
+        assert config.configured_dependencies["urllib3"] == "<1.27,>=1.26"
+
     def test_develop_works(self, runner: CliRunner, test_application: Path) -> None:
         with create_venv() as venv:
             successful(runner.invoke(cli.main, ["develop"], env={"VIRTUAL_ENV": venv.context.env_dir}))
@@ -104,6 +120,19 @@ class TestCli:
         assert "pytest" not in res.output
         assert "flake8" in res.output
 
+    def test_develop_combined_installs_in_one_pip_run(self, runner: CliRunner, test_application: Path) -> None:
+        with cd(test_application), create_venv() as venv:
+            res = successful(
+                runner.invoke(cli.main, ["develop", "--combined"], env={"VIRTUAL_ENV": venv.context.env_dir})
+            )
+            assert "pytest" in res.output
+            assert "flake8" in res.output
+            assert res.output.count("Successfully installed") == 1
+
+            res = successful(runner.invoke(cli.main, ["develop"], env={"VIRTUAL_ENV": venv.context.env_dir}))
+            assert "already installed" in res.output
+            assert "Successfully installed" not in res.output
+
     def test_develop_fake_errors(self, runner: CliRunner, test_application: Path) -> None:
         with cd(test_application), create_venv() as venv:
             res = runner.invoke(
@@ -114,6 +143,37 @@ class TestCli:
             assert res.exit_code != 0
             assert "No such dev dependency" in res.output
 
+    def test_verify(self, runner: CliRunner, test_application: Path) -> None:
+        with cd(test_application), create_venv() as venv:
+            env = {"VIRTUAL_ENV": venv.context.env_dir}
+            res = runner.invoke(cli.main, ["verify"], env=env)
+            assert res.exit_code == 1
+            assert "requests==2.25.1 is not installed" in res.output
+            pins = Vulcan.from_source(test_application).dependencies or []
+            subprocess.run([venv.context.env_exe, "-m", "pip", "install", "--no-deps", *pins], check=True)
+            res = successful(runner.invoke(cli.main, ["verify"], env=env))
+            assert "The environment matches" in res.output
+
+    def test_upgrade_refuses_platform_lock(self, runner: CliRunner, test_application: Path) -> None:
+        lockfile = test_application / "vulcan.lock"
+        linux = Resolution(["requests==2.25.1", "urllib3==1.26.0"], {}, {"requests": ["urllib3"], "urllib3": []})
+        windows = Resolution(["requests==2.25.1", "urllib3==1.26.5"], {}, {"requests": ["urllib3"], "urllib3": []})
+        cli.write_lockfile(lockfile, merge_platforms({"manylinux2014_x86_64": linux, "win_amd64": windows}))
+        assert get_platforms(lockfile) == ["manylinux2014_x86_64", "win_amd64"]
+        before = lockfile.read_text()
+        with cd(test_application):
+            res = runner.invoke(cli.main, ["lock", "--upgrade", "urllib3"])
+        assert res.exit_code == 2
+        assert "made for other platforms" in res.output
+        assert lockfile.read_text() == before
+
+    async def test_shiv_pip_args_used_when_staging(self, tmp_path: Path, wheel: Path) -> None:
+        app = ShivOpts("app", console_script="p", extra_args=f"-E --no-index --find-links {wheel.parent}")
+        # shiv is left with nothing to install
+        assert cli.shiv_command(app, [tmp_path / "sp"], tmp_path)[-3:] == ["-c", "p", "-E"]
+        await pip_install_target(tmp_path / "sp", ["p==1.0"], pip_args=staging_pip_args([app]))
+        assert (tmp_path / "sp" / "p" / "__init__.py").exists()
+
 
 @contextmanager
 def cd(p: Path) -> Generator[None, None, None]:
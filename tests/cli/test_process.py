@@ -0,0 +1,76 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from vulcan.process import STATS_ENV, ProcessResult, check_output, read_stats, run, run_bounded, summarize
+
+
+def python(code: str) -> List[str]:
+    return [sys.executable, "-c", code]
+
+
+class TestRunBounded:
+    async def test_reported_in_order_with_output(self) -> None:
+        reported: List[ProcessResult] = []
+        commands = [("slow", python("import time; time.sleep(0.5); print('slow')")), ("fast", python("print('fast')"))]
+        results = await run_bounded(commands, jobs=2, report=reported.append)
+        assert [r.name for r in reported] == ["slow", "fast"]
+        assert [(r.status, r.output.strip()) for r in results] == [("ok", "slow"), ("ok", "fast")]
+        assert all(r.seconds > 0 for r in results)
+        if sys.platform != "win32":
+            assert all(r.max_rss for r in results)
+
+    async def test_jobs_limit(self) -> None:
+        start = time.perf_counter()
+        await run_bounded([(str(i), python("import time; time.sleep(0.3)")) for i in range(3)], jobs=1)
+        assert time.perf_counter() - start >= 0.9
+
+    async def test_log_dir(self, tmp_path: Path) -> None:
+        (result,) = await run_bounded([("app", python("print('hello')"))], log_dir=tmp_path / "logs")
+        assert result.log == tmp_path / "logs" / "app.log"
+        assert (tmp_path / "logs" / "app.log").read_text().strip() == "hello"
+
+    async def test_fail_fast(self) -> None:
+        commands = [
+            ("sleeper", python("import time; time.sleep(30)")),
+            ("broken", python("raise SystemExit(3)")),
+            ("never-started", python("print('hi')")),
+        ]
+        start = time.perf_counter()
+        results = await run_bounded(commands, jobs=2)
+        assert time.perf_counter() - start < 20
+        assert [(r.name, r.status) for r in results] == [
+            ("sleeper", "cancelled"),
+            ("broken", "failed"),
+            ("never-started", "cancelled"),
+        ]
+        assert results[1].returncode == 3
+
+
+class TestRun:
+    async def test_stats_recorded(self, monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+        monkeypatch.setenv(STATS_ENV, str(tmp_path / "stats.jsonl"))
+        both = python("import sys; print('out', flush=True); print('err', file=sys.stderr)")
+        assert check_output(both, merge_stderr=True).split() == ["out", "err"]
+        assert run(python("raise SystemExit(2)")).returncode == 2
+        await run_bounded([("app", python("print('hi')"))])
+
+        stats = read_stats(tmp_path / "stats.jsonl")
+        assert [s.returncode for s in stats] == [0, 2, 0]
+        assert [s.output_bytes for s in stats] == [8, None, 3]
+        if sys.platform != "win32":
+            assert all(s.max_rss and s.user is not None for s in stats)
+        totals = summarize(stats)
+        assert totals["processes"] == 3 and totals["failed"] == 1 and totals["output_bytes"] == 11
+
+    def test_check_output_error(self, capfd: pytest.CaptureFixture[str]) -> None:
+        with pytest.raises(subprocess.CalledProcessError) as e:
+            check_output(python("import sys; print('out'); print('oops', file=sys.stderr); sys.exit(1)"))
+        assert e.value.stdout == b"out\n"
+        # like subprocess.check_output, stderr is not captured and reaches the terminal
+        assert e.value.stderr is None
+        assert capfd.readouterr().err == "oops\n"
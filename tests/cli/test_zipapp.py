@@ -0,0 +1,100 @@
+import json
+import os
+import subprocess
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from vulcan import ShivOpts, VulcanConfigError
+from vulcan.staging import pip_install_target
+from vulcan.zipapp import build_zipapp, parse_extra_args
+
+
+@pytest.fixture
+def site_packages(tmp_path: Path) -> Path:
+    sp = tmp_path / "site-packages"
+    (sp / "app").mkdir(parents=True)
+    (sp / "app" / "__init__.py").write_text("import sys\n\ndef main():\n    print('hello', *sys.argv[1:])\n")
+    (sp / "app" / "__pycache__").mkdir()
+    (sp / "app" / "__pycache__" / "__init__.cpython-311.pyc").write_bytes(b"stale")
+    (sp / "app" / "tests").mkdir()
+    (sp / "app" / "tests" / "test_app.py").write_text("")
+    (sp / "app-1.0.dist-info").mkdir()
+    (sp / "app-1.0.dist-info" / "entry_points.txt").write_text("[console_scripts]\napp = app:main\n")
+    return sp
+
+
+def run(executable: Path, *args: str, root: Path) -> str:
+    env = {**os.environ, "SHIV_ROOT": str(root)}
+    return subprocess.check_output([sys.executable, str(executable), *args], env=env, text=True)
+
+
+class TestZipapp:
+    def test_console_script(self, site_packages: Path, tmp_path: Path) -> None:
+        output = tmp_path / "app"
+        build_zipapp(ShivOpts("app", console_script="app", extra_args="-E --reproducible"), [site_packages], output)
+        assert os.access(output, os.X_OK)
+        assert output.read_bytes().startswith(b"#!")
+        with zipfile.ZipFile(output) as archive:
+            assert archive.testzip() is None
+            names = archive.namelist()
+        assert "site-packages/app/__init__.py" in names
+        assert not any(name.endswith(".pyc") for name in names)
+        assert {"_bootstrap/__init__.py", "environment.json", "__main__.py"} <= set(names)
+        assert run(output, "a", "b", root=tmp_path / "root") == "hello a b\n"
+
+    def test_entry_point_and_uncompressed(self, site_packages: Path, tmp_path: Path) -> None:
+        output = tmp_path / "app"
+        build_zipapp(ShivOpts("app", entry_point="app:main", extra_args="--uncompressed"), [site_packages], output)
+        with zipfile.ZipFile(output) as archive:
+            assert {info.compress_type for info in archive.infolist()} == {zipfile.ZIP_STORED}
+        assert run(output, root=tmp_path / "root") == "hello\n"
+
+    def test_reproducible(self, site_packages: Path, tmp_path: Path) -> None:
+        app = ShivOpts("app", console_script="app")
+        build_zipapp(app, [site_packages], tmp_path / "one", jobs=1)
+        os.utime(site_packages / "app" / "__init__.py", (0, 0))
+        build_zipapp(app, [site_packages], tmp_path / "two", jobs=4)
+        assert (tmp_path / "one").read_bytes() == (tmp_path / "two").read_bytes()
+
+    def test_missing_console_script(self, site_packages: Path, tmp_path: Path) -> None:
+        with pytest.raises(VulcanConfigError, match="nope"):
+            build_zipapp(ShivOpts("app", console_script="nope"), [site_packages], tmp_path / "app")
+
+    async def test_precompile(self, site_packages: Path, tmp_path: Path, wheel: Path) -> None:
+        # pip compiles what it installs, with timestamp based pycs
+        staged = tmp_path / "staged"
+        await pip_install_target(staged, [str(wheel)])
+        pyc = f"__pycache__/__init__.{sys.implementation.cache_tag}.pyc"
+        assert (staged / "p" / pyc).exists()
+
+        output = tmp_path / "app"
+        app = ShivOpts("app", entry_point="app:main", precompile=True, extract_root=str(tmp_path / "root"))
+        build_zipapp(app, [staged, site_packages], output)
+        with zipfile.ZipFile(output) as archive:
+            pycs = {name: archive.read(name) for name in archive.namelist() if name.endswith(".pyc")}
+            env = json.loads(archive.read("environment.json"))
+        assert {f"site-packages/p/{pyc}", f"site-packages/app/{pyc}"} <= set(pycs)
+        # all checked hash based, neither pip's nor the stale one from the fixture
+        assert all(int.from_bytes(data[4:8], "little") == 0b11 for data in pycs.values())
+        assert env["root"] == str(tmp_path / "root") and not env["compile_pyc"]
+
+        assert subprocess.check_output([sys.executable, str(output)], text=True) == "hello\n"
+        (extracted,) = (tmp_path / "root").glob(f"app_*/site-packages/app/{pyc}")
+        assert extracted.read_bytes() == pycs[f"site-packages/app/{pyc}"]
+
+    def test_prune(self, site_packages: Path, tmp_path: Path) -> None:
+        for prune in (False, True):
+            output = tmp_path / f"app-{prune}"
+            build_zipapp(ShivOpts("app", entry_point="app:main", prune=prune), [site_packages], output)
+            with zipfile.ZipFile(output) as archive:
+                assert ("site-packages/app/tests/test_app.py" in archive.namelist()) is not prune
+
+    def test_extra_args(self) -> None:
+        opts = parse_extra_args("-E --compile-pyc --root /opt/shiv --no-modify")
+        assert opts.extend_pythonpath and opts.compile_pyc and opts.no_modify and opts.root == "/opt/shiv"
+        assert parse_extra_args("--root=/x").root == "/x"
+        with pytest.raises(VulcanConfigError, match="--preamble"):
+            parse_extra_args("--preamble run.py")
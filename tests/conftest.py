@@ -1,16 +1,20 @@
 import asyncio
+import csv
 import hashlib
+import io
 import os
 import shutil
 import sys
+import zipfile
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Generator, Iterable
+from typing import Callable, Dict, Generator, Iterable, Sequence
 
 import pytest
 from pkginfo import Wheel
 
 import build
+from vulcan.wheelfile import record_hash
 
 
 @pytest.fixture(autouse=True)
@@ -68,6 +72,64 @@ def build_dist(source: Path, dist_type: str, target: Path) -> Path:
     return Path(built)
 
 
+def install_dist(
+    site_packages: Path, name: str, version: str, requires: Sequence[str] = (), files: Sequence[str] = ()
+) -> Path:
+    dist_info = site_packages / f"{name}-{version}.dist-info"
+    dist_info.mkdir(parents=True)
+    requires_dist = "".join(f"Requires-Dist: {req}\n" for req in requires)
+    (dist_info / "METADATA").write_text(f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n{requires_dist}")
+    (dist_info / "RECORD").write_text("".join(f"{f},,\n" for f in files))
+    return dist_info
+
+
+@pytest.fixture
+def install() -> Callable[..., Path]:
+    "Writes the metadata of a distribution into a site-packages directory, as if it was installed"
+    return install_dist
+
+
+WHEEL_FILES = {
+    "p/__init__.py": b"VERSION = '1.0'\n",
+    "p/data.txt": b"data " * 10000,
+    "p/tests/test_p.py": b"def test(): pass\n",
+    "p-1.0.dist-info/METADATA": b"Metadata-Version: 2.1\nName: p\nVersion: 1.0\n",
+    "p-1.0.dist-info/WHEEL": b"Wheel-Version: 1.0\nRoot-Is-Purelib: true\nTag: py3-none-any\n",
+}
+
+
+@pytest.fixture
+def wheel(tmp_path: Path) -> Path:
+    "A wheel of a package p with a correct RECORD, in tmp_path"
+    wheel = tmp_path / "p-1.0-py3-none-any.whl"
+    record = "".join(f"{name},{record_hash(data)},{len(data)}\n" for name, data in WHEEL_FILES.items())
+    with zipfile.ZipFile(wheel, "w", zipfile.ZIP_DEFLATED) as whl:
+        for name, data in WHEEL_FILES.items():
+            info = zipfile.ZipInfo(name, (2020, 1, 2, 3, 4, 6))
+            info.external_attr = (0o100755 if name.endswith("__init__.py") else 0o100644) << 16
+            whl.writestr(info, data, zipfile.ZIP_DEFLATED)
+        whl.writestr("p-1.0.dist-info/RECORD", record + "p-1.0.dist-info/RECORD,,\n")
+    return wheel
+
+
+def check_wheel_record(wheel: Path) -> None:
+    with zipfile.ZipFile(wheel) as whl:
+        rows = list(csv.reader(io.StringIO(whl.read("p-1.0.dist-info/RECORD").decode())))
+        assert {row[0] for row in rows} == {name for name in whl.namelist() if not name.endswith(".jws")}
+        for name, digest, size in rows:
+            if name.endswith("RECORD"):
+                assert digest == size == ""
+            else:
+                data = whl.read(name)
+                assert (digest, size) == (record_hash(data), str(len(data)))
+
+
+@pytest.fixture
+def check_record() -> Callable[[Path], None]:
+    "Asserts that the RECORD of a wheel made by the wheel fixture lists every entry with its hash and size"
+    return check_wheel_record
+
+
 @pytest.fixture(autouse=True)
 def _preserve_lockfile_pyprjoect(test_application: Path) -> Generator[None, None, None]:
     old_content_lock = (test_application / "vulcan.lock").read_text()
@@ -0,0 +1,53 @@
+import os
+import shutil
+import sys
+import tarfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from vulcan import api
+
+
+class TestApi:
+
+    @pytest.fixture
+    def sources(self, test_application: Path, tmp_path: Path) -> List[Path]:
+        sources: List[Path] = []
+        for name in ["one", "two"]:
+            shutil.copytree(test_application, tmp_path / name)
+            sources.append(tmp_path / name)
+        return sources
+
+    def test_build_wheel_returns_path(self, sources: List[Path], tmp_path: Path) -> None:
+        cwd, argv = os.getcwd(), sys.argv[:]
+        whl = api.build_wheel(sources[0], tmp_path / "dist")
+        assert whl == tmp_path / "dist" / "testproject-1.2.3-py3-none-any.whl"
+        assert whl.exists()
+        assert os.getcwd() == cwd
+        assert sys.argv == argv
+
+    def test_build_sdist_returns_path(self, sources: List[Path], tmp_path: Path) -> None:
+        sdist = api.build_sdist(str(sources[0]), str(tmp_path / "dist"))
+        assert sdist == tmp_path / "dist" / "testproject-1.2.3.tar.gz"
+        with tarfile.open(sdist) as tar:
+            assert "testproject-1.2.3/pyproject.toml" in tar.getnames()
+
+    def test_build_editable(self, sources: List[Path], tmp_path: Path) -> None:
+        whl = api.build_editable(sources[0], tmp_path / "dist")
+        with zipfile.ZipFile(whl) as z:
+            pth = z.read("_editable_impl_testproject.pth").decode()
+        assert str(sources[0]) in pth
+
+    def test_concurrent_builds(self, sources: List[Path], tmp_path: Path) -> None:
+        jobs = [(api.build_wheel, source) for source in sources] + [(api.build_sdist, source) for source in sources]
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            futures = [pool.submit(build, source, tmp_path / f"dist-{i}") for i, (build, source) in enumerate(jobs)]
+            artifacts = [f.result() for f in futures]
+        assert all(a.exists() for a in artifacts)
+        for source in sources:
+            assert not (source / "build").exists()
+            assert not list(source.glob("*.egg-info"))
@@ -0,0 +1,90 @@
+from pathlib import Path
+from typing import Dict, List, Set
+
+import pytest
+
+from vulcan import VulcanConfigError
+from vulcan.batch import BatchResult, build_order, discover_projects, local_dependencies, run_batch
+
+
+def make_project(root: Path, name: str, dependencies: str = "") -> Path:
+    project = root / name
+    project.mkdir(parents=True)
+    (project / "pyproject.toml").write_text(
+        f"""\
+[project]
+name = "{name}"
+dynamic = ["dependencies"]
+
+[tool.vulcan.dependencies]
+{dependencies}
+"""
+    )
+    return project
+
+
+def fake_build(project: Path) -> str:
+    if project.name.startswith("broken"):
+        raise RuntimeError("build failed")
+    return f"{project.name}.whl"
+
+
+class TestDiscovery:
+    def test_only_directories_with_pyproject(self, tmp_path: Path) -> None:
+        a = make_project(tmp_path / "libs", "a")
+        b = make_project(tmp_path / "libs", "b")
+        (tmp_path / "libs" / "not-a-project").mkdir()
+        assert discover_projects(tmp_path, ["libs/*"]) == [a, b]
+
+    def test_pyproject_pattern(self, tmp_path: Path) -> None:
+        a = make_project(tmp_path / "libs" / "nested", "a")
+        assert discover_projects(tmp_path, ["libs/**/pyproject.toml"]) == [a]
+
+
+class TestDependencies:
+    def test_by_name(self, tmp_path: Path) -> None:
+        a = make_project(tmp_path, "a", 'B_lib = "~=1.0"')
+        b = make_project(tmp_path, "b-lib")
+        c = make_project(tmp_path, "c", 'requests = ""')
+        assert local_dependencies([a, b, c]) == {a: {b}, b: set(), c: set()}
+
+    def test_by_file_url(self, tmp_path: Path) -> None:
+        b = make_project(tmp_path, "b")
+        a = make_project(tmp_path, "a", f'"other-name @ {b.as_uri()}" = ""')
+        assert local_dependencies([a, b]) == {a: {b}, b: set()}
+
+    def test_build_order(self, tmp_path: Path) -> None:
+        a, b, c = Path("a"), Path("b"), Path("c")
+        assert build_order({a: {c}, b: set(), c: {b}}) == [b, c, a]
+
+    def test_cycle(self) -> None:
+        a, b = Path("a"), Path("b")
+        with pytest.raises(VulcanConfigError, match="cycle"):
+            build_order({a: {b}, b: {a}})
+
+
+class TestRunBatch:
+    def test_results_in_build_order(self) -> None:
+        deps: Dict[Path, Set[Path]] = {Path("a"): {Path("b")}, Path("b"): set(), Path("c"): set()}
+        reported: List[BatchResult] = []
+        results = run_batch(deps, fake_build, jobs=2, report=reported.append)
+        assert [(r.project, r.status, r.output) for r in results] == [
+            (Path("b"), "ok", "b.whl"),
+            (Path("a"), "ok", "a.whl"),
+            (Path("c"), "ok", "c.whl"),
+        ]
+        assert len(reported) == 3
+
+    def test_failure_skips_dependents(self) -> None:
+        deps: Dict[Path, Set[Path]] = {
+            Path("a"): {Path("broken")},
+            Path("d"): {Path("a")},
+            Path("broken"): set(),
+            Path("c"): set(),
+        }
+        results = {r.project.name: r for r in run_batch(deps, fake_build, jobs=2)}
+        assert results["broken"].status == "failed"
+        assert results["broken"].error == "build failed"
+        assert results["a"].status == "skipped"
+        assert results["d"].status == "skipped"
+        assert results["c"].status == "ok"
@@ -1,16 +1,18 @@
 import os
 import shutil
+import tarfile
 import zipfile
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Generator
+from typing import Callable, Generator
 
 import pytest
 from pkg_resources import Requirement
 from pkginfo import Wheel
 
 from vulcan import VulcanConfigError, to_pep508
-from vulcan.build_backend import add_requirement, build_editable, pack, unpack
+from vulcan.build_backend import add_requirement, build_editable, build_sdist, build_wheel, pack, unpack
+from vulcan.wheelfile import record_hash
 
 # it is NOT expected for these to fall out of date, unless you explicitly regenerate the test lockfile
 # in tests/data
@@ -102,6 +104,12 @@ class TestConfig:
             with whl.open("testproject/example.no-hash.py") as nohash:
                 assert nohash.read() == b"Text!"
 
+    def test_post_build_plugin_file_recorded(self, test_built_application_wheel: Path) -> None:
+        with zipfile.ZipFile(test_built_application_wheel) as whl:
+            assert whl.read("testproject/example.post-build.py") == b"Text!"
+            record = whl.read("testproject-1.2.3.dist-info/RECORD").decode()
+        assert f"testproject/example.post-build.py,{record_hash(b'Text!')},5" in record.splitlines()
+
     def test_lockfile_reqs_present(self, test_application: Path, test_built_application_wheel: Path) -> None:
         whl = Wheel(str(test_built_application_wheel))
         assert whl.requires_dist, "No dependencies found"
@@ -133,3 +141,34 @@ class TestEditable:
         old = Wheel(str(test_built_editable_application_wheel)).__dict__
         old.pop("filename")
         assert new == old
+
+
+class TestOutOfTreeBuild:
+
+    @pytest.fixture
+    def source(self, test_application: Path, tmp_path: Path) -> Path:
+        shutil.copytree(test_application, tmp_path / "src")
+        return tmp_path / "src"
+
+    @pytest.mark.parametrize("build_hook", [build_wheel, build_sdist])
+    def test_no_intermediates_in_tree(self, source: Path, tmp_path: Path, build_hook: Callable[..., str]) -> None:
+        scratch = tmp_path / "scratch"
+        with cd(source):
+            artifact = build_hook(str(tmp_path / "dist"), {"build-dir": str(scratch)})
+        assert (tmp_path / "dist" / artifact).exists()
+        assert not (source / "build").exists()
+        assert not list(source.glob("*.egg-info"))
+        assert not list(source.glob("*.tar.gz"))
+        # the per-build directory is cleaned up afterwards
+        assert not list(scratch.iterdir())
+
+    def test_sdist_contains_egg_info(self, source: Path, tmp_path: Path) -> None:
+        with cd(source):
+            artifact = build_sdist(str(tmp_path))
+        with tarfile.open(tmp_path / artifact) as tar:
+            names = tar.getnames()
+            sources = tar.extractfile("testproject-1.2.3/testproject.egg-info/SOURCES.txt")
+            assert sources is not None
+            listed = sources.read().decode().splitlines()
+        assert "testproject-1.2.3/testproject.egg-info/PKG-INFO" in names
+        assert "testproject.egg-info/PKG-INFO" in listed
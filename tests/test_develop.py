@@ -0,0 +1,73 @@
+import json
+from pathlib import Path
+from typing import Callable, List
+
+import pytest
+
+from vulcan import Vulcan, VulcanConfigError
+from vulcan.develop import combined_install_args, find_conflicts, plan_develop, venv_environment
+
+
+def install_editable(install: Callable[..., Path], site_packages: Path, source: Path, requires: List[str]) -> None:
+    files = ["_editable_impl_testproject.pth", "_editable_impl_testproject.py"]
+    dist_info = install(site_packages, "testproject", "1.2.3", [*requires, "editables (~=0.5)"], files)
+    (dist_info / "direct_url.json").write_text(json.dumps({"url": source.as_uri(), "dir_info": {"editable": True}}))
+    (site_packages / files[0]).write_text(f"import _editable_impl_testproject\n{source}")
+    (site_packages / files[1]).write_text(
+        "from editables.redirector import RedirectingFinder as F\nF.install()\n"
+        f"F.map_module('testproject', {str(source / 'testproject' / '__init__.py')!r})"
+    )
+
+
+class TestDevelop:
+    def test_pins_conflicting_across_groups(self) -> None:
+        project = ["requests==2.25.1", "toml==0.10.2"]
+        conflicts = find_conflicts({"project": project, "test": ["requests<2.25", "pytest"], "lint": ["toml"]})
+        assert [str(c) for c in conflicts] == ["requests: project wants requests==2.25.1, test wants requests<2.25"]
+
+    def test_ranges_and_other_pythons_left_alone(self) -> None:
+        sources = {"test": ["pytest>=7", 'tomli==1.0; python_version < "3"'], "lint": ["pytest<7", "tomli==2.0"]}
+        assert find_conflicts(sources) == []
+
+    def test_venv_environment(self, tmp_path: Path) -> None:
+        (tmp_path / "pyvenv.cfg").write_text("home = /usr/bin\nversion_info = 3.8.12.final.0\n")
+        environment = venv_environment(tmp_path)
+        assert environment["python_version"] == "3.8"
+        assert [str(c) for c in find_conflicts({"a": ['x==1; python_version < "3.9"'], "b": ["x==2"]}, environment)]
+
+    def test_combined_install_args(self, test_application: Path) -> None:
+        config = Vulcan.from_source(test_application)
+        args = combined_install_args(config)
+        assert args[:2] == ["-e", f"{test_application}[test1,test2,test3]"]
+        assert sorted(args[2:]) == ["flake8", "pytest"]
+        assert combined_install_args(config, "lint")[2:] == ["flake8"]
+        with pytest.raises(VulcanConfigError, match="No such dev dependency"):
+            combined_install_args(config, "nope")
+
+    def test_plan_develop(self, test_application: Path, tmp_path: Path, install: Callable[..., Path]) -> None:
+        config = Vulcan.from_source(test_application)
+        assert config.dependencies is not None and config.extras is not None
+        site_packages = tmp_path / "lib" / "python3.11" / "site-packages"
+        extras = [f'{req}; extra == "{extra}"' for extra, reqs in config.extras.items() for req in reqs]
+        install_editable(install, site_packages, test_application, config.dependencies + extras)
+        for req in config.dependencies + [req for reqs in config.extras.values() for req in reqs]:
+            name, _, version = req.partition(";")[0].strip().partition("==")
+            if not (site_packages / f"{name}-{version}.dist-info").exists():
+                install(site_packages, name, version)
+        install(site_packages, "pytest", "7.0.0")
+        install(site_packages, "flake8", "5.0.0")
+
+        plan = plan_develop(config, tmp_path)
+        assert plan.up_to_date, plan
+
+        (site_packages / "flake8-5.0.0.dist-info" / "METADATA").unlink()
+        plan = plan_develop(config, tmp_path)
+        assert plan.missing == {"project": [], "test": [], "lint": ["flake8"]}
+        assert not plan.reinstall_project
+        assert plan_develop(config, tmp_path, "test").up_to_date
+
+        (test_application / "testproject" / "__init__.py").rename(test_application / "moved.py")
+        try:
+            assert plan_develop(config, tmp_path).reinstall_project
+        finally:
+            (test_application / "moved.py").rename(test_application / "testproject" / "__init__.py")
@@ -0,0 +1,55 @@
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from vulcan.gitfiles import GitFileList, tracked_files
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+
+
+def git(repo: Path, *args: str) -> str:
+    return subprocess.check_output(["git", "-C", str(repo), *args], encoding="utf-8")
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Path:
+    git(tmp_path, "init", "-q")
+    for name in ["README.md", "pkg/__init__.py", "pkg/data/a.json", "pkg/data/b.txt", "sub/project/mod.py"]:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text(name)
+    git(tmp_path, "add", ".")
+    (tmp_path / "pkg" / "data" / "untracked.json").write_text("")
+    (tmp_path / ".venv" / "lib").mkdir(parents=True)
+    (tmp_path / ".venv" / "lib" / "site.json").write_text("")
+    return tmp_path
+
+
+class TestTrackedFiles:
+    @pytest.mark.parametrize("version", ["2", "3", "4"])
+    def test_same_as_ls_files(self, repo: Path, version: str) -> None:
+        git(repo, "update-index", "--index-version", version)
+        assert tracked_files(repo) == [p.replace("/", os.sep) for p in git(repo, "ls-files").splitlines()]
+
+    def test_project_in_subdirectory(self, repo: Path) -> None:
+        assert tracked_files(repo / "sub" / "project") == ["mod.py"]
+
+    def test_not_in_git(self, tmp_path: Path) -> None:
+        assert tracked_files(tmp_path) is None
+
+
+class TestGitFileList:
+    def test_template_matches_tracked_files_only(self, repo: Path) -> None:
+        files = GitFileList(tracked_files(repo))
+        old = os.getcwd()
+        os.chdir(repo)
+        try:
+            for line in ["include *.md", "graft pkg", "global-include *.json", "global-exclude *.txt"]:
+                files.process_template_line(line)
+        finally:
+            os.chdir(old)
+        # the untracked json files are not picked up by global-include
+        expected = ["README.md", os.path.join("pkg", "__init__.py"), os.path.join("pkg", "data", "a.json")]
+        assert sorted(set(files.files)) == expected
@@ -0,0 +1,110 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+from vulcan.installed import installed_distributions, site_packages, unsatisfied
+from vulcan.isolation import BUILD_ENV_MARKER, BuildEnv, BuildEnvPool, _EnvLock, build_env_key
+
+
+def fake_env(path: Path, **packages: str) -> BuildEnv:
+    env = BuildEnv(path)
+    Path(env.executable).parent.mkdir(parents=True)
+    Path(env.executable).touch()
+    if sys.platform == "win32":
+        lib = path / "Lib" / "site-packages"
+    else:
+        lib = path / "lib" / "python3.99" / "site-packages"
+    for name, version in packages.items():
+        dist_info = lib / f"{name}-{version}.dist-info"
+        dist_info.mkdir(parents=True)
+        (dist_info / "METADATA").write_text(f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n")
+    (path / BUILD_ENV_MARKER).write_text("{}")
+    return env
+
+
+class TestBuildEnvKey:
+    def test_order_and_whitespace_insensitive(self) -> None:
+        assert build_env_key(["setuptools>=40", "wheel"]) == build_env_key(["wheel", "setuptools >= 40"])
+
+    def test_different_requires_different_key(self) -> None:
+        assert build_env_key(["setuptools~=63.0"]) != build_env_key(["setuptools~=65.0"])
+
+
+class TestInstalled:
+    def test_unsatisfied(self, tmp_path: Path) -> None:
+        fake_env(tmp_path, setuptools="63.4.3", Tomlkit="0.11.0")
+        installed = installed_distributions(site_packages(tmp_path))
+        assert unsatisfied(["setuptools~=63.0", "tomlkit>=0.11"], installed) == []
+        assert unsatisfied(["setuptools~=65.0", "editables"], installed) == ["setuptools~=65.0", "editables"]
+
+    def test_markers_respected(self, tmp_path: Path) -> None:
+        fake_env(tmp_path)
+        installed = installed_distributions(site_packages(tmp_path))
+        assert unsatisfied(['editables; python_version < "3"'], installed) == []
+
+
+class TestBuildEnvPool:
+    def test_valid_env(self, tmp_path: Path) -> None:
+        env = fake_env(tmp_path / "env", setuptools="63.4.3")
+        assert env.is_valid(["setuptools"])
+        assert not env.is_valid(["setuptools", "wheel"])
+
+    def test_env_without_marker_is_invalid(self, tmp_path: Path) -> None:
+        env = fake_env(tmp_path / "env", setuptools="63.4.3")
+        (env.path / BUILD_ENV_MARKER).unlink()
+        assert not env.is_valid(["setuptools"])
+
+    def test_evicts_least_recently_used(self, tmp_path: Path) -> None:
+        pool = BuildEnvPool(tmp_path, max_envs=2)
+        for i, name in enumerate(["oldest", "middle", "newest"]):
+            env = fake_env(tmp_path / name)
+            os.utime(env.path / BUILD_ENV_MARKER, (1000 + i, 1000 + i))
+        assert pool.evict() == [tmp_path / "oldest"]
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["middle", "newest"]
+
+    def test_evict_keeps_requested(self, tmp_path: Path) -> None:
+        pool = BuildEnvPool(tmp_path, max_envs=1)
+        for i, name in enumerate(["in-use", "newest"]):
+            env = fake_env(tmp_path / name)
+            os.utime(env.path / BUILD_ENV_MARKER, (1000 + i, 1000 + i))
+        pool.evict(keep="in-use")
+        assert (tmp_path / "in-use").exists()
+
+    @pytest.mark.parametrize("age, evicted", [(0, False), (2 * 60 * 60, True)])
+    def test_evicts_stale_incomplete_envs(self, tmp_path: Path, age: int, evicted: bool) -> None:
+        (tmp_path / "half-built").mkdir()
+        then = (tmp_path / "half-built").stat().st_mtime - age
+        os.utime(tmp_path / "half-built", (then, then))
+        BuildEnvPool(tmp_path).evict()
+        assert (tmp_path / "half-built").exists() != evicted
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="no shared file locks on windows")
+    def test_envs_in_use_are_not_evicted(self, tmp_path: Path) -> None:
+        pool = BuildEnvPool(tmp_path, max_envs=0)
+        requires = ["setuptools"]
+        fake_env(tmp_path / build_env_key(requires), setuptools="63.4.3")
+        fake_env(tmp_path / "unused")
+        with pool.acquire(requires) as env:
+            assert not (tmp_path / "unused").exists()
+            # as another build would, which has no reason to keep this env
+            assert pool.evict() == []
+            assert env.is_valid(requires)
+        assert pool.evict() == [env.path]
+        assert list(tmp_path.iterdir()) == []
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="no shared file locks on windows")
+    def test_env_in_use_is_not_recreated(self, tmp_path: Path) -> None:
+        # complete, but no longer what the build needs
+        env = fake_env(tmp_path / "env")
+        other, lock = _EnvLock(env.path), _EnvLock(env.path)
+        other.acquire()
+        lock.acquire()
+        assert not BuildEnvPool(tmp_path)._claim(env.path, lock)
+        assert (env.path / BUILD_ENV_MARKER).exists()
+        other.release()
+        lock.acquire()
+        assert BuildEnvPool(tmp_path)._claim(env.path, lock)
+        assert list(env.path.iterdir()) == []
+        lock.release()
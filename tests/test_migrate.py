@@ -0,0 +1,58 @@
+import json
+from pathlib import Path
+
+import tomlkit
+
+from vulcan.scripts import setuppy_to_pep621, vulcan_1_to_2
+from vulcan.scripts.migrate import convert_batch
+
+SETUP_PY = """
+from setuptools import setup
+setup(
+    name="{name}",
+    version="1.0",
+    packages=["{name}"],
+    install_requires=["requests>=2"],
+    entry_points={{"console_scripts": ["{name}={name}:main"]}},
+)
+"""
+
+
+def setuptools_project(root: Path, name: str) -> Path:
+    (root / name / name).mkdir(parents=True)
+    (root / name / name / "__init__.py").touch()
+    (root / name / "setup.py").write_text(SETUP_PY.format(name=name))
+    return root / name
+
+
+class TestMigrate:
+    def test_batch_pep621(self, tmp_path: Path) -> None:
+        projects = [setuptools_project(tmp_path, name) for name in ("first", "second")]
+        converted = tmp_path / "converted"
+        converted.mkdir()
+        (converted / "pyproject.toml").write_text('[project]\nname = "converted"\n')
+        report = tmp_path / "report.json"
+        before = {project: sorted(project.rglob("*")) for project in projects}
+
+        results = convert_batch(setuppy_to_pep621.convert_project, [*projects, converted], jobs=2, report=report)
+
+        assert [r.status for r in results] == ["failed", "ok", "ok"]
+        assert "refusing to overwrite" in str(results[0].error)
+        assert all(r.output == "metadata from the build backend" for r in results[1:])
+        pyproject = tomlkit.loads((tmp_path / "first" / "pyproject.toml").read_text())
+        assert pyproject["project"]["name"] == "first"  # type: ignore[index]
+        assert pyproject["project"]["scripts"] == {"first": "first:main"}  # type: ignore[index]
+        assert pyproject["tool"]["vulcan"]["dependencies"] == {"requests": ">=2"}  # type: ignore[index]
+        assert json.loads(report.read_text())["converted"] == 2
+        # nothing left behind by the backend, e.g. an egg-info
+        for project, files in before.items():
+            assert sorted(project.rglob("*")) == sorted([*files, project / "pyproject.toml"])
+
+    def test_vulcan2_in_another_directory(self, tmp_path: Path) -> None:
+        (tmp_path / "pkg").mkdir()
+        (tmp_path / "pkg" / "VERSION").write_text("1.0")
+        (tmp_path / "pyproject.toml").write_text('[project]\nname = "pkg"\n\n[tool.vulcan]\npackages = ["pkg"]\n')
+        vulcan_1_to_2.convert_project(tmp_path)
+        pyproject = tomlkit.loads((tmp_path / "pyproject.toml").read_text())
+        assert pyproject["tool"]["setuptools"]["dynamic"]["version"]["file"] == "pkg/VERSION"  # type: ignore[index]
+        assert pyproject["project"]["dynamic"] == ["version"]  # type: ignore[index]
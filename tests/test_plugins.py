@@ -0,0 +1,168 @@
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import pytest
+
+from vulcan import Vulcan
+from vulcan.plugins import Plugin, PluginRunner, overlaps, plugin_dependencies
+from vulcan.wheelfile import WheelRewriter
+
+
+class FakeEntryPoint:
+    def __init__(self, name: str, func: Callable[..., None], version: str = "1.0") -> None:
+        self.name = name
+        self.func = func
+        self.dist = type("Dist", (), {"version": version})()
+
+    def load(self) -> Callable[..., None]:
+        return self.func
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class FakeRunner(PluginRunner):
+    entry_points: List[FakeEntryPoint] = []
+    post_entry_points: List[FakeEntryPoint] = []
+
+    def get_pre_entrypoints(self) -> List[FakeEntryPoint]:  # type: ignore[override]
+        return self.entry_points
+
+    def get_post_entrypoints(self) -> List[FakeEntryPoint]:  # type: ignore[override]
+        return self.post_entry_points
+
+
+def project(root: Path, plugins: Dict[str, Dict[str, Any]]) -> Vulcan:
+    tables = "".join(
+        f"[tool.vulcan.plugin.{name}]\n" + "".join(f"{key} = {value!r}\n" for key, value in config.items())
+        for name, config in plugins.items()
+    )
+    (root / "pyproject.toml").write_text(
+        f'[project]\nname = "p"\n\n[tool.vulcan]\nno-lock = true\nplugins = {list(plugins)!r}\n\n{tables}'
+    )
+    return Vulcan.from_source(root)
+
+
+def plugin(name: str, inputs: List[str], outputs: List[str]) -> Plugin:
+    return Plugin(name, None, None, inputs, outputs)  # type: ignore[arg-type]
+
+
+class TestPlugins:
+    def test_overlaps(self) -> None:
+        assert overlaps(["proto/**/*.proto"], ["proto/gen/x.py"])
+        assert overlaps(["src/gen"], ["src/gen/*.py"])
+        assert not overlaps(["proto/*.proto"], ["src/gen"])
+        assert overlaps(["*.txt"], ["anything"])
+
+    def test_dependencies(self) -> None:
+        plugins = [
+            plugin("proto", ["proto/*.proto"], ["pkg/proto"]),
+            plugin("schema", ["schema/*.json"], ["pkg/schema"]),
+            plugin("index", ["pkg/proto/*.py"], ["pkg/index.py"]),
+            plugin("opaque", [], []),
+            plugin("after", ["a"], ["b"]),
+        ]
+        assert plugin_dependencies(plugins) == {
+            "proto": set(),
+            "schema": set(),
+            "index": {"proto"},
+            "opaque": {"proto", "schema", "index"},
+            "after": {"opaque"},
+        }
+
+    def test_independent_plugins_run_at_once(self, tmp_path: Path) -> None:
+        running: List[str] = []
+        lock = threading.Lock()
+        overlapped = threading.Event()
+
+        def slow(name: str) -> Callable[[Optional[Dict[str, Any]]], None]:
+            def run(config: Optional[Dict[str, Any]]) -> None:
+                with lock:
+                    running.append(name)
+                    if len(running) > 1:
+                        overlapped.set()
+                overlapped.wait(2)
+                with lock:
+                    running.remove(name)
+
+            return run
+
+        declared = {name: {"inputs": [name], "outputs": [f"out/{name}"]} for name in "ab"}
+        config = project(tmp_path, declared)
+        runner = FakeRunner(config, use_cache=False)
+        runner.entry_points = [FakeEntryPoint("a", slow("a")), FakeEntryPoint("b", slow("b"))]
+        start = time.perf_counter()
+        runner.run_pre_build()
+        assert overlapped.is_set() and time.perf_counter() - start < 2
+
+    def test_skipped_when_unchanged(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        monkeypatch.setenv("VULCAN_CACHE_DIR", str(tmp_path / "cache"))
+        source = tmp_path / "project"
+        (source / "proto").mkdir(parents=True)
+        (source / "proto" / "a.proto").write_text("one")
+        runs: List[int] = []
+
+        def generate(config: Optional[Dict[str, Any]]) -> None:
+            runs.append(1)
+            (source / "gen").mkdir(exist_ok=True)
+            (source / "gen" / "a.py").write_text((source / "proto" / "a.proto").read_text())
+
+        config = project(source, {"gen": {"inputs": ["proto/*.proto"], "outputs": ["gen"]}})
+
+        def build(version: str = "1.0") -> None:
+            runner = FakeRunner(config)
+            runner.entry_points = [FakeEntryPoint("gen", generate, version)]
+            runner.run_pre_build()
+
+        build()
+        build()
+        assert len(runs) == 1
+        assert "Skipping pre_build plugin gen" in capsys.readouterr().out
+        (source / "proto" / "a.proto").write_text("two")
+        build()
+        assert len(runs) == 2
+        (source / "gen" / "a.py").unlink()
+        build()
+        assert len(runs) == 3
+        build("2.0")
+        assert len(runs) == 4
+
+    def test_failure_raised(self, tmp_path: Path) -> None:
+        def broken(config: Optional[Dict[str, Any]]) -> None:
+            raise RuntimeError("plugin broke")
+
+        ran: List[str] = []
+        config = project(tmp_path, {"broken": {}, "later": {}})
+        runner = FakeRunner(config, use_cache=False)
+        runner.entry_points = [FakeEntryPoint("broken", broken), FakeEntryPoint("later", lambda c: ran.append("later"))]
+        with pytest.raises(RuntimeError, match="plugin broke"):
+            runner.run_pre_build()
+        assert ran == []
+
+    def test_post_build_plugins_share_one_rewrite(
+        self, tmp_path: Path, wheel: Path, check_record: Callable[[Path], None]
+    ) -> None:
+        def generate(config: Optional[Dict[str, Any]], rewriter: WheelRewriter) -> None:
+            assert config == {"target": "p/_build.py"}
+            rewriter.write(config["target"], "BUILT = True\n")
+
+        def strip_tests(config: Optional[Dict[str, Any]], rewriter: WheelRewriter) -> None:
+            # sees what the plugin before it wrote
+            assert rewriter.read("p/_build.py") == b"BUILT = True\n"
+            for name in rewriter.names():
+                if name.startswith("p/tests/"):
+                    rewriter.drop(name)
+
+        config = project(tmp_path, {"generate": {"target": "p/_build.py"}, "strip": {}})
+        runner = FakeRunner(config)
+        runner.post_entry_points = [FakeEntryPoint("strip", strip_tests), FakeEntryPoint("generate", generate)]
+        runner.run_post_build(wheel)
+        check_record(wheel)
+        with zipfile.ZipFile(wheel) as whl:
+            assert "p/_build.py" in whl.namelist()
+            assert not [name for name in whl.namelist() if name.startswith("p/tests/")]
@@ -0,0 +1,40 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from vulcan.profiling import COMBINED, PROFILE_ENV, combine, profiled, python_command
+
+
+class TestProfiling:
+    def test_off_by_default(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.delenv(PROFILE_ENV, raising=False)
+        assert python_command([sys.executable, "-m", "pip", "list"]) == [sys.executable, "-m", "pip", "list"]
+
+    def test_python_command(self, monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+        monkeypatch.setenv(PROFILE_ENV, str(tmp_path))
+        assert python_command(["wheel", "pack", "dir"]) == ["wheel", "pack", "dir"]
+        assert python_command(["python", "script.py", "-m"]) == ["python", "script.py", "-m"]
+        cmd = python_command(["python", "-Im", "pip", "install", "x"])
+        assert cmd[:3] == ["python", "-I", "-c"] and cmd[-3:] == ["pip", "install", "x"]
+
+    def test_exit_code_and_output(self, monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+        monkeypatch.setenv(PROFILE_ENV, str(tmp_path))
+        (tmp_path / "failing.py").write_text("import sys\nprint(sys.argv[1:])\nsys.exit(3)\n")
+        proc = subprocess.run(
+            python_command([sys.executable, "-m", "failing", "a"]), cwd=tmp_path, capture_output=True, text=True
+        )
+        assert proc.returncode == 3 and proc.stdout == "['a']\n"
+        assert len(list(tmp_path.glob("failing-*.prof"))) == 1
+
+    def test_combine(self, monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+        assert combine(tmp_path) is None
+        monkeypatch.setenv(PROFILE_ENV, str(tmp_path))
+        for _ in range(2):
+            with profiled("block"):
+                sorted(range(1000))
+        (tmp_path / "broken.prof").write_text("")
+        report = combine(tmp_path)
+        assert report is not None and (tmp_path / COMBINED).exists()
+        assert report.read_text().count("block-") >= 2
@@ -0,0 +1,43 @@
+import zipfile
+from pathlib import Path
+from typing import Tuple
+
+from vulcan import ShivOpts
+from vulcan.shivcache import app_pins, cache_key, is_up_to_date, wheel_digest, write_manifest
+
+
+def make_wheel(path: Path, date_time: Tuple[int, int, int, int, int, int], content: bytes = b"print('hi')") -> Path:
+    with zipfile.ZipFile(path, "w") as whl:
+        whl.writestr(zipfile.ZipInfo("pkg/__init__.py", date_time), content)
+        whl.writestr(zipfile.ZipInfo("pkg-1.0.dist-info/METADATA", date_time), b"Name: pkg\n")
+    return path
+
+
+class TestShivCache:
+    def test_wheel_digest_ignores_timestamps(self, tmp_path: Path) -> None:
+        a = make_wheel(tmp_path / "a.whl", (2020, 1, 1, 0, 0, 0))
+        b = make_wheel(tmp_path / "b.whl", (2023, 6, 1, 12, 0, 0))
+        c = make_wheel(tmp_path / "c.whl", (2020, 1, 1, 0, 0, 0), b"print('bye')")
+        assert wheel_digest(a) == wheel_digest(b)
+        assert wheel_digest(a) != wheel_digest(c)
+
+    def test_app_pins_only_include_own_extras(self) -> None:
+        extras = {"one": ["a==1", "b==1"], "two": ["a==1", "c==1"]}
+        assert app_pins(ShivOpts("app", with_extras=["two"]), ["a==1"], extras) == ["a==1", "c==1"]
+        assert app_pins(ShivOpts("app"), ["a==1"], extras) == ["a==1"]
+
+    def test_up_to_date(self, tmp_path: Path) -> None:
+        app = ShivOpts("app", console_script="app")
+        key = cache_key(app, "digest", ["a==1"])
+        output = tmp_path / "app"
+        assert not is_up_to_date(output, key)
+
+        output.write_bytes(b"zipapp")
+        write_manifest(output, key)
+        assert is_up_to_date(output, key)
+        assert not is_up_to_date(output, cache_key(app, "digest", ["a==2"]))
+        assert not is_up_to_date(output, cache_key(app, "digest", ["a==1"], "native"))
+        assert not is_up_to_date(output, cache_key(ShivOpts("app", console_script="other"), "digest", ["a==1"]))
+
+        output.write_bytes(b"modified")
+        assert not is_up_to_date(output, key)
@@ -0,0 +1,44 @@
+import pytest
+
+from vulcan import ShivOpts, VulcanConfigError
+from vulcan.staging import extras_delta, extras_key, split_pip_args, staging_pip_args
+
+BASE = ["certifi==2020.12.5", "requests==2.25.1"]
+EXTRAS = {
+    "test1": ["build==0.1.0", "certifi==2020.12.5", "requests==2.25.1", "toml==0.10.2"],
+    "test2": ["certifi==2020.12.5", "requests==2.25.1", "setuptools==53.0.0", "toml==0.10.2"],
+}
+
+
+class TestStaging:
+    def test_extras_key_ignores_order_and_duplicates(self) -> None:
+        assert extras_key(ShivOpts("a", with_extras=["test2", "test1", "test2"])) == ("test1", "test2")
+        assert extras_key(ShivOpts("a")) == ()
+
+    def test_delta_is_only_what_extras_add(self) -> None:
+        assert extras_delta(BASE, EXTRAS, ("test1",)) == ["build==0.1.0", "toml==0.10.2"]
+        assert extras_delta(BASE, EXTRAS, ("test1", "test2")) == [
+            "build==0.1.0",
+            "setuptools==53.0.0",
+            "toml==0.10.2",
+        ]
+        assert extras_delta(BASE, EXTRAS, ()) == []
+
+    def test_unknown_extra(self) -> None:
+        with pytest.raises(VulcanConfigError, match="test3"):
+            extras_delta(BASE, EXTRAS, ("test3",))
+
+    def test_delta_by_name(self) -> None:
+        extras = {"old": ["Requests==2.24.0", "toml==0.10.2"]}
+        assert extras_delta(BASE, extras, ("old",)) == ["toml==0.10.2"]
+
+    def test_pip_args(self) -> None:
+        pip, rest = split_pip_args("-E --pre --index-url https://mirror/simple --compile-pyc --find-links=/wheels")
+        assert pip == ["--pre", "--index-url", "https://mirror/simple", "--find-links=/wheels"]
+        assert rest == ["-E", "--compile-pyc"]
+        apps = [ShivOpts("a", extra_args="--pre -E"), ShivOpts("b", extra_args="--pre")]
+        assert staging_pip_args(apps) == ["--pre"]
+        with pytest.raises(VulcanConfigError, match="same pip options"):
+            staging_pip_args([*apps, ShivOpts("c")])
+        with pytest.raises(VulcanConfigError, match="needs a value"):
+            split_pip_args("--extra-index-url")
@@ -0,0 +1,44 @@
+from pathlib import Path
+from typing import Callable
+
+from packaging.utils import canonicalize_name
+
+from vulcan import Vulcan
+from vulcan.sync import PROTECTED, constraints, plan_sync
+
+
+def pin_name(pin: str) -> str:
+    return canonicalize_name(pin.partition("==")[0])
+
+
+class TestSync:
+    def test_plan_sync(self, test_application: Path, tmp_path: Path, install: Callable[..., Path]) -> None:
+        config = Vulcan.from_source(test_application)
+        assert config.dependencies is not None and config.extras is not None
+        site_packages = tmp_path / "lib" / "python3.11" / "site-packages"
+        for pin in {pin.partition(";")[0].strip() for pins in config.extras.values() for pin in pins}:
+            install(site_packages, *pin.split("=="))
+        install(site_packages, "pytest", "7.0.0", ["pluggy<2", 'colorama; sys_platform == "win32"'])
+        install(site_packages, "pluggy", "1.0.0")
+        install(site_packages, "six", "1.16.0")
+        install(site_packages, "pip", "23.0")
+
+        plan = plan_sync(config, tmp_path)
+        assert plan.remove == ["six"]
+        assert plan.install == ["flake8"]
+        assert "pytest" in plan.satisfied
+
+        base = {pin_name(pin) for pin in config.dependencies}
+        extras_only = {pin_name(pin) for pins in config.extras.values() for pin in pins} - base - PROTECTED
+        plan = plan_sync(config, tmp_path, extras=[], dev=["test"])
+        assert {canonicalize_name(name) for name in plan.remove} == {"six", *extras_only}
+        assert plan.install == []
+
+        plan = plan_sync(config, tmp_path, dev=[])
+        assert {canonicalize_name(name) for name in plan.remove} == {"six", "pytest", "pluggy"}
+
+    def test_constraints_drop_extras(self) -> None:
+        assert constraints(['build[virtualenv]==0.8.0; python_version >= "3"', "toml==0.10.2"]) == [
+            'build==0.8.0; python_version >= "3"',
+            "toml==0.10.2",
+        ]
@@ -0,0 +1,54 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from vulcan.build_backend import build_editable
+from vulcan.trace import TRACE_ENV, span
+
+
+def records(path: Path) -> List[Dict[str, Any]]:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+class TestTrace:
+    def test_off_by_default(self, monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+        monkeypatch.delenv(TRACE_ENV, raising=False)
+        with span("nothing"):
+            pass
+        assert list(tmp_path.iterdir()) == []
+
+    def test_nested_spans(self, monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+        trace = tmp_path / "trace.jsonl"
+        monkeypatch.setenv(TRACE_ENV, str(trace))
+        with span("outer", project="x"):
+            with span("inner"):
+                pass
+            with pytest.raises(ValueError), span("failing"):
+                raise ValueError()
+        inner, failing, outer = records(trace)
+        assert (inner["name"], inner["parent"], inner["ok"]) == ("inner", "outer", True)
+        assert (failing["name"], failing["ok"]) == ("failing", False)
+        assert outer["parent"] is None and outer["project"] == "x"
+        assert inner["trace"] == failing["trace"] == outer["trace"]
+        assert outer["seconds"] >= inner["seconds"]
+
+    def test_build_hook_phases(
+        self, monkeypatch: pytest.MonkeyPatch, test_application: Path, tmp_path: Path
+    ) -> None:
+        trace = tmp_path / "trace.jsonl"
+        monkeypatch.setenv(TRACE_ENV, str(trace))
+        old = os.getcwd()
+        os.chdir(test_application)
+        try:
+            build_editable(str(tmp_path / "dist"))
+        finally:
+            os.chdir(old)
+        by_name = {record["name"]: record for record in records(trace)}
+        assert {"build_editable", "config", "lockfile", "plugin", "setup", "editable"} <= set(by_name)
+        assert by_name["plugin"]["plugin"] == "example_plugin"
+        assert by_name["lockfile"]["parent"] == "config"
+        assert by_name["build_editable"]["source"] == str(test_application)
+        assert len({record["trace"] for record in by_name.values()}) == 1
@@ -0,0 +1,48 @@
+import sys
+from importlib.metadata import version
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+import tomlkit
+
+from vulcan import VulcanConfigError
+from vulcan.verify import Mismatch, main, verify
+
+
+def lockfile(path: Path, install_requires: List[str], extras: Dict[str, List[str]]) -> Path:
+    path.write_text(tomlkit.dumps({"install_requires": install_requires, "extras_require": extras}))
+    return path
+
+
+class TestVerify:
+    def test_matching_environment(self, tmp_path: Path) -> None:
+        lock = lockfile(
+            tmp_path / "vulcan.lock",
+            [f"packaging=={version('packaging')}", 'not-on-this-python==1.0; python_version < "3"'],
+            {"toml": [f"tomlkit=={version('tomlkit')}"]},
+        )
+        assert verify(lock, ["toml"]) == []
+        assert main([str(lock), "--extra", "toml"]) == 0
+
+    def test_mismatches(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+        lock = lockfile(
+            tmp_path / "vulcan.lock",
+            [f"packaging=={version('packaging')}", "tomlkit==0.0.1"],
+            {"missing": ["definitely-not-installed==1.0"]},
+        )
+        assert verify(lock) == [Mismatch("tomlkit==0.0.1", version("tomlkit"))]
+        assert verify(lock, ["missing"])[-1] == Mismatch("definitely-not-installed==1.0", None)
+        assert main([str(lock), "-e", "missing"]) == 1
+        assert "definitely-not-installed==1.0 is not installed" in capsys.readouterr().err
+
+    def test_other_paths(self, tmp_path: Path) -> None:
+        lock = lockfile(tmp_path / "vulcan.lock", [f"packaging=={version('packaging')}"], {})
+        # nothing is installed in an empty directory
+        assert verify(lock, paths=[tmp_path]) == [Mismatch(f"packaging=={version('packaging')}", None)]
+        assert verify(lock, paths=[Path(p) for p in sys.path]) == []
+
+    def test_unknown_extra(self, tmp_path: Path) -> None:
+        lock = lockfile(tmp_path / "vulcan.lock", [], {})
+        with pytest.raises(VulcanConfigError, match="No such extra nope"):
+            verify(lock, ["nope"])
@@ -0,0 +1,92 @@
+import io
+import os
+import zipfile
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from vulcan.wheelfile import WheelRewriter
+
+
+def raw_data(wheel: Path, name: str) -> bytes:
+    with zipfile.ZipFile(wheel) as whl, open(wheel, "rb") as f:
+        info = whl.getinfo(name)
+        f.seek(info.header_offset + 26)
+        skip = int.from_bytes(f.read(2), "little") + int.from_bytes(f.read(2), "little")
+        f.seek(skip, io.SEEK_CUR)
+        return f.read(info.compress_size)
+
+
+class TestWheelRewriter:
+    def test_add_replace_drop(self, wheel: Path, check_record: Callable[[Path], None]) -> None:
+        untouched = raw_data(wheel, "p/data.txt")
+        with WheelRewriter(wheel) as rewriter:
+            assert rewriter.dist_info == "p-1.0.dist-info"
+            rewriter.write("p/_build.py", "BUILT = True\n")
+            rewriter.write("p/__init__.py", b"VERSION = '1.0+local'\n")
+            rewriter.drop("p/tests/test_p.py")
+            assert rewriter.read("p/_build.py") == b"BUILT = True\n"
+            assert "p/tests/test_p.py" not in rewriter
+        check_record(wheel)
+        with zipfile.ZipFile(wheel) as whl:
+            assert whl.namelist() == [
+                "p/__init__.py",
+                "p/data.txt",
+                "p/_build.py",
+                "p-1.0.dist-info/METADATA",
+                "p-1.0.dist-info/WHEEL",
+                "p-1.0.dist-info/RECORD",
+            ]
+            assert whl.read("p/__init__.py") == b"VERSION = '1.0+local'\n"
+            assert whl.read("p/data.txt") == b"data " * 10000
+            assert whl.getinfo("p/data.txt").date_time == (2020, 1, 2, 3, 4, 6)
+            assert whl.testzip() is None
+        # copied without being inflated and deflated again
+        assert raw_data(wheel, "p/data.txt") == untouched
+
+    def test_unchanged_wheel_is_not_written(self, wheel: Path) -> None:
+        before = wheel.stat().st_mtime_ns, wheel.stat().st_ino
+        with WheelRewriter(wheel) as rewriter:
+            rewriter.read("p/__init__.py")
+        assert (wheel.stat().st_mtime_ns, wheel.stat().st_ino) == before
+
+    def test_error_leaves_wheel_alone(self, tmp_path: Path, wheel: Path) -> None:
+        before = wheel.read_bytes()
+        with pytest.raises(RuntimeError), WheelRewriter(wheel) as rewriter:
+            rewriter.write("p/extra.py", "")
+            raise RuntimeError("plugin failed")
+        assert wheel.read_bytes() == before
+        assert list(tmp_path.iterdir()) == [wheel]
+
+    def test_record_is_generated(self, wheel: Path, check_record: Callable[[Path], None]) -> None:
+        with WheelRewriter(wheel) as rewriter:
+            with pytest.raises(ValueError, match="generated"):
+                rewriter.write("p-1.0.dist-info/RECORD", "")
+            with pytest.raises(ValueError, match="inside the wheel"):
+                rewriter.write("../escape.py", "")
+            with pytest.raises(KeyError):
+                rewriter.drop("p/missing.py")
+            # a signature of RECORD is not listed in it
+            rewriter.write("p-1.0.dist-info/RECORD.jws", rewriter.record())
+        check_record(rewriter.path)
+
+    def test_closed_while_replaced(self, wheel: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        rewriter = WheelRewriter(wheel)
+        replace = os.replace
+
+        def closed_replace(src: Path, dst: Path) -> None:
+            # as windows requires
+            assert rewriter._raw.closed and rewriter._zip.fp is None
+            replace(src, dst)
+
+        monkeypatch.setattr(os, "replace", closed_replace)
+        with rewriter:
+            rewriter.write("p/_build.py", "BUILT = True\n")
+            rewriter.commit()
+            # carries on from the written wheel
+            assert not rewriter.changed
+            assert rewriter.read("p/_build.py") == b"BUILT = True\n"
+            rewriter.drop("p/_build.py")
+        with zipfile.ZipFile(wheel) as whl:
+            assert "p/_build.py" not in whl.namelist()
@@ -0,0 +1,28 @@
+from pathlib import Path
+
+from packaging.tags import Tag
+
+from vulcan.wheelhouse import locked_pins, missing_pins
+
+TAGS = [Tag("py3", "none", "any"), Tag("cp311", "cp311", "manylinux_2_17_x86_64")]
+
+
+class TestWheelhouse:
+    def test_locked_pins_deduplicated(self) -> None:
+        pins = locked_pins(["requests==2.25.1"], {"a": ["requests==2.25.1", "toml==0.10.2"], "b": ["toml==0.10.2"]})
+        assert pins == ["requests==2.25.1", "toml==0.10.2"]
+
+    def test_missing_pins(self, tmp_path: Path) -> None:
+        for whl in [
+            "requests-2.25.1-py2.py3-none-any.whl",
+            "Typing_Extensions-3.7.4.3-py3-none-any.whl",
+            "toml-0.10.1-py2.py3-none-any.whl",  # wrong version
+            "lxml-4.9.0-cp311-cp311-win_amd64.whl",  # wrong platform
+            "not-a-wheel.whl",
+        ]:
+            (tmp_path / whl).touch()
+        pins = ["requests==2.25.1", "typing-extensions==3.7.4.3", "toml==0.10.2", "lxml==4.9.0"]
+        assert missing_pins(pins, tmp_path, TAGS) == ["toml==0.10.2", "lxml==4.9.0"]
+
+    def test_pins_for_other_environments_are_skipped(self, tmp_path: Path) -> None:
+        assert missing_pins(['pywin32==305; python_version < "3"'], tmp_path, TAGS) == []
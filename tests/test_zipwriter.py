@@ -0,0 +1,19 @@
+import io
+import zipfile
+
+from vulcan.zipwriter import ZipWriter, compress
+
+
+class TestZipWriter:
+    def test_zip64_entry_count(self) -> None:
+        out = io.BytesIO(b"#!python\n")
+        out.seek(0, io.SEEK_END)
+        writer = ZipWriter(out, 315532800)
+        for i in range(0x10001):
+            writer.write(compress(f"{i}.txt", b"x", 0o100644, compressed=i % 2 == 0))
+        writer.write(compress("ünïcode.txt", b"data" * 100, 0o100644, compressed=True))
+        writer.close()
+        with zipfile.ZipFile(out) as archive:
+            assert len(archive.infolist()) == 0x10002
+            assert archive.read("ünïcode.txt") == b"data" * 100
+            assert archive.read("65535.txt") == b"x"
@@ -1,5 +1,6 @@
 from __future__ import annotations
 import distutils.core
+import os
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List, Mapping, Optional, Tuple, Union, cast
@@ -10,6 +11,8 @@ import tomlkit.container
 import tomlkit.items
 from setuptools import setup
 
+from vulcan.trace import span
+
 if sys.version_info >= (3, 8):
     from typing import TypedDict
 else:
@@ -32,6 +35,15 @@ def flatten_reqs(versions: VersionSpecs) -> List[str]:
     return [to_pep508(lib, req) for lib, req in versions.items()]
 
 
+def cache_dir() -> Path:
+    configured = os.environ.get("VULCAN_CACHE_DIR")
+    if configured:
+        return Path(configured)
+    if sys.platform == "win32":
+        return Path(os.environ.get("LOCALAPPDATA", Path.home() / "AppData" / "Local"), "vulcan")
+    return Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"), "vulcan")
+
+
 @dataclass
 class ShivOpts:
     bin_name: str
@@ -40,6 +52,10 @@ class ShivOpts:
     interpreter: Optional[str] = None
     with_extras: Optional[List[str]] = None
     extra_args: str = ""
+    # startup options, only supported by the native backend except for extract_root
+    precompile: bool = False
+    prune: bool = False
+    extract_root: Optional[str] = None
 
 
 def list_or_none(val: Any) -> Optional[List[str]]:
@@ -68,6 +84,7 @@ class Vulcan:
     dynamic: Optional[List[str]]
     no_lock: bool = False
     python_lock_with: Optional[str] = None
+    sdist_file_lister: str = "setuptools"
 
     @classmethod
     def from_source(cls, source_path: Path, fail_on_missing_lock: bool = True) -> "Vulcan":
@@ -83,7 +100,8 @@ class Vulcan:
         extras_require: Optional[Dict[str, List[str]]] = {}
         if not no_lock:
             try:
-                install_requires, extras_require = get_requires(lockfile)
+                with span("lockfile"):
+                    install_requires, extras_require = get_requires(lockfile)
             except FileNotFoundError:
                 if fail_on_missing_lock:
                     raise
@@ -92,6 +110,12 @@ class Vulcan:
 
         python_lock_with = config.get("python-lock-with")
 
+        sdist_file_lister = str(config.get("sdist-file-lister", "setuptools"))
+        if sdist_file_lister not in ("setuptools", "git"):
+            raise VulcanConfigError(
+                f"tool.vulcan.sdist-file-lister must be 'setuptools' or 'git', not {sdist_file_lister!r}"
+            )
+
         shiv_ops = []
         shiv_config = config.get("shiv", [])
         for conf in shiv_config:
@@ -103,6 +127,9 @@ class Vulcan:
                     interpreter=str_or_none(conf.get("interpreter")),
                     with_extras=[str(e) for e in conf.get("with_extras", [])],
                     extra_args=str(conf.get("extra_args", "")),
+                    precompile=bool(conf.get("precompile", False)),
+                    prune=bool(conf.get("prune", False)),
+                    extract_root=str_or_none(conf.get("extract_root")),
                 )
             )
         # note that setuptools also checks this, and says that it _should_ consider this a warning, but will
@@ -134,9 +161,15 @@ class Vulcan:
             no_lock=no_lock,
             python_lock_with=python_lock_with,
             dynamic=dynamic,
+            sdist_file_lister=sdist_file_lister,
         )
 
-    def setup(self, config_settings: Dict[str, str] | None = None) -> distutils.core.Distribution:
+    def setup(
+        self,
+        config_settings: Dict[str, str] | None = None,
+        cmdclass: Dict[str, Any] | None = None,
+        script_args: List[str] | None = None,
+    ) -> distutils.core.Distribution:
         install_requires: Optional[List[str]]
         extras_require: Optional[Dict[str, List[str]]]
         if self.no_lock or (config_settings and config_settings.get("no-lock") == "true"):
@@ -147,8 +180,12 @@ class Vulcan:
             extras_require = self.extras
         # setuptools apparently does not know what setuptools returns
         # very reassuring
-        return setup(  # type: ignore[no-any-return,func-returns-value]
-            install_requires=install_requires, extras_require=extras_require
+        kwargs: Dict[str, Any] = {}
+        if script_args is not None:
+            # without these setuptools takes the command line from sys.argv
+            kwargs.update(script_name="setup.py", script_args=script_args)
+        return setup(  # type: ignore[no-any-return]
+            install_requires=install_requires, extras_require=extras_require, cmdclass=cmdclass or {}, **kwargs
         )
 
 
@@ -164,6 +201,22 @@ def get_requires(lockfile: Path) -> Tuple[List[str], Dict[str, List[str]]]:
     )
 
 
+def get_graph(lockfile: Path) -> Optional[Dict[str, List[str]]]:
+    "The dependency graph stored in the lockfile, None for lockfiles written before vulcan kept one"
+    with lockfile.open() as f:
+        content = cast(tomlkit.container.Container, tomlkit.loads(f.read()))
+    if "graph" not in content:
+        return None
+    return {k: list(v) for k, v in cast(tomlkit.container.Container, content["graph"]).items()}
+
+
+def get_platforms(lockfile: Path) -> List[str]:
+    "The wheel platform tags the lockfile was made for, empty if it was made for the machine that locked it"
+    with lockfile.open() as f:
+        content = cast(tomlkit.container.Container, tomlkit.loads(f.read()))
+    return list(content.get("platforms", []))
+
+
 def to_pep508(lib: str, req: Union[str, VersionDict]) -> str:
     if not isinstance(req, (str, dict)):
         raise VulcanConfigError(f"Invalid requirement {req} -- must be a dict or a string")
@@ -0,0 +1,30 @@
+"""
+Build vulcan projects from python without going through a PEP 517 frontend.
+
+Unlike the hooks in vulcan.build_backend these take the project directory explicitly and return the full path of
+the artifact, and they may be called from several threads of one long-lived process. The setuptools part of each
+build still has to run in the project directory, so those parts are serialized; building many projects at full
+speed wants several processes (see `vulcan build --projects`).
+"""
+from __future__ import annotations
+import os
+from pathlib import Path
+from typing import Dict, Union
+
+from vulcan.build_backend import build_project
+
+__all__ = ["build_wheel", "build_sdist", "build_editable"]
+
+StrPath = Union[str, "os.PathLike[str]"]
+
+
+def build_wheel(source_dir: StrPath, out_dir: StrPath, config_settings: Dict[str, str] | None = None) -> Path:
+    return build_project(Path(source_dir), Path(out_dir), "wheel", config_settings)
+
+
+def build_sdist(source_dir: StrPath, out_dir: StrPath, config_settings: Dict[str, str] | None = None) -> Path:
+    return build_project(Path(source_dir), Path(out_dir), "sdist", config_settings)
+
+
+def build_editable(source_dir: StrPath, out_dir: StrPath, config_settings: Dict[str, str] | None = None) -> Path:
+    return build_project(Path(source_dir), Path(out_dir), "editable", config_settings)
@@ -0,0 +1,148 @@
+from __future__ import annotations
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from functools import partial
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import unquote, urlparse
+
+import tomlkit
+import tomlkit.exceptions
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.utils import canonicalize_name
+
+from vulcan import VulcanConfigError, flatten_reqs
+
+
+@dataclass
+class BatchResult:
+    project: Path
+    status: str  # one of "ok", "failed", "skipped"
+    seconds: float = 0.0
+    output: Optional[str] = None
+    error: Optional[str] = None
+
+
+def discover_projects(root: Path, patterns: Iterable[str]) -> List[Path]:
+    found: Set[Path] = set()
+    for pattern in patterns:
+        for match in root.glob(pattern):
+            project = match.parent if match.name == "pyproject.toml" else match
+            if (project / "pyproject.toml").is_file():
+                found.add(project.absolute())
+    return sorted(found)
+
+
+def _project_requirements(project: Path) -> Tuple[Optional[str], List[str]]:
+    try:
+        with open(project / "pyproject.toml") as f:
+            pyproject = tomlkit.loads(f.read())
+    except tomlkit.exceptions.ParseError as e:
+        raise VulcanConfigError(f"invalid {project / 'pyproject.toml'}: {e}") from e
+    name = pyproject.get("project", {}).get("name")
+    vulcan = pyproject.get("tool", {}).get("vulcan", {})
+    reqs = flatten_reqs(vulcan.get("dependencies", {}))
+    for extra in vulcan.get("extras", {}).values():
+        reqs.extend(extra)
+    reqs.extend(pyproject.get("project", {}).get("dependencies", []))
+    reqs.extend(pyproject.get("build-system", {}).get("requires", []))
+    return (str(name) if name is not None else None), [str(r) for r in reqs]
+
+
+def local_dependencies(projects: List[Path]) -> Dict[Path, Set[Path]]:
+    "Map each project to the other projects in the batch it depends on, by name or by file:// url"
+    requirements = {}
+    by_name = {}
+    for project in projects:
+        name, reqs = _project_requirements(project)
+        requirements[project] = reqs
+        if name is not None:
+            by_name[canonicalize_name(name)] = project
+    by_path = {p.resolve(): p for p in projects}
+
+    deps: Dict[Path, Set[Path]] = {}
+    for project, reqs in requirements.items():
+        deps[project] = set()
+        for line in reqs:
+            try:
+                req = Requirement(line)
+            except InvalidRequirement:
+                continue
+            target = by_name.get(canonicalize_name(req.name))
+            if req.url and req.url.startswith("file:"):
+                target = by_path.get(Path(unquote(urlparse(req.url).path)).resolve(), target)
+            if target is not None and target != project:
+                deps[project].add(target)
+    return deps
+
+
+def build_order(deps: Dict[Path, Set[Path]]) -> List[Path]:
+    order: List[Path] = []
+    done: Set[Path] = set()
+    visiting: List[Path] = []
+
+    def visit(project: Path) -> None:
+        if project in done:
+            return
+        if project in visiting:
+            start = visiting.index(project)
+            cycle = visiting[start:] + [project]
+            raise VulcanConfigError(f"dependency cycle between projects: {' -> '.join(str(p) for p in cycle)}")
+        visiting.append(project)
+        for dep in sorted(deps[project]):
+            visit(dep)
+        visiting.pop()
+        done.add(project)
+        order.append(project)
+
+    for project in sorted(deps):
+        visit(project)
+    return order
+
+
+def _timed(build_one: Callable[[Path], str], project: Path) -> Tuple[str, float]:
+    # timed in the worker so that time spent queued for a free worker doesn't count
+    start = time.perf_counter()
+    return build_one(project), time.perf_counter() - start
+
+
+def run_batch(
+    deps: Dict[Path, Set[Path]],
+    build_one: Callable[[Path], str],
+    jobs: Optional[int] = None,
+    report: Callable[[BatchResult], None] = lambda result: None,
+) -> List[BatchResult]:
+    """
+    Build every project in a process pool, starting each one as soon as all the projects it depends on have
+    been built. Projects depending on a failed project are skipped. build_one must be picklable.
+    """
+    pending = build_order(deps)
+    results: Dict[Path, BatchResult] = {}
+    running: Dict[Future[Tuple[str, float]], Path] = {}
+
+    def schedule(pool: ProcessPoolExecutor) -> None:
+        for project in list(pending):
+            if any(results.get(dep, BatchResult(dep, "")).status in ("failed", "skipped") for dep in deps[project]):
+                pending.remove(project)
+                failed = sorted(str(d) for d in deps[project] if d in results and results[d].status != "ok")
+                results[project] = BatchResult(project, "skipped", error=f"depends on {', '.join(failed)}")
+                report(results[project])
+            elif all(dep in results for dep in deps[project]):
+                pending.remove(project)
+                running[pool.submit(partial(_timed, build_one), project)] = project
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        schedule(pool)
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                project = running.pop(future)
+                try:
+                    output, elapsed = future.result()
+                    results[project] = BatchResult(project, "ok", elapsed, output=output)
+                except Exception as e:
+                    results[project] = BatchResult(project, "failed", error=str(e) or repr(e))
+                report(results[project])
+            schedule(pool)
+    return [results[project] for project in build_order(deps)]
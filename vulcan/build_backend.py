@@ -2,17 +2,23 @@ from __future__ import annotations
 import os
 import re
 import shutil
-import subprocess
 import sys
 import tempfile
+import threading
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Callable, Dict, Generator, List, Optional, Tuple
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple
 
 from editables import EditableProject
+from setuptools.command.sdist import sdist
 
 from vulcan import Vulcan
+from vulcan.develop import editable_requirement
+from vulcan.gitfiles import GitEggInfo
 from vulcan.plugins import PluginRunner
+from vulcan.process import check_call, check_output
+from vulcan.profiling import profiled, python_command
+from vulcan.trace import span
 
 version: Callable[[str], str]
 if sys.version_info >= (3, 8):
@@ -23,24 +29,137 @@ else:
 __all__ = ["build_wheel", "build_sdist"]
 
 
+# setuptools reads and writes relative to the current directory, which is process-wide, so only one project
+# can be going through setup() at a time. Everything else about a build is passed explicitly.
+_setup_lock = threading.RLock()
+
+
 @contextmanager
-def patch_argv(argv: List[str]) -> Generator[None, None, None]:
-    old_argv = sys.argv[:]
-    sys.argv = [sys.argv[0]] + argv
-    yield
-    sys.argv = old_argv
+def _project_directory(source_dir: Path) -> Generator[None, None, None]:
+    with _setup_lock:
+        old = os.getcwd()
+        os.chdir(source_dir)
+        try:
+            yield
+        finally:
+            os.chdir(old)
 
 
-def build(outdir: str, config_settings: Dict[str, str] | None = None) -> str:
-    config = Vulcan.from_source(Path().absolute())
+@contextmanager
+def scratch_dir(config_settings: Dict[str, str] | None = None) -> Generator[Path, None, None]:
+    # every intermediate file (build/, *.egg-info, the sdist release tree) goes in here instead of the source
+    # tree, so concurrent builds of one checkout don't trample each other. `build-dir` picks where the
+    # per-build directories are created, e.g. on a tmpfs.
+    parent = (config_settings or {}).get("build-dir")
+    if parent is not None:
+        Path(parent).mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="vulcan-build-", dir=parent) as scratch:
+        yield Path(scratch).absolute()
+
+
+def _egg_base(scratch: Path, source_dir: Path) -> str:
+    # setuptools insists that everything in the manifest is a relative path, including the egg-info
+    try:
+        return os.path.relpath(scratch, source_dir)
+    except ValueError:
+        # different drive on windows, nothing we can do about it
+        return str(scratch)
+
+
+class ScratchSdist(sdist):
+    # sdist assembles (and then removes) its release tree in the current directory, let it go elsewhere
+    user_options = sdist.user_options + [("release-base=", None, "directory to assemble the release tree in")]
+
+    def initialize_options(self) -> None:
+        super().initialize_options()
+        self.release_base: str | None = None
+
+    def finalize_options(self) -> None:
+        super().finalize_options()
+        if self.release_base is None:
+            self.release_base = os.curdir
+        else:
+            # the release tree is cleaned up along with the rest of release_base
+            self.keep_temp = True
+
+    def make_release_tree(self, base_dir: str, files: List[str]) -> None:
+        assert self.release_base is not None
+        egg_info_dir: str = self.get_finalized_command("egg_info").egg_info  # type: ignore[attr-defined]
+        egg_info = Path(egg_info_dir).absolute()
+        release_dir = os.path.join(self.release_base, base_dir)
+        # the egg-info may have been generated out of tree, but in the sdist it belongs next to the sources
+        egg_info_files = [f for f in files if egg_info in Path(f).absolute().parents]
+        super().make_release_tree(release_dir, [f for f in files if f not in egg_info_files])
+        for f in egg_info_files:
+            dest = Path(release_dir, egg_info.name, Path(f).absolute().relative_to(egg_info))
+            self.mkpath(str(dest.parent))
+            self.copy_file(f, str(dest))
+        sources = Path(release_dir, egg_info.name, "SOURCES.txt")
+        if sources.exists():
+            egg_info_prefix = egg_info_dir.replace(os.sep, "/")
+            lines = sources.read_text().replace(f"{egg_info_prefix}/", f"{egg_info.name}/").splitlines()
+            sources.write_text("\n".join(sorted(lines)) + "\n")
+
+    def make_archive(  # type: ignore[override]
+        self,
+        base_name: str,
+        format: str,
+        root_dir: str | None = None,
+        base_dir: str | None = None,
+        owner: str | None = None,
+        group: str | None = None,
+    ) -> str:
+        return super().make_archive(
+            base_name, format, root_dir=self.release_base, base_dir=base_dir, owner=owner, group=group
+        )
+
 
-    # https://setuptools.readthedocs.io/en/latest/userguide/keywords.html
-    # https://docs.python.org/3/distutils/apiref.html
-    with PluginRunner(config):
-        dist = config.setup(config_settings=config_settings)
-    rel_dist = Path(dist.dist_files[0][-1])
-    shutil.move(str(rel_dist), Path(outdir) / rel_dist.name)
-    return rel_dist.name
+def _run_setup(
+    source_dir: Path, script_args: List[str], config_settings: Dict[str, str] | None, post_build: bool = False
+) -> Path:
+    with _project_directory(source_dir):
+        with span("config"):
+            config = Vulcan.from_source(source_dir)
+
+        # https://setuptools.readthedocs.io/en/latest/userguide/keywords.html
+        # https://docs.python.org/3/distutils/apiref.html
+        cmdclass: Dict[str, Any] = {"sdist": ScratchSdist}
+        if config.sdist_file_lister == "git":
+            cmdclass["egg_info"] = GitEggInfo
+        with PluginRunner(config) as plugins, span("setup"):
+            dist = config.setup(config_settings=config_settings, cmdclass=cmdclass, script_args=script_args)
+        # setuptools was told to put the artifact straight into the output directory
+        artifact = Path(dist.dist_files[0][-1])
+        if post_build:
+            plugins.run_post_build(artifact)
+    return artifact
+
+
+def build_project(
+    source_dir: Path, outdir: Path, dist_type: str, config_settings: Dict[str, str] | None = None
+) -> Path:
+    """
+    Build a wheel, sdist or editable wheel of the project in source_dir into outdir and return its path.
+    Safe to call from several threads at once.
+    """
+    source_dir, outdir = source_dir.absolute(), outdir.absolute()
+    with scratch_dir(config_settings) as scratch:
+        args = ["egg_info", "--egg-base", _egg_base(scratch, source_dir)]
+        if dist_type == "sdist":
+            args += ["sdist", "--release-base", str(scratch), "--dist-dir", str(outdir)]
+        elif dist_type in ("wheel", "editable"):
+            args += [
+                *("build", "--build-base", str(scratch / "build")),
+                *("bdist_wheel", "--bdist-dir", str(scratch / "bdist"), "--dist-dir", str(outdir)),
+            ]
+        else:
+            raise ValueError(f"unknown distribution type {dist_type!r}")
+        # editable wheels point at the source tree, there's nothing in them to post-process
+        dist = _run_setup(source_dir, args, config_settings, post_build=dist_type == "wheel")
+    if dist_type == "editable":
+        with span("editable"):
+            make_editable(dist, source_dir)
+    return dist
 
 
 def build_wheel(
@@ -48,16 +167,16 @@ def build_wheel(
     config_settings: Dict[str, str] | None = None,
     metadata_directory: str | None = None,
 ) -> str:
-    with patch_argv(["bdist_wheel"]):
-        return build(wheel_directory, config_settings)
+    with profiled("build_wheel"), span("build_wheel", source=os.getcwd()):
+        return build_project(Path(), Path(wheel_directory), "wheel", config_settings).name
 
 
 def build_sdist(
     sdist_directory: str,
     config_settings: Dict[str, str] | None = None,
 ) -> str:
-    with patch_argv(["sdist"]):
-        return build(sdist_directory, config_settings)
+    with profiled("build_sdist"), span("build_sdist", source=os.getcwd()):
+        return build_project(Path(), Path(sdist_directory), "sdist", config_settings).name
 
 
 def get_virtualenv_python() -> Path:
@@ -83,7 +202,7 @@ def get_requires_for_build_wheel(config_settings: Dict[str, str] | None = None)
 
 
 def get_pip_version(python_callable: Path) -> Optional[Tuple[int, ...]]:
-    out = subprocess.check_output([str(python_callable), "-m", "pip", "--version"], encoding="utf-8")
+    out = check_output([str(python_callable), "-m", "pip", "--version"])
     m = re.search(r"pip (\d+\.\d+(\.\d+)?)", out)
     if not m:
         return None
@@ -104,19 +223,16 @@ def install_develop(build_isolation: bool) -> None:
             " Please upgrade your pip"
         )
 
-    path = str(Path().absolute())
-    if config.configured_extras:
-        path = f'{path}[{",".join(config.configured_extras)}]'
-    pip_call = [str(virtual_env), "-m", "pip", "install", "-e", path]
+    pip_call = [str(virtual_env), "-m", "pip", "install", "-e", editable_requirement(config)]
     if not build_isolation:
         pip_call.append("--no-build-isolation")
-    subprocess.check_call(pip_call)
+    check_call(python_command(pip_call))
 
 
 # pep660 functions
 def unpack(whl: Path) -> Path:
     with tempfile.TemporaryDirectory() as tmp:
-        subprocess.check_output(f"wheel unpack {whl} -d {tmp}".split())
+        check_output(f"wheel unpack {whl} -d {tmp}".split())
         unpacked = list(Path(tmp).glob("*"))
         assert len(unpacked) == 1
         shutil.copytree(unpacked[0], whl.parent / unpacked[0].name)
@@ -125,7 +241,7 @@ def unpack(whl: Path) -> Path:
 
 def pack(unpacked_wheel: Path) -> Path:
     with tempfile.TemporaryDirectory() as tmp:
-        subprocess.check_output(f"wheel pack {unpacked_wheel} -d {tmp}".split())
+        check_output(f"wheel pack {unpacked_wheel} -d {tmp}".split())
         packed = list(Path(tmp).glob("*.whl"))
         assert len(packed) == 1
         shutil.copy(packed[0], unpacked_wheel.parent)
@@ -145,14 +261,14 @@ def add_requirement(unpacked_whl_dir: Path, req: str) -> None:
     metadata.write_text("".join(metadata_lines))
 
 
-def _find_local_package(name: str) -> Path:
+def _find_local_package(name: str, source_dir: Path) -> Path:
     """
     Try and find the local package being refered to for editable. Default to ./{name} if we can't find it otherwise.
     """
-    return next(Path().rglob(name), Path(name))
+    return next(source_dir.rglob(name), source_dir / name)
 
 
-def make_editable(whl: Path) -> None:
+def make_editable(whl: Path, source_dir: Path) -> None:
     unpacked_whl_dir = unpack(whl)
     add_requirement(unpacked_whl_dir, f"editables (~={version('editables')})")
     # https://www.python.org/dev/peps/pep-0427/#escaping-and-unicode
@@ -164,10 +280,10 @@ def make_editable(whl: Path) -> None:
         if "Name:" in line
     )
     project_name = re.sub(r"[^\w\d.]+", "_", name, re.UNICODE)
-    project = EditableProject(project_name, Path().absolute())
+    project = EditableProject(project_name, source_dir)
     packages = (p for p in unpacked_whl_dir.iterdir() if not p.name.endswith(".dist-info"))
     for package in packages:
-        project.map(package.name, _find_local_package(package.name))
+        project.map(package.name, _find_local_package(package.name, source_dir))
         # removing the actual code packages because they will conflict with the .pth files, and take
         # precendence over them
         shutil.rmtree(unpacked_whl_dir / package.name)
@@ -189,6 +305,5 @@ def build_editable(
     config_settings: Dict[str, str] | None = None,
     metadata_directory: str | None = None,
 ) -> str:
-    whl_path = Path(wheel_directory) / build_wheel(wheel_directory, config_settings, metadata_directory)
-    make_editable(whl_path)
-    return whl_path.name
+    with profiled("build_editable"), span("build_editable", source=os.getcwd()):
+        return build_project(Path(), Path(wheel_directory), "editable", config_settings).name
@@ -1,19 +1,100 @@
 from __future__ import annotations
 import asyncio
+import re
+import sys
 import tempfile
+from dataclasses import dataclass, field
 from itertools import chain
-from typing import Dict, List, Tuple
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple, cast
 
+from packaging.markers import default_environment
+from packaging.requirements import InvalidRequirement
+from packaging.requirements import Requirement as Pep508Requirement
+from packaging.utils import canonicalize_name
 from pkg_resources import Requirement
 
+from vulcan import VulcanConfigError
+from vulcan.develop import venv_environment
+from vulcan.installed import installed_distributions
 from vulcan.isolation import VulcanEnvBuilder, create_venv
 
+Graph = Dict[str, List[str]]
 
-async def build_requires(pipenv: VulcanEnvBuilder, requires: List[str]) -> Dict[Requirement, Requirement]:
+_LINUX_TAG = re.compile(r"^(?:manylinux\d+|manylinux_\d+_\d+|musllinux_\d+_\d+|linux)_(.+)$")
+_MACOS_TAG = re.compile(r"^macosx_\d+_\d+_(.+)$")
+_WINDOWS_MACHINES = {"win32": "x86", "win_amd64": "AMD64", "win_arm64": "ARM64"}
+
+
+@dataclass
+class Resolution:
+    install_requires: List[str]
+    extras_require: Dict[str, List[str]]
+    # canonical name of every locked distribution to its requirements on the others, with markers already applied
+    graph: Graph = field(default_factory=dict)
+    # the wheel platform tags it was locked for with `vulcan lock --platform`, empty for a lock of this machine
+    platforms: List[str] = field(default_factory=list)
+
+
+def _requirement(line: str) -> Optional[Pep508Requirement]:
+    try:
+        return Pep508Requirement(line)
+    except InvalidRequirement:
+        return None
+
+
+def dependency_graph(roots: Iterable[str], requires: Mapping[str, List[str]], environment: Dict[str, str]) -> Graph:
+    "The edges between distributions (canonical name to their Requires-Dist) that are reachable from roots"
+    edges: Dict[str, Set[str]] = {}
+    seen: Set[Tuple[str, str]] = set()
+    stack = [req for req in map(_requirement, roots) if req is not None]
+    while stack:
+        req = stack.pop()
+        if req.marker is not None and not req.marker.evaluate({**environment, "extra": ""}):
+            continue
+        name = canonicalize_name(req.name)
+        if name not in requires:
+            continue
+        deps = edges.setdefault(name, set())
+        for extra in ["", *req.extras]:
+            if (name, extra) in seen:
+                continue
+            seen.add((name, extra))
+            for dep in map(_requirement, requires[name]):
+                # an extra's requirements only count when the extra is asked for
+                if dep is not None and (dep.marker is None or dep.marker.evaluate({**environment, "extra": extra})):
+                    dep.marker = None
+                    deps.add(str(dep))
+                    stack.append(dep)
+    return {name: sorted(deps) for name, deps in sorted(edges.items())}
+
+
+def reachable(graph: Mapping[str, List[str]], roots: Iterable[str], environment: Dict[str, str]) -> Set[str]:
+    "Canonical names of the roots and everything they depend on in graph"
+    names: Set[str] = set()
+    stack = []
+    for req in map(_requirement, roots):
+        if req is not None and (req.marker is None or req.marker.evaluate({**environment, "extra": ""})):
+            stack.append(canonicalize_name(req.name))
+    while stack:
+        name = stack.pop()
+        if name in names:
+            continue
+        names.add(name)
+        stack.extend(canonicalize_name(dep.name) for dep in map(_requirement, graph.get(name, [])) if dep is not None)
+    return names
+
+
+async def build_requires(
+    pipenv: VulcanEnvBuilder, requires: List[str], constraints: Optional[List[str]] = None
+) -> Tuple[Dict[Requirement, Requirement], Graph]:
     with tempfile.TemporaryDirectory() as site_packages:
-        await pipenv.install(site_packages, requires)
+        await pipenv.install(site_packages, requires, constraints)
         freeze = await pipenv.freeze(site_packages)
-        return freeze
+        environment = venv_environment(Path(pipenv.context.env_dir))
+        installed = installed_distributions([Path(site_packages)])
+        dists = {name: dist.requires or [] for name, dist in installed.items()}
+        return freeze, dependency_graph(requires, dists, environment)
 
 
 async def resolve_deps(
@@ -21,17 +102,27 @@ async def resolve_deps(
     extras: Dict[str, List[str]],
     python_version: str | None = None,
 ) -> Tuple[List[str], Dict[str, List[str]]]:
+    resolution = await resolve(install_requires, extras, python_version)
+    return resolution.install_requires, resolution.extras_require
+
+
+async def resolve(
+    install_requires: List[str],
+    extras: Dict[str, List[str]],
+    python_version: str | None = None,
+) -> Resolution:
+    "Lock the requirements and each extra, along with the dependency graph of everything locked"
 
     if not install_requires and not extras:
-        return [], {}
+        return Resolution([], {})
 
     extras_list = list(extras.items())
     with create_venv(python_version) as pipenv:
         print("Building base requires")
-        base_freeze = await build_requires(pipenv, install_requires)
+        base_freeze, base_graph = await build_requires(pipenv, install_requires)
         if not extras_list:
             # if we have no extras, we are done here.
-            return sorted([str(req) for req in base_freeze.values()]), {}
+            return Resolution(sorted([str(req) for req in base_freeze.values()]), {}, base_graph)
 
         print("Building requirements for base + all extras")
         final_out_task = asyncio.get_event_loop().create_task(
@@ -56,10 +147,218 @@ async def resolve_deps(
         for res in results:
             if isinstance(res, BaseException):
                 raise res
-        all_resolved = final_out_task.result()
+        all_resolved, graph = final_out_task.result()
+
+        extras_out = {
+            k: sorted([str(all_resolved[req]) for req in v.result()[0]]) for k, v in resolved_extras.items()
+        }
+        return Resolution(sorted([str(all_resolved[req]) for req in base_freeze.keys()]), extras_out, graph)
+
+
+async def upgrade(
+    install_requires: List[str],
+    extras: Dict[str, List[str]],
+    locked: Resolution,
+    packages: Iterable[str],
+    python_version: str | None = None,
+) -> Resolution:
+    """
+    Re-lock only packages and what they depend on, with every other pin in locked as a constraint. The
+    requirements the rest of the graph has on the re-locked distributions are kept too, so the result still fits.
+    """
+    # a lock for other platforms can pin a distribution once per platform, which this machine can't re-lock
+    if locked.platforms or any(
+        Requirement.parse(pin).marker for pin in chain(locked.install_requires, *locked.extras_require.values())
+    ):
+        raise VulcanConfigError("The lockfile was made for other platforms with --platform, lock them again instead")
+    pins: Dict[str, str] = {
+        canonicalize_name(Requirement.parse(pin).name): pin
+        for pin in chain(locked.install_requires, *locked.extras_require.values())
+    }
+    targets = {canonicalize_name(package): package for package in packages}
+    missing = [package for name, package in targets.items() if name not in pins]
+    if missing:
+        raise VulcanConfigError(f"{', '.join(missing)} not in the lockfile")
+    with create_venv(python_version) as pipenv:
+        environment = venv_environment(Path(pipenv.context.env_dir))
+        free = reachable(locked.graph, targets, environment)
+        roots = [*install_requires, *chain.from_iterable(extras.values())]
+        # whatever asks for the re-locked distributions, from the project or from the pins that stay
+        wanted = [*targets.values()]
+        wanted += [req for req in roots if canonicalize_name(Requirement.parse(req).name) in free]
+        for parent, deps in locked.graph.items():
+            if parent not in free:
+                wanted += [dep for dep in deps if canonicalize_name(Requirement.parse(dep).name) in free]
+        constraints = [pin for name, pin in pins.items() if name not in free]
+        print(f"Relocking {len(free)} of {len(pins)} pins")
+        freeze, subgraph = await build_requires(pipenv, list(dict.fromkeys(wanted)), constraints)
+
+    relocked: Dict[str, str] = {canonicalize_name(req.name): str(req) for req in freeze.values()}
+    # the pins that were free or are new, the rest of the lockfile stays as it was
+    changed = {name for name in relocked if name in free or name not in pins}
+    new_pins = {**{name: pin for name, pin in pins.items() if name not in free}, **relocked}
+    graph = {name: deps for name, deps in locked.graph.items() if name not in free}
+    graph.update({name: deps for name, deps in subgraph.items() if name in changed})
 
-        extras_out = {k: sorted([str(all_resolved[req]) for req in v.result()]) for k, v in resolved_extras.items()}
-        return (
-            sorted([str(all_resolved[req]) for req in base_freeze.keys()]),
-            extras_out,
+    def section(old: List[str], section_roots: List[str]) -> List[str]:
+        kept = {canonicalize_name(Requirement.parse(pin).name) for pin in old} - free
+        now = reachable(graph, section_roots, environment) & changed
+        return sorted(new_pins[name] for name in kept | now)
+
+    return Resolution(
+        section(locked.install_requires, install_requires),
+        {
+            extra: section(locked.extras_require.get(extra, []), [*install_requires, *reqs])
+            for extra, reqs in extras.items()
+        },
+        dict(sorted(graph.items())),
+    )
+
+
+def platform_environment(tag: str) -> Dict[str, str]:
+    "The markers that describe the platform of a wheel platform tag such as manylinux2014_aarch64"
+    linux, macos = _LINUX_TAG.match(tag), _MACOS_TAG.match(tag)
+    if linux:
+        return {"sys_platform": "linux", "platform_system": "Linux", "os_name": "posix", "platform_machine": linux[1]}
+    if macos:
+        environment = {"sys_platform": "darwin", "platform_system": "Darwin", "os_name": "posix"}
+        # universal2 and the like run on more than one machine
+        if macos[1] in ("arm64", "x86_64"):
+            environment["platform_machine"] = macos[1]
+        return environment
+    if tag in _WINDOWS_MACHINES:
+        return {
+            "sys_platform": "win32",
+            "platform_system": "Windows",
+            "os_name": "nt",
+            "platform_machine": _WINDOWS_MACHINES[tag],
+        }
+    raise VulcanConfigError(f"Unknown platform {tag}, expected a wheel platform tag like manylinux2014_x86_64")
+
+
+def platform_marker(tag: str) -> str:
+    environment = platform_environment(tag)
+    keys = [key for key in ("sys_platform", "platform_machine") if key in environment]
+    return " and ".join(f'{key} == "{environment[key]}"' for key in keys)
+
+
+def _for_platform(requirements: Iterable[str], environment: Dict[str, str]) -> List[str]:
+    "The requirements whose markers hold on the platform, without their markers"
+    applicable = []
+    for req in map(_requirement, requirements):
+        if req is not None and (req.marker is None or req.marker.evaluate({**environment, "extra": ""})):
+            req.marker = None
+            applicable.append(str(req))
+    return applicable
+
+
+async def _resolve_platform(
+    pipenv: VulcanEnvBuilder,
+    tag: str,
+    install_requires: List[str],
+    extras: Dict[str, List[str]],
+    python_version: str,
+    environment: Dict[str, str],
+) -> Resolution:
+    "The lock for one platform, from pip's report of installing the requirements and every extra together"
+    roots = [*install_requires, *chain.from_iterable(extras.values())]
+    # pip evaluates markers for this machine even with --platform, so it is only given requirements that hold on the
+    # target, and whatever the target needs that this machine doesn't is added until nothing is missing
+    wanted = _for_platform(roots, environment)
+    while True:
+        report = await pipenv.report(wanted, tag, python_version)
+        found: Dict[str, Dict[str, Any]] = {
+            canonicalize_name(item["metadata"]["name"]): item["metadata"] for item in report.get("install", [])
+        }
+        requires: Dict[str, List[str]] = {name: meta.get("requires_dist") or [] for name, meta in found.items()}
+        graph = dependency_graph(roots, requires, environment)
+        missing = [
+            dep
+            for dep in dict.fromkeys(chain.from_iterable(graph.values()))
+            if canonicalize_name(Pep508Requirement(dep).name) not in found
+        ]
+        if not missing:
+            break
+        if set(missing) <= set(wanted):
+            raise VulcanConfigError(f"pip did not resolve {', '.join(missing)} for {tag}")
+        wanted = list(dict.fromkeys([*wanted, *missing]))
+    pins = {name: f"{meta['name']}=={meta['version']}" for name, meta in found.items()}
+
+    def section(section_roots: List[str]) -> List[str]:
+        return sorted(pins[name] for name in dependency_graph(section_roots, requires, environment))
+
+    return Resolution(
+        section(install_requires),
+        {extra: section([*install_requires, *reqs]) for extra, reqs in extras.items()},
+        graph,
+    )
+
+
+def merge_platforms(resolutions: Mapping[str, Resolution]) -> Resolution:
+    "One lock for all the platforms, with a marker on every pin that doesn't hold for all of them"
+    markers = {tag: platform_marker(tag) for tag in resolutions}
+
+    def merge(sections: Mapping[str, List[str]]) -> List[str]:
+        platforms: Dict[str, List[str]] = {}
+        for tag, pins in sections.items():
+            for pin in pins:
+                platforms.setdefault(pin, []).append(tag)
+        merged = []
+        for pin, tags in platforms.items():
+            if len(tags) == len(sections):
+                merged.append(pin)
+            else:
+                merged.append(f"{pin}; " + " or ".join(dict.fromkeys(f"({markers[tag]})" for tag in tags)))
+        return sorted(merged)
+
+    extras = dict.fromkeys(chain.from_iterable(r.extras_require for r in resolutions.values()))
+    graph: Dict[str, Set[str]] = {}
+    for resolution in resolutions.values():
+        for name, deps in resolution.graph.items():
+            graph.setdefault(name, set()).update(deps)
+    return Resolution(
+        merge({tag: r.install_requires for tag, r in resolutions.items()}),
+        {extra: merge({tag: r.extras_require.get(extra, []) for tag, r in resolutions.items()}) for extra in extras},
+        {name: sorted(deps) for name, deps in sorted(graph.items())},
+        list(resolutions),
+    )
+
+
+async def resolve_platforms(
+    install_requires: List[str],
+    extras: Dict[str, List[str]],
+    platforms: List[str],
+    python_version: str | None = None,
+) -> Resolution:
+    """
+    Lock for other platforms (wheel platform tags) than this one, without installing anything: pip resolves each
+    platform from the metadata of its binary wheels, all of them at once. Only wheels are considered, a dependency
+    that is only available as an sdist for a platform fails its lock.
+    """
+    if not install_requires and not extras:
+        return Resolution([], {})
+    python_version = python_version or f"{sys.version_info[0]}.{sys.version_info[1]}"
+    # fails early for tags we can't write markers for
+    environments = {
+        tag: {
+            **default_environment(),
+            **platform_environment(tag),
+            "python_version": python_version,
+            "python_full_version": f"{python_version}.0",
+        }
+        for tag in platforms
+    }
+    # any python can do the resolving, pip is told which one it is for
+    with create_venv() as pipenv:
+        print(f"Resolving requirements for {', '.join(platforms)}")
+        resolutions = await asyncio.gather(
+            *(
+                _resolve_platform(pipenv, tag, install_requires, extras, python_version, environments[tag])
+                for tag in platforms
+            ),
+            return_exceptions=True,
         )
+    for resolution in resolutions:
+        if isinstance(resolution, BaseException):
+            raise resolution
+    return merge_platforms({tag: cast(Resolution, resolution) for tag, resolution in zip(platforms, resolutions)})
@@ -1,23 +1,54 @@
 from __future__ import annotations
 import asyncio
 import asyncio.subprocess
+import contextlib
+import io
+import json
 import os
-import shlex
 import subprocess
 import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from functools import update_wrapper
+from importlib import metadata
+from itertools import chain
 from pathlib import Path
-from typing import Callable, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, TypeVar
 
 import build.env
 import click
+import packaging.requirements
 import packaging.version
 import tomlkit
+from packaging.utils import canonicalize_name
 from pkg_resources import Requirement
 
 import build
-from vulcan import Vulcan, flatten_reqs
+from build import RunnerType
+from vulcan import ShivOpts, Vulcan, VulcanConfigError, cache_dir, flatten_reqs, get_graph, get_platforms
+from vulcan.batch import BatchResult, build_order, discover_projects, local_dependencies, run_batch
 from vulcan.build_backend import get_pip_version, get_virtualenv_python, install_develop
-from vulcan.builder import resolve_deps
+from vulcan.builder import Resolution, resolve, resolve_platforms, upgrade
+from vulcan.develop import PROJECT, DevelopPlan, combined_install_args, plan_develop, venv_environment
+from vulcan.installed import installed_distributions, site_packages, unsatisfied
+from vulcan.isolation import BuildEnvPool
+from vulcan.process import (
+    STATS_ENV,
+    ProcessResult,
+    check_call,
+    check_output,
+    read_stats,
+    run_bounded,
+    summarize,
+)
+from vulcan.profiling import PROFILE_ENV, combine, profiled, python_command
+from vulcan.shivcache import app_pins, cache_key, is_up_to_date, manifest_path, wheel_digest, write_manifest
+from vulcan.sync import constraints, plan_sync, same_python
+from vulcan.verify import verify as verify_lockfile
+from vulcan.staging import ExtrasKey, extras_key, split_pip_args, stage_site_packages, staging_pip_args
+from vulcan.wheelhouse import default_wheelhouse, fill_wheelhouse, locked_pins, missing_pins
+from vulcan.zipapp import build_zipapp
 
 version: Callable[[str], str]
 if sys.version_info >= (3, 8):
@@ -25,7 +56,20 @@ if sys.version_info >= (3, 8):
 else:
     from importlib_metadata import PackageNotFoundError, version
 
-pass_vulcan = click.make_pass_decorator(Vulcan)
+T = TypeVar("T")
+
+
+def pass_vulcan(f: Callable[..., T]) -> Callable[..., T]:
+    @click.pass_context
+    def new_func(ctx: click.Context, *args: Any, **kwargs: Any) -> T:
+        config = ctx.find_object(Vulcan)
+        if config is None:
+            raise click.UsageError("No pyproject.toml in the current directory")
+        result: T = ctx.invoke(f, config, *args, **kwargs)
+        return result
+
+    return update_wrapper(new_func, f)
+
 
 try:
     vulcan_version = version("vulcan-py")
@@ -33,47 +77,296 @@ except PackageNotFoundError:
     vulcan_version = "0.0.0"
 
 
+def start_profiling(ctx: click.Context, directory: Path) -> None:
+    "Profile this process and, through the environment, the python processes it starts, until ctx closes"
+    directory = directory.absolute()
+    os.environ[PROFILE_ENV] = str(directory)
+
+    def report() -> None:
+        combined = combine(directory)
+        if combined is not None:
+            click.echo(f"Profiles written to {directory}, see {combined}", err=True)
+
+    # closing runs these last in first out, so the report comes after this process' profile is written
+    ctx.call_on_close(report)
+    profile = contextlib.ExitStack()
+    profile.enter_context(profiled("vulcan"))
+    ctx.call_on_close(profile.close)
+
+
+def start_stats(ctx: click.Context, path: Path) -> None:
+    "Record every process started from here on in path, and replace the records with a summary when ctx closes"
+    path = path.absolute()
+    path.write_text("")
+    os.environ[STATS_ENV] = str(path)
+    start = time.perf_counter()
+
+    def summary() -> None:
+        stats = read_stats(path)
+        document = {
+            "command": sys.argv[1:],
+            "seconds": round(time.perf_counter() - start, 6),
+            "subprocesses": summarize(stats),
+            "processes": [asdict(s) for s in stats],
+        }
+        path.write_text(json.dumps(document, indent=2) + "\n")
+
+    ctx.call_on_close(summary)
+
+
 @click.group()
 @click.version_option(vulcan_version)
+@click.option(
+    "--profile",
+    "profile_dir",
+    type=click.Path(file_okay=False),
+    help="Write cProfile output for vulcan and the python processes it runs to this directory",
+)
+@click.option(
+    "--stats",
+    "stats_file",
+    type=click.Path(dir_okay=False),
+    help="Write a JSON summary of the time, CPU and memory used by every process vulcan runs to this file",
+)
 @click.pass_context
-def main(ctx: click.Context) -> None:
+def main(ctx: click.Context, profile_dir: Optional[str], stats_file: Optional[str]) -> None:
+    if stats_file is not None:
+        start_stats(ctx, Path(stats_file))
+    if profile_dir is not None:
+        start_profiling(ctx, Path(profile_dir))
+    if not Path("pyproject.toml").exists():
+        # e.g. building a batch of projects from the root of a monorepo. Commands needing a config will complain
+        return
     # don't fail on missing lock here, because this config object is not actually used for building only for
     # cli values
     ctx.obj = Vulcan.from_source(Path().absolute(), fail_on_missing_lock=False)
 
 
-async def build_shiv_apps(from_dist: str, vulcan: Vulcan, outdir: Path) -> List[Path]:
-    results = []
-    for app in vulcan.shiv_options:
-        try:
-            if app.with_extras:
-                dist = f'{from_dist}[{",".join(app.with_extras)}]'
-            else:
-                dist = from_dist
-            cmd = [sys.executable, "-m", "shiv", dist, "-o", str(outdir / app.bin_name)]
-            if app.console_script:
-                cmd += ["-c", app.console_script]
-            if app.entry_point:
-                cmd += ["-e", app.entry_point]
-            if app.interpreter:
-                cmd += ["-p", app.interpreter]
-            if app.extra_args:
-                cmd += shlex.split(app.extra_args)
-            proc = await asyncio.subprocess.create_subprocess_exec(*cmd)
-            results.append((proc, app.bin_name))
-        except KeyError as e:
-            raise KeyError("missing config value in pyproject.toml: {e}") from e
-    await asyncio.gather(*(p.wait() for p, _ in results))
-    succeeded = []
-    failed = []
-    for proc, res in results:
-        if await proc.wait() == 0:
-            succeeded.append(outdir / res)
+def shiv_command(app: ShivOpts, site_packages: List[Path], outdir: Path) -> List[str]:
+    cmd = [sys.executable, "-m", "shiv", "-o", str(outdir / app.bin_name)]
+    for sp in site_packages:
+        cmd += ["--site-packages", str(sp)]
+    if app.console_script:
+        cmd += ["-c", app.console_script]
+    if app.entry_point:
+        cmd += ["-e", app.entry_point]
+    if app.interpreter:
+        cmd += ["-p", app.interpreter]
+    if app.extract_root:
+        cmd += ["--root", app.extract_root]
+    # the pip options were used when staging site_packages, shiv has nothing to install
+    return cmd + split_pip_args(app.extra_args)[1]
+
+
+def report_shiv_result(result: ProcessResult) -> None:
+    if result.log is None and result.output.strip():
+        click.echo(result.output.rstrip(), err=True)
+    if result.status == "cached":
+        click.echo(f"[cached] {result.name} is up to date", err=True)
+        return
+    if result.status == "cancelled":
+        click.echo(f"[cancelled] {result.name}", err=True)
+        return
+    rss = f", peak RSS {result.max_rss / 2**20:.1f} MiB" if result.max_rss is not None else ""
+    log = f", log in {result.log}" if result.log is not None else ""
+    status = "" if result.status == "ok" or result.returncode is None else f": exit code {result.returncode}"
+    click.echo(f"[{result.status}] {result.name}{status} ({result.seconds:.1f}s{rss}{log})", err=True)
+
+
+def check_shiv_backend(apps: List[ShivOpts], backend: str) -> None:
+    if backend == "native":
+        return
+    for app in apps:
+        if app.precompile or app.prune:
+            raise VulcanConfigError(f"{app.bin_name}: precompile and prune need --shiv-backend native")
+
+
+def build_native_apps(
+    apps: List[ShivOpts],
+    site_packages: Dict[ExtrasKey, List[Path]],
+    outdir: Path,
+    jobs: Optional[int] = None,
+    report: Callable[[ProcessResult], None] = report_shiv_result,
+) -> List[ProcessResult]:
+    "Build the apps one after the other in this process, each one compressing with `jobs` threads"
+    results: List[ProcessResult] = []
+    for app in apps:
+        if results and results[-1].status != "ok":
+            result = ProcessResult(app.bin_name, [], "cancelled")
         else:
-            failed.append(res)
-    for fail in failed:
-        print(f"failed to create executable {failed}", file=sys.stderr)
-    return succeeded
+            start = time.perf_counter()
+            try:
+                build_zipapp(app, site_packages[extras_key(app)], outdir / app.bin_name, jobs)
+            except (OSError, VulcanConfigError) as e:
+                result = ProcessResult(app.bin_name, [], "failed", seconds=time.perf_counter() - start, output=str(e))
+            else:
+                result = ProcessResult(app.bin_name, [], "ok", 0, time.perf_counter() - start)
+        report(result)
+        results.append(result)
+    return results
+
+
+async def build_shiv_apps(
+    from_dist: str,
+    vulcan: Vulcan,
+    outdir: Path,
+    wheelhouse: Optional[Path] = None,
+    jobs: Optional[int] = None,
+    log_dir: Optional[Path] = None,
+    report: Callable[[ProcessResult], None] = report_shiv_result,
+    use_cache: bool = True,
+    backend: str = "shiv",
+) -> List[Path]:
+    assert vulcan.dependencies is not None and vulcan.extras is not None, "shiv builds must be locked"
+    apps = vulcan.shiv_options
+    check_shiv_backend(apps, backend)
+    keys: Dict[str, Dict[str, str]] = {}
+    if use_cache:
+        digest = wheel_digest(Path(from_dist))
+        keys = {
+            app.bin_name: cache_key(app, digest, app_pins(app, vulcan.dependencies, vulcan.extras), backend)
+            for app in apps
+        }
+        fresh = [app for app in apps if is_up_to_date(outdir / app.bin_name, keys[app.bin_name])]
+        for app in fresh:
+            report(ProcessResult(app.bin_name, [], "cached"))
+        apps = [app for app in apps if app not in fresh]
+
+    results: List[ProcessResult] = []
+    if apps:
+        with tempfile.TemporaryDirectory(prefix="vulcan-shiv-") as staging:
+            site_packages = await stage_site_packages(
+                from_dist, vulcan.dependencies, vulcan.extras, apps, Path(staging), wheelhouse, staging_pip_args(apps)
+            )
+            if backend == "native":
+                results = await asyncio.to_thread(build_native_apps, apps, site_packages, outdir, jobs, report)
+            else:
+                commands = [
+                    (app.bin_name, python_command(shiv_command(app, site_packages[extras_key(app)], outdir)))
+                    for app in apps
+                ]
+                # the first failure stops the rest, there is no point finishing a partial set of executables
+                results = await run_bounded(commands, jobs, log_dir, report)
+    for result in results:
+        if result.status == "ok" and use_cache:
+            write_manifest(outdir / result.name, keys[result.name])
+        elif result.status != "ok":
+            # don't leave half-written executables behind
+            (outdir / result.name).unlink(missing_ok=True)
+            manifest_path(outdir / result.name).unlink(missing_ok=True)
+    failed = {result.name for result in results if result.status != "ok"}
+    return [outdir / app.bin_name for app in vulcan.shiv_options if app.bin_name not in failed]
+
+
+def default_runner(
+    cmd: Sequence[str], cwd: Optional[str] = None, extra_environ: Optional[Mapping[str, str]] = None
+) -> None:
+    check_call(cmd, cwd=cwd, env={**os.environ, **(extra_environ or {})})
+
+
+def quiet_runner(
+    cmd: Sequence[str], cwd: Optional[str] = None, extra_environ: Optional[Mapping[str, str]] = None
+) -> None:
+    try:
+        check_output(cmd, cwd=cwd, env={**os.environ, **(extra_environ or {})}, merge_stderr=True)
+    except subprocess.CalledProcessError as e:
+        # the build frontend only reports the exit code, the actual error is the tail end of the output
+        tail = "\n".join(e.output.decode(errors="replace").strip().splitlines()[-20:])
+        raise RuntimeError(f"build backend failed:\n{tail}") from e
+
+
+def build_dist(
+    source: Path,
+    dist_type: str,
+    outdir: Path,
+    config_settings: Dict[str, str],
+    env_pool: Optional[BuildEnvPool] = None,
+    runner: RunnerType = default_runner,
+) -> str:
+    if env_pool is None:
+        return build.ProjectBuilder(str(source), runner=runner).build(dist_type, str(outdir), config_settings)
+    with env_pool.acquire(build.ProjectBuilder(str(source)).build_system_requires) as env:
+        project = build.ProjectBuilder(
+            str(source), python_executable=env.executable, scripts_dir=env.scripts_dir, runner=runner
+        )
+        backend_requires = project.get_requires_for_build(dist_type, config_settings=config_settings)
+        env.install(unsatisfied(backend_requires, installed_distributions(site_packages(env.path))))
+        return project.build(dist_type, str(outdir), config_settings=config_settings)
+
+
+def build_shiv(
+    dist: str,
+    config: Vulcan,
+    outdir: Path,
+    wheelhouse: Optional[Path] = None,
+    jobs: Optional[int] = None,
+    log_dir: Optional[Path] = None,
+    report: Callable[[ProcessResult], None] = report_shiv_result,
+    use_cache: bool = True,
+    backend: str = "shiv",
+) -> List[Path]:
+    try:
+        if wheelhouse is not None:
+            assert config.dependencies is not None and config.extras is not None, "shiv builds must be locked"
+            pip_args = staging_pip_args(config.shiv_options)
+            fill_wheelhouse(locked_pins(config.dependencies, config.extras), wheelhouse, pip_args)
+        return asyncio.get_event_loop().run_until_complete(
+            build_shiv_apps(dist, config, outdir, wheelhouse, jobs, log_dir, report, use_cache, backend)
+        )
+    finally:
+        os.remove(dist)
+
+
+@dataclass
+class BatchBuild:
+    dist_type: str
+    shiv: bool
+    outdir: Path
+    config_settings: Dict[str, str]
+    env_pool: Optional[BuildEnvPool]
+    wheelhouse: Optional[Path] = None
+    shiv_jobs: Optional[int] = None
+    shiv_log_dir: Optional[Path] = None
+    shiv_cache: bool = True
+    shiv_backend: str = "shiv"
+
+    def __call__(self, project: Path) -> str:
+        # runs in a worker process, keep the backend's chatter out of the per-project status lines
+        try:
+            dist = build_dist(project, self.dist_type, self.outdir, self.config_settings, self.env_pool, quiet_runner)
+        except build.BuildBackendException as e:
+            raise RuntimeError(str(e.exception)) from None
+        if not self.shiv:
+            return dist
+        with contextlib.redirect_stdout(io.StringIO()):
+            config = Vulcan.from_source(project)
+            if not config.shiv_options:
+                os.remove(dist)
+                return "no shiv executables configured"
+            results: List[ProcessResult] = []
+            log_dir = self.shiv_log_dir / project.name if self.shiv_log_dir is not None else None
+            apps = build_shiv(
+                dist,
+                config,
+                self.outdir,
+                self.wheelhouse,
+                self.shiv_jobs,
+                log_dir,
+                report=results.append,
+                use_cache=self.shiv_cache,
+                backend=self.shiv_backend,
+            )
+        if len(apps) != len(config.shiv_options):
+            names = ", ".join(r.name for r in results if r.status == "failed")
+            raise RuntimeError(f"built {len(apps)} of {len(config.shiv_options)} shiv executables, {names} failed")
+        return ", ".join(str(app) for app in apps)
+
+
+def report_batch_result(result: BatchResult) -> None:
+    if result.status == "ok":
+        click.echo(f"[ok]      {result.project} ({result.seconds:.1f}s): {result.output}")
+    else:
+        click.echo(f"[{result.status}]{' ' * (8 - len(result.status))}{result.project}: {result.error}", err=True)
 
 
 @main.command(name="build")
@@ -82,54 +375,210 @@ async def build_shiv_apps(from_dist: str, vulcan: Vulcan, outdir: Path) -> List[
 @click.option("--wheel", is_flag=True, default=False)
 @click.option("--sdist", is_flag=True, default=False)
 @click.option("--shiv", is_flag=True, default=False)
-@pass_vulcan
-def build_out(config: Vulcan, outdir: Path, _lock: bool, wheel: bool, sdist: bool, shiv: bool) -> None:
+@click.option(
+    "--isolation/--no-isolation",
+    "_isolation",
+    default=False,
+    help="Build in a cached environment containing only build-system.requires",
+)
+@click.option("--max-build-envs", default=5, envvar="VULCAN_MAX_BUILD_ENVS", show_default=True)
+@click.option(
+    "--build-dir", type=Path, default=None, help="Where to put intermediate build files (default: system temp dir)"
+)
+@click.option(
+    "--projects",
+    multiple=True,
+    help="Glob (relative to the current directory) of project directories to build instead of the current one",
+)
+@click.option("--jobs", "-j", type=int, default=None, help="Number of projects to build at once with --projects")
+@click.option(
+    "--wheelhouse",
+    type=Path,
+    is_flag=False,
+    flag_value=default_wheelhouse(),
+    default=None,
+    help="Install shiv dependencies only from this wheelhouse (default: the one from `vulcan wheelhouse`)",
+)
+@click.option("--shiv-jobs", type=int, default=None, help="Number of shiv executables to build at once")
+@click.option("--shiv-log-dir", type=Path, default=None, help="Write shiv output to <dir>/<bin_name>.log")
+@click.option(
+    "--shiv-cache/--no-shiv-cache",
+    default=True,
+    help="Skip shiv executables whose wheel, locked dependencies and options haven't changed",
+)
+@click.option(
+    "--shiv-backend",
+    type=click.Choice(["shiv", "native"]),
+    default="shiv",
+    show_default=True,
+    help="Run shiv for each executable, or write them in-process with parallel compression",
+)
+@click.pass_context
+def build_out(
+    ctx: click.Context,
+    outdir: Path,
+    _lock: bool,
+    wheel: bool,
+    sdist: bool,
+    shiv: bool,
+    _isolation: bool,
+    max_build_envs: int,
+    build_dir: Optional[Path],
+    projects: Tuple[str, ...],
+    jobs: Optional[int],
+    wheelhouse: Optional[Path],
+    shiv_jobs: Optional[int],
+    shiv_log_dir: Optional[Path],
+    shiv_cache: bool,
+    shiv_backend: str,
+) -> None:
     "Create wheels, sdists, and shiv executables"
     # for ease of use
     if len([v for v in (shiv, wheel, sdist) if v]) != 1:
         raise click.UsageError("Must specify exactly 1 of --shiv, --wheel, or --sdist")
 
-    should_lock = _lock and not config.no_lock
-
     config_settings = {}
     if not _lock:
         config_settings["no-lock"] = "true"
-    project = build.ProjectBuilder(".")
-    outdir.mkdir(exist_ok=True)
-    if sdist:
-        dist = project.build("sdist", str(outdir), config_settings=config_settings)
-    elif wheel or shiv:
-        if shiv and not should_lock:
+        if shiv:
             raise click.UsageError("May not specify both --shiv and --no-lock; shiv builds must be locked")
-        dist = project.build("wheel", str(outdir), config_settings=config_settings)
-    else:
-        assert False, "unreachable because dist_types is required"
+    if build_dir is not None:
+        config_settings["build-dir"] = str(build_dir.absolute())
+    dist_type = "sdist" if sdist else "wheel"
+    env_pool = BuildEnvPool(cache_dir() / "build-envs", max_envs=max_build_envs) if _isolation else None
+    if wheelhouse is not None:
+        if not shiv:
+            raise click.UsageError("--wheelhouse is only used for --shiv builds")
+        wheelhouse = wheelhouse.absolute()
+    outdir.mkdir(exist_ok=True)
+
+    if projects:
+        found = discover_projects(Path(), projects)
+        if not found:
+            raise click.UsageError(f"No projects found matching {', '.join(projects)}")
+        try:
+            deps = local_dependencies(found)
+            build_order(deps)
+        except VulcanConfigError as e:
+            raise click.UsageError(str(e)) from e
+        click.echo(f"Building {len(found)} projects", err=True)
+        start = time.perf_counter()
+        batch = BatchBuild(
+            dist_type,
+            shiv,
+            outdir.absolute(),
+            config_settings,
+            env_pool,
+            wheelhouse,
+            shiv_jobs,
+            shiv_log_dir.absolute() if shiv_log_dir is not None else None,
+            shiv_cache,
+            shiv_backend,
+        )
+        results = run_batch(deps, batch, jobs, report=report_batch_result)
+        failed = [r for r in results if r.status != "ok"]
+        click.echo(
+            f"Built {len(results) - len(failed)} of {len(results)} projects in {time.perf_counter() - start:.1f}s",
+            err=True,
+        )
+        if failed:
+            ctx.exit(1)
+        return
+
+    config = ctx.find_object(Vulcan)
+    if config is None:
+        raise click.UsageError("No pyproject.toml in the current directory")
+    if shiv and config.no_lock:
+        raise click.UsageError("May not use --shiv for a project configured with no-lock; shiv builds must be locked")
     if shiv:
         try:
-            asyncio.get_event_loop().run_until_complete(build_shiv_apps(dist, config, outdir))
-        finally:
-            os.remove(dist)
+            check_shiv_backend(config.shiv_options, shiv_backend)
+        except VulcanConfigError as e:
+            raise click.UsageError(str(e)) from e
+    dist = build_dist(Path(), dist_type, outdir, config_settings, env_pool)
+    if shiv:
+        apps = build_shiv(
+            dist, config, outdir, wheelhouse, shiv_jobs, shiv_log_dir, use_cache=shiv_cache, backend=shiv_backend
+        )
+        if len(apps) != len(config.shiv_options):
+            click.echo(f"built {len(apps)} of {len(config.shiv_options)} shiv executables", err=True)
+            ctx.exit(1)
+
+
+@main.command(name="wheelhouse")
+@click.option("--outdir", "-o", type=Path, default=None, help="Where to put the wheels (default: in the vulcan cache)")
+@pass_vulcan
+def wheelhouse_out(config: Vulcan, outdir: Optional[Path]) -> None:
+    "Download or build a wheel for every locked dependency, for use with `build --shiv --wheelhouse`"
+    if config.dependencies is None or config.extras is None:
+        raise click.UsageError(f"{config.lockfile} does not exist, run `vulcan lock` first")
+    outdir = outdir or default_wheelhouse()
+    pins = locked_pins(config.dependencies, config.extras)
+    added = fill_wheelhouse(pins, outdir)
+    click.echo(f"{len(pins) - len(added)} of {len(pins)} locked dependencies were already in {outdir}")
 
 
 async def resolve_deps_or_report(
-    config: Vulcan, python_version: str | None = None
-) -> Tuple[List[str], Dict[str, List[str]]]:
+    config: Vulcan, python_version: str | None = None, platforms: Optional[List[str]] = None
+) -> Resolution:
     try:
-        return await resolve_deps(
+        if platforms:
+            return await resolve_platforms(
+                flatten_reqs(config.configured_dependencies),
+                config.configured_extras or {},
+                platforms,
+                python_version,
+            )
+        return await resolve(
             flatten_reqs(config.configured_dependencies),
             config.configured_extras or {},
             python_version,
         )
+    except VulcanConfigError as e:
+        raise click.UsageError(str(e)) from e
 
     except subprocess.CalledProcessError as e:
         print(e.stderr.decode(), file=sys.stderr)
         raise
 
 
+def write_lockfile(lockfile: Path, resolution: Resolution) -> None:
+    doc = tomlkit.document()
+    if resolution.platforms:
+        # locked with --platform, `vulcan lock --upgrade` can't work with it
+        doc["platforms"] = tomlkit.array(resolution.platforms)  # type: ignore
+    doc["install_requires"] = tomlkit.array(resolution.install_requires).multiline(True)  # type: ignore
+    doc["extras_require"] = {
+        k: tomlkit.array(v).multiline(True) for k, v in resolution.extras_require.items()  # type: ignore
+    }
+    # what each pin requires of the others, so `vulcan lock --upgrade` knows what else a package takes along
+    graph = tomlkit.table()
+    for name, deps in resolution.graph.items():
+        graph[name] = tomlkit.array(deps)  # type: ignore
+    doc["graph"] = graph
+    with open(lockfile, "w+") as f:
+        f.write(tomlkit.dumps(doc))
+
+
 @main.command()
+@click.option(
+    "--upgrade",
+    "-u",
+    "packages",
+    multiple=True,
+    help="Only relock this package and its dependencies, keeping every other pin",
+)
+@click.option(
+    "--platform",
+    "platforms",
+    multiple=True,
+    help="Lock for this wheel platform tag (e.g. manylinux2014_aarch64) instead of this machine, from wheels only",
+)
 @pass_vulcan
-def lock(config: Vulcan) -> None:
+def lock(config: Vulcan, packages: Tuple[str, ...] = (), platforms: Tuple[str, ...] = ()) -> None:
     "Generate and update lockfile"
+    if packages and platforms:
+        raise click.UsageError("--upgrade only works for locks of this machine, not with --platform")
 
     python_version = config.python_lock_with
     # this check does not make sense on windows as far as I can tell,
@@ -139,115 +588,329 @@ def lock(config: Vulcan) -> None:
             # default to configured lock value, then current venv value if it exists, fallback to vulcan's
             # version
             python = get_virtualenv_python()
-            python_version = subprocess.check_output(
+            python_version = check_output(
                 [
                     str(python),
                     "-c",
                     'import sys; print(f"{sys.version_info.major}.{sys.version_info.minor}")',
                 ],
-                encoding="utf-8",
             ).strip()
 
         except RuntimeError:
             pass
-    install_requires, extras_require = asyncio.get_event_loop().run_until_complete(
-        resolve_deps_or_report(config, python_version)
-    )
-    doc = tomlkit.document()
-    doc["install_requires"] = tomlkit.array(install_requires).multiline(True)  # type: ignore
-    doc["extras_require"] = {k: tomlkit.array(v).multiline(True) for k, v in extras_require.items()}  # type: ignore
-    with open(config.lockfile, "w+") as f:
-        f.write(tomlkit.dumps(doc))
+    if packages:
+        resolution = upgrade_or_report(config, packages, python_version)
+    else:
+        resolution = asyncio.get_event_loop().run_until_complete(
+            resolve_deps_or_report(config, python_version, list(platforms))
+        )
+    write_lockfile(config.lockfile, resolution)
+
+
+def upgrade_or_report(config: Vulcan, packages: Tuple[str, ...], python_version: Optional[str]) -> Resolution:
+    graph = get_graph(config.lockfile) if config.lockfile.exists() else None
+    if config.no_lock or graph is None or config.dependencies is None or config.extras is None:
+        raise click.UsageError("--upgrade needs a lockfile written by this version of vulcan, run `vulcan lock` first")
+    locked = Resolution(config.dependencies, config.extras, graph, get_platforms(config.lockfile))
+    try:
+        resolution = asyncio.get_event_loop().run_until_complete(
+            upgrade(
+                flatten_reqs(config.configured_dependencies),
+                config.configured_extras or {},
+                locked,
+                packages,
+                python_version,
+            )
+        )
+    except VulcanConfigError as e:
+        raise click.UsageError(str(e)) from e
+    except subprocess.CalledProcessError as e:
+        print(e.stderr.decode(), file=sys.stderr)
+        raise
+    before = set(chain(locked.install_requires, *locked.extras_require.values()))
+    after = set(chain(resolution.install_requires, *resolution.extras_require.values()))
+    for pin in sorted(before - after):
+        click.echo(f"- {pin}")
+    for pin in sorted(after - before):
+        click.echo(f"+ {pin}")
+    if before == after:
+        click.echo(f"{', '.join(packages)} already locked at the newest version that fits")
+    return resolution
+
+
+def added_version(req: Requirement, installed: Mapping[str, metadata.Distribution]) -> str:
+    "The version spec `vulcan add` writes for req, once it has been installed"
+    if req.specifier:
+        # if the user gave a version spec, we blindly take that
+        return str(req.specifier)
+    dist = installed.get(canonicalize_name(req.name))
+    if dist is None:
+        # failed to find the thing we just installed, give up.
+        return ""
+    spec = packaging.version.parse(dist.version)
+    return f"~={spec.major}.{spec.minor}"
+
+
+def already_locked(added: Mapping[str, str], config: Vulcan) -> bool:
+    """
+    Whether the lockfile's base pins already satisfy the added dependencies (name to version spec), in which case
+    they and everything they need are in the lock and resolving again would not change it.
+    """
+    if config.no_lock or config.dependencies is None:
+        return False
+    pins = {}
+    for line in config.dependencies:
+        pin = packaging.requirements.Requirement(line)
+        specs = list(pin.specifier)
+        if len(specs) == 1 and specs[0].operator == "==" and (pin.marker is None or pin.marker.evaluate()):
+            pins[canonicalize_name(pin.name)] = specs[0].version
+    for name, spec in added.items():
+        req = packaging.requirements.Requirement(f"{name}{spec}")
+        locked = pins.get(canonicalize_name(req.name))
+        if req.extras or locked is None or not req.specifier.contains(locked, prereleases=True):
+            return False
+    return True
 
 
 @main.command()
-@click.argument("req", type=Requirement.parse)
+@click.argument("reqs", nargs=-1, required=True, type=Requirement.parse)
 @click.option("--lock/--no-lock", "_lock", default=True)
 @pass_vulcan  # order matters, closest to the function definition comes first
 @click.pass_context
-def add(ctx: click.Context, config: Vulcan, req: Requirement, _lock: bool) -> None:
-    "Add new top-level dependency and regenerate lockfile"
-    name: str = req.name
-    if req.extras:
-        name = f'{name}[{",".join(req.extras)}]'
+def add(ctx: click.Context, config: Vulcan, reqs: Tuple[Requirement, ...], _lock: bool) -> None:
+    "Add new top-level dependencies and regenerate lockfile"
     try:
         venv_python = get_virtualenv_python()
     except RuntimeError:
         exit("Must be in a virtualenv to use `vulcan add`")
-    subprocess.check_call([str(venv_python), "-m", "pip", "install", str(req)])
-    if req.specifier:
-        # if the user gave a version spec, we blindly take that
-        version = str(req.specifier)
-    else:
-        # otherwise, we take a freeze to see what was actually installed
-        freeze = subprocess.check_output([str(venv_python), "-m", "pip", "freeze"], encoding="utf-8").strip()
-        try:
-            # try and find the thing we just added
-            line = next(ln for ln in freeze.split("\n") if ln.startswith(req.name))
-            # and parse it to a version
-            spec = packaging.version.parse(
-                str(Requirement.parse(line.strip()).specifier)[2:]
-            )  # remove the == at the start
-            version = f"~={spec.major}.{spec.minor}"
-        except StopIteration:
-            # failed to find the thing we just installed, give up.
-            version = ""
+    check_call(python_command([str(venv_python), "-m", "pip", "install", *(str(req) for req in reqs)]))
+    # read what was actually installed straight from the venv's metadata
+    installed = installed_distributions(site_packages(venv_python.parent.parent))
+    added = {}
+    for req in reqs:
+        name: str = req.name
+        if req.extras:
+            name = f'{name}[{",".join(req.extras)}]'
+        added[name] = added_version(req, installed)
     with open("pyproject.toml") as f:
         parse = tomlkit.parse(f.read())
     deps = parse["tool"]["vulcan"].setdefault("dependencies", tomlkit.table())  # type: ignore
-    deps[name] = version
+    deps.update(added)
     with open("pyproject.toml", "w+") as f:
         f.write(tomlkit.dumps(parse))
     if not config.no_lock and _lock:
+        if already_locked(added, config):
+            click.echo(f"{config.lockfile} already pins {', '.join(added)}, not relocking")
+            return
         ctx.obj = Vulcan.from_source(Path().absolute(), fail_on_missing_lock=False)
         ctx.invoke(lock)
 
 
-def install_dev_dependencies(target: str | None = None) -> None:
+def install_dev_dependencies(target: str | None = None, missing: Dict[str, List[str]] | None = None) -> None:
+    "Install the dev dependency groups, or with missing from a DevelopPlan only the requirements it lists"
     config = Vulcan.from_source(Path().absolute(), fail_on_missing_lock=False)
 
     try:
         virtual_env = get_virtualenv_python()
     except RuntimeError:
         exit("may not use vulcan develop outside of a virtualenv")
-    pip_version = get_pip_version(virtual_env)
-    if pip_version is None or pip_version < (21, 3):
-        print(
-            f"pip version {pip_version} does not support editable installs for PEP517 projects,"
-            " Please upgrade your pip"
-        )
+    if missing is None or any(missing.values()):
+        pip_version = get_pip_version(virtual_env)
+        if pip_version is None or pip_version < (21, 3):
+            print(
+                f"pip version {pip_version} does not support editable installs for PEP517 projects,"
+                " Please upgrade your pip"
+            )
 
     if target is not None and target not in config.dev_dependencies:
         raise click.UsageError(f"No such dev dependency {target}")
     if config.dev_dependencies:
         for name, section in config.dev_dependencies.items():
             if target is None or name == target:
+                reqs = flatten_reqs(section) if missing is None else missing[name]
+                if not reqs:
+                    print(f"Dev dependencies for {name} are already installed", flush=True)
+                    continue
                 print(f"Installing dev dependencies for {name}", flush=True)
-                # print(subprocess.check_output(...)) instead of just subprocess.check_call(...)
+                # print(check_output(...)) instead of just check_call(...)
                 # purely because the CliRunner fixture isn't very good at actually capturing stdout, and it
                 # breaks pytest's capsys which _is_ usually good at that
                 # ah well
                 print(
-                    subprocess.check_output(
-                        [
-                            str(virtual_env),
-                            "-m",
-                            "pip",
-                            "install",
-                            *(flatten_reqs(section) or []),
-                        ],
-                        encoding="utf-8",
+                    check_output(
+                        python_command(
+                            [
+                                str(virtual_env),
+                                "-m",
+                                "pip",
+                                "install",
+                                *reqs,
+                            ]
+                        ),
                     ),
                     flush=True,
                 )
 
 
+def current_develop_plan(target: Optional[str]) -> DevelopPlan:
+    config = Vulcan.from_source(Path().absolute())
+    virtual_env = os.environ.get("VIRTUAL_ENV")
+    if virtual_env is None:
+        exit("may not use vulcan develop outside of a virtualenv")
+    try:
+        return plan_develop(config, Path(virtual_env), target)
+    except VulcanConfigError as e:
+        raise click.UsageError(str(e)) from e
+
+
+def install_missing_project_requirements(requirements: List[str]) -> None:
+    print("Installing missing project dependencies", flush=True)
+    pip_call = [str(get_virtualenv_python()), "-m", "pip", "install", *requirements]
+    print(check_output(python_command(pip_call)), flush=True)
+
+
+def install_combined(target: Optional[str], build_isolation: bool, plan: Optional[DevelopPlan] = None) -> None:
+    config = Vulcan.from_source(Path().absolute())
+    try:
+        virtual_env = get_virtualenv_python()
+    except RuntimeError:
+        exit("may not use vulcan develop outside of a virtualenv")
+    try:
+        args = combined_install_args(config, target, Path(os.environ["VIRTUAL_ENV"]), plan)
+    except VulcanConfigError as e:
+        raise click.UsageError(str(e)) from e
+    pip_call = [str(virtual_env), "-m", "pip", "install", *args]
+    if not build_isolation:
+        pip_call.append("--no-build-isolation")
+    print("Installing the project and dev dependencies", flush=True)
+    # printed rather than passed through, see install_dev_dependencies
+    print(check_output(python_command(pip_call)), flush=True)
+
+
 @main.command()
 @click.argument("dev_deps_target", required=False, type=str)
 @click.option("--build-isolation/--no-build-isolation", "_build_isolation", default=True)
-def develop(dev_deps_target: Optional[str], _build_isolation: bool) -> None:
-    install_develop(_build_isolation)
-    install_dev_dependencies(target=dev_deps_target)
+@click.option(
+    "--combined",
+    is_flag=True,
+    default=False,
+    help="Install the project and all dev dependency groups in a single pip run, after checking they don't conflict",
+)
+@click.option(
+    "--reinstall", is_flag=True, default=False, help="Run pip for everything, even if it looks to be installed already"
+)
+def develop(dev_deps_target: Optional[str], _build_isolation: bool, combined: bool, reinstall: bool) -> None:
+    plan = None
+    if not reinstall:
+        plan = current_develop_plan(dev_deps_target)
+        if plan.up_to_date:
+            print("The project and its dev dependencies are already installed", flush=True)
+            return
+    if combined:
+        install_combined(dev_deps_target, _build_isolation, plan)
+        return
+    if plan is None or plan.reinstall_project:
+        install_develop(_build_isolation)
+    elif plan.missing[PROJECT]:
+        install_missing_project_requirements(plan.missing[PROJECT])
+    install_dev_dependencies(target=dev_deps_target, missing=plan.missing if plan is not None else None)
+
+
+@main.command()
+@click.option("--extra", "-e", "extras", multiple=True, help="Only the pins for this extra (default: all extras)")
+@click.option("--no-extras", is_flag=True, default=False, help="None of the extras' pins")
+@click.option("--dev", "-d", "dev", multiple=True, help="Only this dev dependency group (default: all groups)")
+@click.option("--no-dev", is_flag=True, default=False, help="None of the dev dependencies")
+@click.option(
+    "--wheelhouse",
+    type=Path,
+    is_flag=False,
+    flag_value=default_wheelhouse(),
+    default=None,
+    help="Install from this wheelhouse, offline if it has everything (default: the one from `vulcan wheelhouse`)",
+)
+@click.option("--dry-run", is_flag=True, default=False, help="Only print what would change")
+@pass_vulcan
+def sync(
+    config: Vulcan,
+    extras: Tuple[str, ...],
+    no_extras: bool,
+    dev: Tuple[str, ...],
+    no_dev: bool,
+    wheelhouse: Optional[Path],
+    dry_run: bool,
+) -> None:
+    "Make the virtualenv hold exactly the locked dependencies (and dev dependencies), nothing more or less"
+    virtual_env = os.environ.get("VIRTUAL_ENV")
+    if virtual_env is None:
+        raise click.UsageError("may not use vulcan sync outside of a virtualenv")
+    venv = Path(virtual_env)
+    try:
+        plan = plan_sync(config, venv, [] if no_extras else extras or None, [] if no_dev else dev or None)
+    except VulcanConfigError as e:
+        raise click.UsageError(str(e)) from e
+
+    if plan.up_to_date:
+        click.echo(f"{venv} already matches the lockfile, all {len(plan.satisfied)} requirements are satisfied")
+        return
+    for name in plan.remove:
+        click.echo(f"- {name}")
+    for req in plan.install:
+        click.echo(f"+ {req}")
+    pip_runs = bool(plan.remove) + bool(plan.install)
+    if not dry_run:
+        python = str(get_virtualenv_python())
+        if plan.remove:
+            uninstall = [python, "-m", "pip", "uninstall", "--disable-pip-version-check", "-y", *plan.remove]
+            check_call(python_command(uninstall))
+        if plan.install:
+            with tempfile.TemporaryDirectory() as tmp:
+                constraints_file = Path(tmp, "constraints.txt")
+                # so whatever the dev dependencies pull in can't move the locked pins
+                constraints_file.write_text("".join(f"{line}\n" for line in constraints(plan.locked)))
+                cmd = [python, "-m", "pip", "install", "--disable-pip-version-check", "-c", str(constraints_file)]
+                if wheelhouse is not None:
+                    cmd += ["--find-links", str(wheelhouse.absolute())]
+                    if same_python(venv) and not missing_pins(plan.install, wheelhouse):
+                        cmd.append("--no-index")
+                check_call(python_command([*cmd, *plan.install]))
+
+    total = len(plan.satisfied) + len(plan.install)
+    runs = f"{pip_runs} pip run{'' if pip_runs == 1 else 's'}"
+    if dry_run:
+        changes = f"would install {len(plan.install)} and remove {len(plan.remove)} with {runs}"
+    else:
+        changes = f"installed {len(plan.install)} and removed {len(plan.remove)} with {runs}"
+    click.echo(f"{len(plan.satisfied)} of {total} requirements were already satisfied and left alone, {changes}")
+
+
+@main.command()
+@click.option("--extra", "-e", "extras", multiple=True, help="Also check the pins for this extra")
+@click.option("--lockfile", type=Path, default=None, help="The lockfile to check (default: the project's)")
+@click.pass_context
+def verify(ctx: click.Context, extras: Tuple[str, ...], lockfile: Optional[Path]) -> None:
+    "Check that the virtualenv (or vulcan's own environment outside one) has exactly the locked versions"
+    if lockfile is None:
+        config = ctx.find_object(Vulcan)
+        if config is None:
+            raise click.UsageError("No pyproject.toml in the current directory, pass --lockfile")
+        lockfile = config.lockfile
+    start = time.perf_counter()
+    paths = environment = None
+    virtual_env = os.environ.get("VIRTUAL_ENV")
+    if virtual_env is not None:
+        paths, environment = site_packages(Path(virtual_env)), venv_environment(Path(virtual_env))
+    try:
+        mismatches = verify_lockfile(lockfile, extras, paths, environment)
+    except (OSError, VulcanConfigError) as e:
+        raise click.UsageError(str(e)) from e
+    for mismatch in mismatches:
+        click.echo(str(mismatch), err=True)
+    elapsed = (time.perf_counter() - start) * 1000
+    if mismatches:
+        click.echo(f"{len(mismatches)} locked requirements don't match the environment ({elapsed:.0f}ms)", err=True)
+        ctx.exit(1)
+    click.echo(f"The environment matches {lockfile} ({elapsed:.0f}ms)")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,212 @@
+"""
+Work out what `vulcan develop` installs: the project itself with its locked dependencies, and the dev dependency
+groups. Having it all in one place lets it be checked for conflicts and installed with a single pip run.
+"""
+from __future__ import annotations
+import ast
+import json
+from dataclasses import dataclass
+from importlib import metadata
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import tomlkit
+from packaging.markers import default_environment
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.utils import canonicalize_name
+
+from vulcan import Vulcan, VulcanConfigError, flatten_reqs
+from vulcan.installed import installed_distributions, site_packages, unsatisfied
+
+PROJECT = "project"
+
+
+def editable_requirement(config: Vulcan) -> str:
+    path = str(config.source_path.absolute())
+    if config.configured_extras:
+        path = f'{path}[{",".join(config.configured_extras)}]'
+    return path
+
+
+def project_requirements(config: Vulcan) -> List[str]:
+    "What installing the project with all its extras pulls in"
+    if config.no_lock or config.dependencies is None:
+        return [*flatten_reqs(config.configured_dependencies), *chain.from_iterable(config.configured_extras.values())]
+    return [*config.dependencies, *chain.from_iterable((config.extras or {}).values())]
+
+
+def dev_groups(config: Vulcan, target: Optional[str] = None) -> Dict[str, List[str]]:
+    if target is not None and target not in config.dev_dependencies:
+        raise VulcanConfigError(f"No such dev dependency {target}")
+    return {
+        name: flatten_reqs(section)
+        for name, section in config.dev_dependencies.items()
+        if target is None or name == target
+    }
+
+
+def venv_environment(venv: Path) -> Dict[str, str]:
+    "Marker environment for the venv's python, which needn't be the one running vulcan"
+    environment = default_environment()
+    try:
+        cfg = (venv / "pyvenv.cfg").read_text()
+    except OSError:
+        return environment
+    values = dict(line.partition("=")[::2] for line in cfg.splitlines())
+    values = {key.strip(): value.strip() for key, value in values.items()}
+    # venv writes version, virtualenv version_info
+    full_version = values.get("version") or values.get("version_info", "")
+    parts = full_version.split(".")
+    if len(parts) >= 3 and all(part.isdigit() for part in parts[:3]):
+        environment["python_full_version"] = ".".join(parts[:3])
+        environment["python_version"] = ".".join(parts[:2])
+        if environment["implementation_name"] == "cpython":
+            environment["implementation_version"] = environment["python_full_version"]
+    return environment
+
+
+@dataclass
+class Conflict:
+    name: str
+    requirements: List[Tuple[str, str]]  # (where it comes from, requirement)
+
+    def __str__(self) -> str:
+        wanted = ", ".join(f"{source} wants {req}" for source, req in self.requirements)
+        return f"{self.name}: {wanted}"
+
+
+def find_conflicts(
+    sources: Mapping[str, Iterable[str]], environment: Optional[Dict[str, str]] = None
+) -> List[Conflict]:
+    """
+    Packages that no single version can satisfy all the requirements for. Only exact pins are checked against the
+    other requirements, whether two ranges overlap is left to pip.
+    """
+    by_name: Dict[str, List[Tuple[str, Requirement]]] = {}
+    for source, lines in sources.items():
+        for line in lines:
+            try:
+                req = Requirement(line)
+            except InvalidRequirement:
+                continue
+            if req.marker is not None and not req.marker.evaluate(environment):
+                continue
+            by_name.setdefault(canonicalize_name(req.name), []).append((source, req))
+
+    conflicts = []
+    for name, reqs in by_name.items():
+        pins = {
+            spec.version
+            for _, req in reqs
+            for spec in req.specifier
+            if spec.operator in ("==", "===") and not spec.version.endswith("*")
+        }
+        if any(not req.specifier.contains(pin, prereleases=True) for pin in pins for _, req in reqs):
+            conflicts.append(Conflict(name, [(source, str(req)) for source, req in reqs]))
+    return conflicts
+
+
+def project_name(config: Vulcan) -> str:
+    pyproject = tomlkit.loads((config.source_path / "pyproject.toml").read_text())
+    return str(pyproject["project"]["name"])
+
+
+def _unconditional(requirements: Iterable[str]) -> Set[Tuple[str, str]]:
+    reqs: Set[Tuple[str, str]] = set()
+    for line in requirements:
+        try:
+            req = Requirement(line)
+        except InvalidRequirement:
+            continue
+        reqs.add((canonicalize_name(req.name), str(req.specifier)))
+    return reqs
+
+
+def _mapped_paths(finder: Path) -> List[str]:
+    "Files the editables redirector maps modules to, from its F.map_module(name, path) calls"
+    paths = []
+    for node in ast.walk(ast.parse(finder.read_text())):
+        if isinstance(node, ast.Call) and getattr(node.func, "attr", None) == "map_module" and len(node.args) == 2:
+            path = node.args[1]
+            if isinstance(path, ast.Constant) and isinstance(path.value, str):
+                paths.append(path.value)
+    return paths
+
+
+def editable_is_current(config: Vulcan, installed: Mapping[str, metadata.Distribution]) -> bool:
+    """
+    Whether the project is installed editable from this directory, with the .pth files and module mapping intact
+    and the same dependencies as the project has now.
+    """
+    dist = installed.get(canonicalize_name(project_name(config)))
+    if dist is None:
+        return False
+    try:
+        direct_url = json.loads(dist.read_text("direct_url.json") or "")
+    except ValueError:
+        return False
+    if not direct_url.get("dir_info", {}).get("editable"):
+        return False
+    if Path(url2pathname(urlparse(direct_url.get("url", "")).path)).resolve() != config.source_path.resolve():
+        return False
+
+    files = [Path(str(dist.locate_file(f))) for f in dist.files or []]
+    pths = [f for f in files if f.suffix == ".pth"]
+    if not pths or not all(f.is_file() for f in files if f.suffix in (".pth", ".py")):
+        return False
+    pth_lines = set(chain.from_iterable(f.read_text().splitlines() for f in pths))
+    if str(config.source_path.resolve()) not in pth_lines and str(config.source_path) not in pth_lines:
+        return False
+    finders = [f for f in files if f.suffix == ".py" and f.parent == Path(str(dist.locate_file("")))]
+    if not all(Path(path).exists() for finder in finders for path in _mapped_paths(finder)):
+        return False
+
+    # the editable wheel also depends on editables itself
+    installed_requires = {req for req in _unconditional(dist.requires or []) if req[0] != "editables"}
+    return installed_requires == _unconditional(project_requirements(config))
+
+
+@dataclass
+class DevelopPlan:
+    reinstall_project: bool
+    missing: Dict[str, List[str]]  # requirements not satisfied by the venv, for the project and each dev group
+
+    @property
+    def up_to_date(self) -> bool:
+        return not self.reinstall_project and not any(self.missing.values())
+
+
+def plan_develop(config: Vulcan, venv: Path, target: Optional[str] = None) -> DevelopPlan:
+    "What `vulcan develop` still has to install into venv, worked out without running pip"
+    installed = installed_distributions(site_packages(venv))
+    environment = venv_environment(venv)
+    sources = {PROJECT: project_requirements(config), **dev_groups(config, target)}
+    return DevelopPlan(
+        not editable_is_current(config, installed),
+        {source: unsatisfied(reqs, installed, environment) for source, reqs in sources.items()},
+    )
+
+
+def combined_install_args(
+    config: Vulcan, target: Optional[str] = None, venv: Optional[Path] = None, plan: Optional[DevelopPlan] = None
+) -> List[str]:
+    """
+    pip install arguments for the editable project and the dev dependencies together, or with a plan only for what
+    it says is missing. Raises VulcanConfigError if they can't all be installed at once.
+    """
+    groups = dev_groups(config, target)
+    environment = venv_environment(venv) if venv is not None else None
+    conflicts = find_conflicts({PROJECT: project_requirements(config), **groups}, environment)
+    if conflicts:
+        listed = "".join(f"\n  {conflict}" for conflict in conflicts)
+        raise VulcanConfigError(f"dev dependencies conflict with each other or the project:{listed}")
+    if plan is not None:
+        project = ["-e", editable_requirement(config)] if plan.reinstall_project else plan.missing[PROJECT]
+        groups = {name: plan.missing[name] for name in groups}
+    else:
+        project = ["-e", editable_requirement(config)]
+    # the same requirement in several groups only needs asking for once
+    return [*project, *dict.fromkeys(chain.from_iterable(groups.values()))]
@@ -0,0 +1,206 @@
+"""
+List the files in a project from the git index rather than by walking the directory tree.
+
+Walking the tree is what makes MANIFEST.in handling slow in checkouts that also contain large untracked
+directories (data, virtualenvs, build output). The index already has the list of tracked files, and reading it
+directly is much cheaper than walking or shelling out to git.
+"""
+from __future__ import annotations
+import os
+import re
+import struct
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from setuptools.command.egg_info import FileList, egg_info, manifest_maker, translate_pattern
+
+# https://git-scm.com/docs/index-format
+_HEADER = struct.Struct(">4sLL")
+# ctime, mtime (seconds + nanoseconds each), dev, ino, mode, uid, gid, size
+_ENTRY_STAT = struct.Struct(">10L")
+_FLAG_EXTENDED = 0x4000
+_MODE_TYPE_MASK = 0o170000
+_MODE_DIRECTORY = 0o040000  # only in sparse indexes
+_MODE_GITLINK = 0o160000  # submodules
+
+
+class UnsupportedIndex(Exception):
+    pass
+
+
+def find_git_dir(start: Path) -> Optional[Tuple[Path, Path]]:
+    "The top of the worktree containing start and its git directory, if start is in a git checkout"
+    for directory in [start, *start.parents]:
+        dot_git = directory / ".git"
+        if dot_git.is_dir():
+            return directory, dot_git
+        if dot_git.is_file():
+            # worktrees and submodules: a file pointing at the real git directory
+            m = re.match(r"gitdir:\s*(.+)", dot_git.read_text().strip())
+            if m:
+                return directory, (directory / m.group(1)).resolve()
+    return None
+
+
+def _hash_size(git_dir: Path) -> int:
+    config = git_dir / "config"
+    # worktrees share the config of the main repository
+    commondir = git_dir / "commondir"
+    if commondir.is_file():
+        config = (git_dir / commondir.read_text().strip()) / "config"
+    if config.is_file() and re.search(r"^\s*objectformat\s*=\s*sha256\s*$", config.read_text(), re.I | re.M):
+        return 32
+    return 20
+
+
+def _varint(data: bytes, pos: int) -> Tuple[int, int]:
+    # the "offset" varint from git's varint.c, which differs from the usual LEB128
+    c = data[pos]
+    pos += 1
+    value = c & 0x7F
+    while c & 0x80:
+        c = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (c & 0x7F)
+    return value, pos
+
+
+def read_index(index: Path, hash_size: int = 20) -> List[str]:
+    "Paths of the regular files and symlinks in a git index file, relative to the top of the worktree"
+    data = index.read_bytes()
+    signature, version, count = _HEADER.unpack_from(data)
+    if signature != b"DIRC" or version not in (2, 3, 4):
+        raise UnsupportedIndex(f"{index}: not a version 2, 3 or 4 git index")
+    pos = _HEADER.size
+    paths: List[str] = []
+    previous = b""
+    for _ in range(count):
+        entry_start = pos
+        mode = _ENTRY_STAT.unpack_from(data, pos)[6]
+        pos += _ENTRY_STAT.size + hash_size
+        (flags,) = struct.unpack_from(">H", data, pos)
+        pos += 2
+        if version >= 3 and flags & _FLAG_EXTENDED:
+            pos += 2
+        if version == 4:
+            strip, pos = _varint(data, pos)
+            end = data.index(b"\0", pos)
+            keep = len(previous) - strip
+            path = previous[:keep] + data[pos:end]
+            pos = end + 1
+        else:
+            end = data.index(b"\0", pos)
+            path = data[pos:end]
+            # entries are NUL padded to a multiple of 8 bytes
+            pos = entry_start + ((end - entry_start) // 8 + 1) * 8
+        previous = path
+
+        if mode & _MODE_TYPE_MASK == _MODE_DIRECTORY:
+            raise UnsupportedIndex(f"{index}: sparse indexes are not supported")
+        stage = (flags >> 12) & 0x3
+        if stage == 0 and mode & _MODE_TYPE_MASK != _MODE_GITLINK:
+            paths.append(path.decode("utf-8", "surrogateescape"))
+
+    # with a split index most of the entries live in a different file
+    if b"link" in _extension_signatures(data, pos, hash_size):
+        raise UnsupportedIndex(f"{index}: split indexes are not supported")
+    return paths
+
+
+def _extension_signatures(data: bytes, pos: int, hash_size: int) -> List[bytes]:
+    signatures = []
+    while pos + 8 <= len(data) - hash_size:
+        signature, size = struct.unpack_from(">4sL", data, pos)
+        signatures.append(signature)
+        pos += 8 + size
+    return signatures
+
+
+def tracked_files(project_dir: Path) -> Optional[List[str]]:
+    """
+    Files tracked by git under project_dir, relative to project_dir and using os.sep, or None if project_dir is not
+    in a git checkout or the index can't be read.
+    """
+    project_dir = project_dir.resolve()
+    found = find_git_dir(project_dir)
+    if found is None or not (found[1] / "index").is_file():
+        return None
+    worktree, git_dir = found
+    try:
+        paths = read_index(git_dir / "index", _hash_size(git_dir))
+    except (UnsupportedIndex, struct.error, ValueError, IndexError):
+        return None
+    prefix = project_dir.relative_to(worktree).as_posix()
+    if prefix != ".":
+        prefix += "/"
+        paths = [p.replace(prefix, "", 1) for p in paths if p.startswith(prefix)]
+    if os.sep != "/":
+        paths = [p.replace("/", os.sep) for p in paths]
+    return paths
+
+
+class GitFileList(FileList):
+    """
+    MANIFEST.in rules matched against the files tracked by git instead of against whatever is on disk. Outside of
+    a git checkout this behaves exactly like the setuptools FileList.
+    """
+
+    def __init__(self, tracked: Optional[List[str]]) -> None:
+        super().__init__()
+        self.tracked = tracked
+
+    def findall(self, dir: str | os.PathLike[str] = os.curdir) -> None:
+        if self.tracked is None:
+            super().findall(dir)
+        else:
+            self.allfiles = self.tracked
+
+    def _include_matching(self, pattern: str, tracked: List[str]) -> bool:
+        match = translate_pattern(pattern)  # type: ignore[no-untyped-call]
+        found = [f for f in tracked if match.match(f)]
+        self.extend(found)
+        return bool(found)
+
+    def include(self, pattern: str) -> bool:
+        if self.tracked is None:
+            return bool(super().include(pattern))  # type: ignore[no-untyped-call]
+        return self._include_matching(pattern, self.tracked)
+
+    def recursive_include(self, dir: str, pattern: str) -> bool:
+        if self.tracked is None:
+            return bool(super().recursive_include(dir, pattern))  # type: ignore[no-untyped-call]
+        return self._include_matching(os.path.join(dir, "**", pattern), self.tracked)
+
+    def graft(self, dir: str) -> bool:
+        if self.tracked is None or not self._is_in_project(dir):
+            # the egg-info is grafted too, and that is not in the source tree
+            return bool(super().graft(dir))  # type: ignore[no-untyped-call]
+        return self._include_matching(os.path.join(dir, "**"), self.tracked)
+
+    @staticmethod
+    def _is_in_project(path: str) -> bool:
+        return not (os.path.isabs(path) or path == os.pardir or path.startswith(os.pardir + os.sep))
+
+
+class GitManifestMaker(manifest_maker):
+    def run(self) -> None:
+        # same as manifest_maker.run, apart from the file list
+        self.filelist = GitFileList(tracked_files(Path()))
+        if not os.path.exists(self.manifest):
+            self.write_manifest()  # it must exist so it'll get in the list
+        self.add_defaults()
+        if os.path.exists(self.template):
+            self.read_template()
+        self.add_license_files()
+        self.prune_file_list()
+        self.filelist.sort()
+        self.filelist.remove_duplicates()
+        self.write_manifest()
+
+
+class GitEggInfo(egg_info):
+    def find_sources(self) -> None:
+        mm = GitManifestMaker(self.distribution)
+        mm.manifest = os.path.join(self.egg_info, "SOURCES.txt")
+        mm.run()
+        self.filelist = mm.filelist
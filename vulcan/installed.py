@@ -0,0 +1,48 @@
+from __future__ import annotations
+import sys
+from importlib import metadata
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional
+
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.utils import canonicalize_name
+
+
+def site_packages(env_dir: Path) -> List[Path]:
+    # works for any venv, not only ones created by the running interpreter, so we can't ask sysconfig
+    if sys.platform == "win32":
+        return [p for p in [env_dir / "Lib" / "site-packages"] if p.is_dir()]
+    return sorted(p for p in env_dir.glob("lib*/python*/site-packages") if p.is_dir())
+
+
+def installed_distributions(paths: Iterable[Path]) -> Dict[str, metadata.Distribution]:
+    installed: Dict[str, metadata.Distribution] = {}
+    for dist in metadata.distributions(path=[str(p) for p in paths]):
+        name = dist.metadata["Name"]
+        if not name:
+            # broken or half-uninstalled distribution, pip ignores these too
+            continue
+        # first one found wins, same as the import system
+        installed.setdefault(canonicalize_name(name), dist)
+    return installed
+
+
+def unsatisfied(
+    requirements: Iterable[str],
+    installed: Mapping[str, metadata.Distribution],
+    environment: Optional[Dict[str, str]] = None,
+) -> List[str]:
+    missing = []
+    for line in requirements:
+        try:
+            req = Requirement(line)
+        except InvalidRequirement:
+            # not something we can check (urls, paths, ...), so assume it needs installing
+            missing.append(line)
+            continue
+        if req.marker is not None and not req.marker.evaluate(environment):
+            continue
+        dist = installed.get(canonicalize_name(req.name))
+        if dist is None or not req.specifier.contains(dist.version, prereleases=True):
+            missing.append(line)
+    return missing
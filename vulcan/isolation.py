@@ -1,18 +1,32 @@
 from __future__ import annotations
-import asyncio
+import hashlib
+import json
+import os
 import shlex
 import subprocess
 import sys
 import shutil
 import tempfile
+import time
 from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import islice
 from os import PathLike
+from pathlib import Path
 from types import SimpleNamespace
-from typing import Dict, Generator, List, Union
+from typing import IO, Any, Collection, Dict, Generator, List, Optional, Tuple, Union, cast
 from venv import EnvBuilder
 
+import packaging.requirements
 from pkg_resources import Requirement
 
+from vulcan.installed import installed_distributions, site_packages, unsatisfied
+from vulcan.process import check_output, run_async
+from vulcan.profiling import python_command
+
+if sys.platform != "win32":
+    import fcntl
+
 
 @contextmanager
 def create_venv(
@@ -89,12 +103,13 @@ class VulcanEnvBuilder(EnvBuilder):
     def _setup_pip(self, context: SimpleNamespace) -> None:
         super()._setup_pip(context)
         cmd = [context.env_exe, "-Im", "pip", "install", "--upgrade", "pip"]
-        subprocess.check_output(cmd, stderr=subprocess.STDOUT)
+        check_output(python_command(cmd), merge_stderr=True)
 
     async def install(
         self,
         deps_dir: Union[str, bytes, "PathLike[str]", "PathLike[bytes]"],
         requirements: List[str],
+        constraints: Optional[List[str]] = None,
     ) -> None:
         # install Isolated with module pip using pep517
         if not requirements:
@@ -109,13 +124,45 @@ class VulcanEnvBuilder(EnvBuilder):
             "--target",
             str(deps_dir),
         ] + requirements
-        proc = await asyncio.create_subprocess_exec(
-            *cmd, stderr=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE
-        )
-        out, err = await proc.communicate()
-        assert proc.returncode is not None
+        with tempfile.TemporaryDirectory() as tmp:
+            if constraints:
+                constraints_file = Path(tmp, "constraints.txt")
+                constraints_file.write_text("".join(f"{line}\n" for line in constraints))
+                cmd += ["-c", str(constraints_file)]
+            proc = await run_async(python_command(cmd), capture_output=True)
         if proc.returncode != 0:
-            raise subprocess.CalledProcessError(returncode=proc.returncode, cmd=cmd, output=out, stderr=err)
+            raise subprocess.CalledProcessError(
+                returncode=proc.returncode, cmd=cmd, output=proc.stdout, stderr=proc.stderr
+            )
+
+    async def report(self, requirements: List[str], platform: str, python_version: str) -> Dict[str, Any]:
+        "pip's installation report for requirements on another platform, from the metadata of binary wheels alone"
+        with tempfile.TemporaryDirectory() as target:
+            cmd = [
+                self.context.env_exe,
+                "-Im",
+                "pip",
+                "install",
+                "--dry-run",
+                "--ignore-installed",
+                "--quiet",
+                "--report",
+                "-",
+                "--only-binary=:all:",
+                "--platform",
+                platform,
+                "--python-version",
+                python_version,
+                # pip only takes --platform along with a --target, even for a dry run
+                "--target",
+                target,
+            ] + requirements
+            proc = await run_async(python_command(cmd), capture_output=True)
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(
+                returncode=proc.returncode, cmd=cmd, output=proc.stdout, stderr=proc.stderr
+            )
+        return cast(Dict[str, Any], json.loads(proc.stdout))
 
     async def freeze(
         self, deps_dir: Union[str, bytes, "PathLike[str]", "PathLike[bytes]"]
@@ -131,13 +178,219 @@ class VulcanEnvBuilder(EnvBuilder):
             str(deps_dir),
         ]
 
-        frozen = await asyncio.create_subprocess_exec(
-            *cmd, stderr=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE
-        )
-
-        out, err = await frozen.communicate()
-        assert frozen.returncode is not None
+        frozen = await run_async(python_command(cmd), capture_output=True)
         if frozen.returncode != 0:
-            raise subprocess.CalledProcessError(returncode=frozen.returncode, cmd=cmd, output=out, stderr=err)
-        reqs = [Requirement.parse(line) for line in out.decode().split("\n") if line]
+            raise subprocess.CalledProcessError(
+                returncode=frozen.returncode, cmd=cmd, output=frozen.stdout, stderr=frozen.stderr
+            )
+        reqs = [Requirement.parse(line) for line in frozen.stdout.decode().split("\n") if line]
         return {Requirement.parse(req.name): req for req in reqs}
+
+
+# written last when creating a pooled build env, an env directory without it is incomplete
+BUILD_ENV_MARKER = "vulcan-build-env.json"
+# an incomplete env older than this is assumed to belong to a crashed build
+STALE_BUILD_ENV_SECONDS = 60 * 60
+
+
+def build_env_key(requires: Collection[str]) -> str:
+    normalized = sorted({str(packaging.requirements.Requirement(req)) for req in requires})
+    payload = json.dumps({"requires": normalized, "python": sys.executable, "version": sys.version})
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+@dataclass
+class BuildEnv:
+    path: Path
+
+    @property
+    def executable(self) -> str:
+        if sys.platform == "win32":
+            return str(self.path / "Scripts" / "python.exe")
+        return str(self.path / "bin" / "python")
+
+    @property
+    def scripts_dir(self) -> str:
+        return str(Path(self.executable).parent)
+
+    def is_valid(self, requires: Collection[str]) -> bool:
+        if not (self.path / BUILD_ENV_MARKER).exists() or not Path(self.executable).exists():
+            return False
+        return not unsatisfied(requires, installed_distributions(site_packages(self.path)))
+
+    def install(self, requirements: Collection[str]) -> None:
+        if not requirements:
+            return
+        # pip does not honour environment markers in command line arguments, but it does in requirement files
+        with tempfile.NamedTemporaryFile("w+", prefix="vulcan-reqs-", suffix=".txt", delete=False) as req_file:
+            req_file.write("\n".join(requirements))
+        try:
+            cmd = [self.executable, "-Im", "pip", "install", "--use-pep517", "--no-warn-script-location", "-r"]
+            check_output(python_command(cmd + [req_file.name]), merge_stderr=True)
+        finally:
+            os.unlink(req_file.name)
+
+
+def _flock(f: IO[str], exclusive: bool, blocking: bool) -> bool:
+    "Lock f, False if not blocking and another process holds a conflicting lock"
+    if sys.platform == "win32":
+        # no shared locks there, pooled envs get no protection from concurrent builds
+        return True
+    flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+    try:
+        fcntl.flock(f, flags if blocking else flags | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+class _EnvLock:
+    """
+    The lock file next to a pooled env. Builds hold it shared for as long as they use the env, and it must be held
+    exclusively to delete the env, so one build's eviction can't remove an env that another build is still using.
+    """
+
+    def __init__(self, env: Path) -> None:
+        self.path = env.with_name(f"{env.name}.lock")
+        self._file: Optional[IO[str]] = None
+
+    def acquire(self, exclusive: bool = False, blocking: bool = True) -> bool:
+        "Take (or convert to) a shared or exclusive lock, False if not blocking and another build holds it"
+        while True:
+            if self._file is None:
+                self._file = open(self.path, "a")
+            if not _flock(self._file, exclusive, blocking):
+                return False
+            # deleted along with its env while we waited, a lock on it would protect nothing
+            try:
+                if os.stat(self.path).st_ino == os.fstat(self._file.fileno()).st_ino:
+                    return True
+            except FileNotFoundError:
+                pass
+            self.release()
+
+    def release(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def delete(self) -> None:
+        "Remove the lock file, only while holding it exclusively"
+        try:
+            self.path.unlink()
+        except OSError:
+            # already gone, or still open somewhere on windows
+            pass
+
+
+@dataclass
+class BuildEnvPool:
+    """
+    Persistent build environments, keyed on build-system.requires and the interpreter, so repeated builds
+    don't pay for creating a venv and installing the build requirements every time.
+    """
+
+    root: Path
+    max_envs: int = 5
+
+    @contextmanager
+    def acquire(self, requires: Collection[str]) -> Generator[BuildEnv, None, None]:
+        self.root.mkdir(parents=True, exist_ok=True)
+        key = build_env_key(requires)
+        env = BuildEnv(self.root / key)
+        lock = _EnvLock(env.path)
+        try:
+            # held until the build is done with the env
+            lock.acquire()
+            if env.is_valid(requires):
+                print(f"Reusing build environment {env.path}", flush=True)
+            elif self._claim(env.path, lock):
+                print(f"Creating build environment {env.path}", flush=True)
+                self._create(env, requires)
+            else:
+                # another build is creating or using this env right now, don't wait for it
+                lock.release()
+                with tempfile.TemporaryDirectory(prefix="vulcan-build-env-") as tmp:
+                    private = BuildEnv(Path(tmp))
+                    self._populate(private, requires)
+                    yield private
+                return
+            (env.path / BUILD_ENV_MARKER).touch()
+            self.evict(keep=key)
+            yield env
+        finally:
+            lock.release()
+
+    def _claim(self, path: Path, lock: _EnvLock) -> bool:
+        "Make path an empty directory to create the env in, False if another build is creating or using it"
+        if path.exists():
+            stale = time.time() - path.stat().st_mtime > STALE_BUILD_ENV_SECONDS
+            if not stale and not (path / BUILD_ENV_MARKER).exists():
+                # being created by another build
+                return False
+            # stale, or complete but no longer satisfying the requirements (e.g. someone uninstalled something):
+            # rebuild it, unless another build is still using it
+            if not lock.acquire(exclusive=True, blocking=False):
+                return False
+            shutil.rmtree(path, ignore_errors=True)
+        try:
+            path.mkdir()
+        except FileExistsError:
+            return False
+        finally:
+            lock.acquire()
+        return True
+
+    def _populate(self, env: BuildEnv, requires: Collection[str]) -> None:
+        VulcanEnvBuilder(with_pip=True).create(str(env.path))
+        env.install(requires)
+
+    def _create(self, env: BuildEnv, requires: Collection[str]) -> None:
+        try:
+            self._populate(env, requires)
+        except BaseException:
+            shutil.rmtree(env.path, ignore_errors=True)
+            raise
+        (env.path / BUILD_ENV_MARKER).write_text(
+            json.dumps({"requires": sorted(requires), "python": sys.executable, "version": sys.version})
+        )
+
+    def _evictable(self, path: Path, used: Optional[float]) -> bool:
+        "Whether path is still the stale or unused env it was when chosen for eviction"
+        marker = path / BUILD_ENV_MARKER
+        if used is None:
+            return not marker.exists() and time.time() - path.stat().st_mtime > STALE_BUILD_ENV_SECONDS
+        return marker.exists() and marker.stat().st_mtime == used
+
+    def evict(self, keep: str | None = None) -> List[Path]:
+        if not self.root.exists():
+            return []
+        complete = []
+        candidates: List[Tuple[Path, Optional[float]]] = []
+        for path in self.root.iterdir():
+            if not path.is_dir():
+                continue
+            marker = path / BUILD_ENV_MARKER
+            if marker.exists():
+                complete.append((marker.stat().st_mtime, path))
+            elif time.time() - path.stat().st_mtime > STALE_BUILD_ENV_SECONDS:
+                candidates.append((path, None))
+        # least recently used go first
+        complete.sort(reverse=True)
+        candidates.extend((path, used) for used, path in islice(complete, self.max_envs, None) if path.name != keep)
+        evicted = []
+        for path, used in candidates:
+            lock = _EnvLock(path)
+            try:
+                # skip envs another build is using, or has just started to use or recreate
+                if not lock.acquire(exclusive=True, blocking=False) or not self._evictable(path, used):
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                lock.delete()
+                evicted.append(path)
+            except FileNotFoundError:
+                # removed by a concurrent eviction
+                continue
+            finally:
+                lock.release()
+        return evicted
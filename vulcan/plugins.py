@@ -1,19 +1,157 @@
 from __future__ import annotations
+import contextvars
+import hashlib
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
 from types import TracebackType
-from typing import Any, Dict, Iterable, Type, Optional
-from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Type
 
 import tomlkit
 from pkg_resources import EntryPoint, iter_entry_points
 
-from vulcan import Vulcan
+from vulcan import Vulcan, VulcanConfigError, cache_dir
+from vulcan.trace import span
+from vulcan.wheelfile import WheelRewriter
+
+GLOB_CHARS = frozenset("*?[")
+
+
+@dataclass
+class Plugin:
+    name: str
+    entry_point: EntryPoint
+    config: Optional[Dict[str, Any]]
+    # globs relative to the project, only when both are given can the plugin be skipped or run alongside others
+    inputs: List[str] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+
+    @property
+    def declared(self) -> bool:
+        return bool(self.inputs) and bool(self.outputs)
+
+    @property
+    def version(self) -> str:
+        dist = getattr(self.entry_point, "dist", None)
+        return str(getattr(dist, "version", ""))
+
+
+def _patterns(config: Optional[Dict[str, Any]], key: str, name: str) -> List[str]:
+    value = (config or {}).get(key, [])
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise VulcanConfigError(f"tool.vulcan.plugin.{name}.{key} must be a list of paths or globs")
+    return [str(v) for v in value]
+
+
+def _static_prefix(pattern: str) -> PurePosixPath:
+    "The directories (or file) a glob can only match inside of"
+    parts = []
+    for part in PurePosixPath(pattern).parts:
+        if GLOB_CHARS.intersection(part):
+            break
+        parts.append(part)
+    return PurePosixPath(*parts)
+
+
+def overlaps(these: Iterable[str], those: Iterable[str]) -> bool:
+    "Whether any of these globs could match a path that one of those could too, erring on the side of yes"
+    for a in map(_static_prefix, these):
+        for b in map(_static_prefix, those):
+            if a == b or a in b.parents or b in a.parents:
+                return True
+    return False
+
+
+def plugin_dependencies(plugins: List[Plugin]) -> Dict[str, Set[str]]:
+    """
+    The plugins each plugin has to wait for: the ones configured before it that write what it reads, read what it
+    writes or write the same files. A plugin without inputs and outputs waits for, and is waited for by, everything.
+    """
+    dependencies: Dict[str, Set[str]] = {plugin.name: set() for plugin in plugins}
+    for i, later in enumerate(plugins):
+        for earlier in plugins[:i]:
+            if (
+                not earlier.declared
+                or not later.declared
+                or overlaps(earlier.outputs, later.inputs)
+                or overlaps(earlier.inputs, later.outputs)
+                or overlaps(earlier.outputs, later.outputs)
+            ):
+                dependencies[later.name].add(earlier.name)
+    return dependencies
+
+
+def matched_files(root: Path, patterns: Iterable[str]) -> List[Path]:
+    "Files under root matching any of the globs, with directories standing for everything in them"
+    files: Set[Path] = set()
+    for pattern in patterns:
+        for path in root.glob(pattern):
+            if path.is_dir():
+                files.update(p for p in path.rglob("*") if p.is_file())
+            elif path.is_file():
+                files.add(path)
+    return sorted(files)
+
+
+def digest_files(root: Path, files: Iterable[Path]) -> str:
+    h = hashlib.sha256()
+    for path in files:
+        h.update(path.relative_to(root).as_posix().encode() + b"\0")
+        h.update(hashlib.sha256(path.read_bytes()).digest())
+    return h.hexdigest()
+
+
+@dataclass
+class PluginCache:
+    "What each declared plugin last ran with and produced, to skip it when nothing changed"
+
+    root: Path
+    directory: Path = field(default_factory=lambda: cache_dir() / "plugins")
+
+    def _path(self, plugin: Plugin) -> Path:
+        project = hashlib.sha256(f"{self.root.resolve()}\0{plugin.name}".encode()).hexdigest()[:32]
+        return self.directory / f"{project}.json"
+
+    def key(self, plugin: Plugin) -> str:
+        payload = {
+            "plugin": plugin.name,
+            "version": plugin.version,
+            "config": plugin.config,
+            "inputs": digest_files(self.root, matched_files(self.root, plugin.inputs)),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def outputs(self, plugin: Plugin) -> Optional[str]:
+        files = matched_files(self.root, plugin.outputs)
+        return digest_files(self.root, files) if files else None
+
+    def is_fresh(self, plugin: Plugin, key: str) -> bool:
+        try:
+            entry = json.loads(self._path(plugin).read_text())
+        except (OSError, ValueError):
+            return False
+        # outputs that were deleted or edited since count as changed too
+        outputs = entry.get("outputs")
+        return entry.get("key") == key and outputs is not None and outputs == self.outputs(plugin)
+
+    def store(self, plugin: Plugin, key: str) -> None:
+        path = self._path(plugin)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"key": key, "outputs": self.outputs(plugin)}))
+        os.replace(tmp, path)
 
 
 @dataclass
 class PluginRunner:
     vulcan: Vulcan
     plugin_configs: Dict[str, Any] = field(init=False)
+    jobs: Optional[int] = None
+    use_cache: bool = True
 
     def __post_init__(self) -> None:
         try:
@@ -28,14 +166,92 @@ class PluginRunner:
     def get_post_entrypoints(self) -> Iterable[EntryPoint]:
         return iter_entry_points("vulcan.post_build")
 
+    def _configured(self, available: Iterable[EntryPoint]) -> List[Plugin]:
+        "The plugins among available that are configured, in the order of tool.vulcan.plugins"
+        entry_points: Dict[str, EntryPoint] = {}
+        for ep in available:
+            entry_points.setdefault(ep.name, ep)
+        return [
+            Plugin(name, entry_points[name], self.plugin_configs.get(name))
+            for name in dict.fromkeys(self.vulcan.plugins or [])
+            if name in entry_points
+        ]
+
+    def pre_build_plugins(self) -> List[Plugin]:
+        plugins = self._configured(self.get_pre_entrypoints())
+        for plugin in plugins:
+            plugin.inputs = _patterns(plugin.config, "inputs", plugin.name)
+            plugin.outputs = _patterns(plugin.config, "outputs", plugin.name)
+        return plugins
+
+    def post_build_plugins(self) -> List[Plugin]:
+        return self._configured(self.get_post_entrypoints())
+
+    def _run(self, plugin: Plugin, cache: Optional[PluginCache]) -> None:
+        key = cache.key(plugin) if cache is not None and plugin.declared else None
+        if cache is not None and key is not None and cache.is_fresh(plugin, key):
+            print(f"Skipping pre_build plugin {plugin.entry_point}, its inputs are unchanged")
+            return
+        print(f"Running pre_build plugin {plugin.entry_point}")
+        with span("plugin", plugin=plugin.name, stage="pre_build"):
+            plugin.entry_point.load()(plugin.config)
+        if cache is not None and key is not None:
+            cache.store(plugin, key)
+
+    def run_pre_build(self) -> None:
+        """
+        Run the pre_build plugins, each as soon as the ones it depends on are done and with up to jobs at once.
+        After a failure nothing new is started, and the first error is raised once the running ones have finished.
+        """
+        plugins = self.pre_build_plugins()
+        if not plugins:
+            return
+        cache = PluginCache(self.vulcan.source_path) if self.use_cache else None
+        dependencies = plugin_dependencies(plugins)
+        by_name = {plugin.name: plugin for plugin in plugins}
+        done: Set[str] = set()
+        running: Dict[Future[None], str] = {}
+        errors: List[BaseException] = []
+        # plugins mostly wait on files and code generators they start, so not limited to the number of cpus
+        with ThreadPoolExecutor(self.jobs or min(len(plugins), 32)) as pool:
+            while True:
+                if not errors:
+                    for name in [n for n in by_name if dependencies[n] <= done]:
+                        plugin = by_name.pop(name)
+                        # with a copy of the current context, so the plugin's trace span nests under the build's
+                        context = contextvars.copy_context()
+                        running[pool.submit(context.run, self._run, plugin, cache)] = name
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        errors.append(error)
+                    else:
+                        done.add(name)
+        if errors:
+            raise errors[0]
+
+    def run_post_build(self, wheel: Path) -> None:
+        """
+        Hand the built wheel to the post_build plugins, one after the other in a single WheelRewriter, and write it
+        once when they are all done. Nothing is written if one of them fails.
+        """
+        plugins = self.post_build_plugins()
+        if not plugins:
+            return
+        with span("post_build"), WheelRewriter(wheel) as rewriter:
+            for plugin in plugins:
+                print(f"Running post_build plugin {plugin.entry_point}")
+                with span("plugin", plugin=plugin.name, stage="post_build"):
+                    plugin.entry_point.load()(plugin.config, rewriter)
+
     def __enter__(self) -> "PluginRunner":
         if not self.vulcan.plugins:
             return self
-        for ep in self.get_pre_entrypoints():
-            if ep.name not in self.vulcan.plugins:
-                continue
-            print(f"Running pre_build plugin {ep}")
-            ep.load()(self.plugin_configs.get(ep.name))
+        self.run_pre_build()
         return self
 
     def __exit__(
@@ -47,7 +263,7 @@ class PluginRunner:
         if exc_type is not None:
             # if the build process raises an error, don't bother with the plugins.
             return None
-        # NOT implementing post_build plugins yet, until I see a motivating example
+        # post_build plugins need the wheel setup wrote, build_project hands it to run_post_build
         return None
 
 
@@ -55,3 +271,8 @@ def test_plugin(config: Optional[Dict[str, str]]) -> None:
     assert config is not None
     assert config["foobar"] == "barfoo"
     (Path(config["module_dir"]) / "example.no-hash.py").write_text("Text!")
+
+
+def test_post_build_plugin(config: Optional[Dict[str, str]], wheel: WheelRewriter) -> None:
+    assert config is not None
+    wheel.write(f"{config['module_dir']}/example.post-build.py", "Text!")
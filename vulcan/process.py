@@ -0,0 +1,256 @@
+"""
+Every subprocess vulcan starts goes through here, so each one is measured: wall time, user and system CPU, peak RSS
+and output size. With VULCAN_STATS set to a file, one JSON line per process is appended to it. Also runs batches of
+commands with a bound on how many run at once.
+"""
+from __future__ import annotations
+import asyncio
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import IO, Any, Callable, ContextManager, Dict, List, Mapping, Optional, Sequence, Tuple
+
+STATS_ENV = "VULCAN_STATS"
+
+
+@dataclass
+class ProcessResult:
+    name: str
+    cmd: List[str]
+    status: str  # one of "ok", "failed", "cancelled", or "cached" for shiv apps that needed no rebuild
+    returncode: Optional[int] = None
+    seconds: float = 0.0
+    max_rss: Optional[int] = None  # bytes, None where the platform can't tell us
+    output: str = ""
+    log: Optional[Path] = None
+
+
+@dataclass
+class ProcessStats:
+    cmd: List[str]
+    returncode: int
+    seconds: float
+    # these are None where the platform can't tell us
+    user: Optional[float] = None
+    system: Optional[float] = None
+    max_rss: Optional[int] = None  # bytes
+    output_bytes: Optional[int] = None  # None if the output wasn't captured
+    pid: int = 0  # of the vulcan process that ran it
+
+
+def _max_rss_bytes(ru_maxrss: int) -> int:
+    # linux reports kilobytes, macos bytes
+    return ru_maxrss if sys.platform == "darwin" else ru_maxrss * 1024
+
+
+def _wait(proc: subprocess.Popen[bytes]) -> Tuple[int, Any]:
+    "Wait for proc, returning its exit code and resource usage (None if unavailable)"
+    if not hasattr(os, "wait4"):
+        return proc.wait(), None
+    try:
+        _, status, rusage = os.wait4(proc.pid, 0)
+    except ChildProcessError:
+        # reaped by a concurrent Popen.poll(), e.g. from cancel()
+        return proc.wait(), None
+    # we reaped it ourselves, so Popen has to be told
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return proc.returncode, rusage
+
+
+_record_lock = threading.Lock()
+
+
+def record(cmd: Sequence[str], returncode: int, seconds: float, rusage: Any, output_bytes: Optional[int]) -> None:
+    "Append the stats for a finished process to VULCAN_STATS, if it is set"
+    path = os.environ.get(STATS_ENV)
+    if not path:
+        return
+    stats = ProcessStats(list(cmd), returncode, round(seconds, 6), output_bytes=output_bytes, pid=os.getpid())
+    if rusage is not None:
+        stats.user, stats.system = round(rusage.ru_utime, 6), round(rusage.ru_stime, 6)
+        stats.max_rss = _max_rss_bytes(rusage.ru_maxrss)
+    # one short write per line in append mode, so lines from concurrent processes don't interleave
+    line = json.dumps(asdict(stats)) + "\n"
+    with _record_lock, open(path, "a") as f:
+        f.write(line)
+
+
+def read_stats(path: Path) -> List[ProcessStats]:
+    stats = []
+    for line in path.read_text().splitlines():
+        try:
+            stats.append(ProcessStats(**json.loads(line)))
+        except (ValueError, TypeError):
+            # e.g. cut short by a killed process
+            continue
+    return stats
+
+
+def summarize(stats: Sequence[ProcessStats]) -> Dict[str, Any]:
+    "Totals over a list of process stats, for the summary written by `vulcan --stats`"
+    return {
+        "processes": len(stats),
+        "failed": sum(1 for s in stats if s.returncode != 0),
+        "seconds": round(sum(s.seconds for s in stats), 6),
+        "user": round(sum(s.user or 0.0 for s in stats), 6),
+        "system": round(sum(s.system or 0.0 for s in stats), 6),
+        "max_rss": max((s.max_rss for s in stats if s.max_rss is not None), default=None),
+        "output_bytes": sum(s.output_bytes or 0 for s in stats),
+    }
+
+
+def run(
+    cmd: Sequence[str],
+    cwd: Optional[str] = None,
+    env: Optional[Mapping[str, str]] = None,
+    capture_output: bool = False,
+    merge_stderr: bool = False,
+    check: bool = False,
+    capture_stderr: bool = True,
+) -> subprocess.CompletedProcess[bytes]:
+    """
+    subprocess.run for vulcan, recording the process' stats. capture_output captures stdout and stderr, or with
+    merge_stderr both together in stdout; without capture_stderr stderr is left to the terminal. Output goes through
+    temporary files so nothing can fill up a pipe.
+    """
+    with _capture(capture_output) as out, _capture(capture_output and capture_stderr and not merge_stderr) as err:
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            cmd,
+            cwd=cwd,
+            env=env,
+            stdout=out,
+            stderr=subprocess.STDOUT if merge_stderr else err,
+        )
+        returncode, rusage = _wait(proc)
+        seconds = time.perf_counter() - start
+        stdout = _read(out)
+        stderr = _read(err)
+    output_bytes = len(stdout) + len(stderr or b"") if stdout is not None else None
+    record(cmd, returncode, seconds, rusage, output_bytes)
+    if check and returncode != 0:
+        raise subprocess.CalledProcessError(returncode, list(cmd), stdout, stderr)
+    return subprocess.CompletedProcess(list(cmd), returncode, stdout, stderr)
+
+
+def _capture(enabled: bool) -> ContextManager[Optional[IO[bytes]]]:
+    return tempfile.TemporaryFile() if enabled else contextlib.nullcontext()
+
+
+def _read(f: Optional[IO[bytes]]) -> Optional[bytes]:
+    if f is None:
+        return None
+    f.seek(0)
+    return f.read()
+
+
+def check_call(cmd: Sequence[str], cwd: Optional[str] = None, env: Optional[Mapping[str, str]] = None) -> None:
+    run(cmd, cwd=cwd, env=env, check=True)
+
+
+def check_output(
+    cmd: Sequence[str],
+    cwd: Optional[str] = None,
+    env: Optional[Mapping[str, str]] = None,
+    merge_stderr: bool = False,
+) -> str:
+    "Like subprocess.check_output, with the output decoded. stderr is left to the terminal unless merged into stdout"
+    proc = run(cmd, cwd=cwd, env=env, capture_output=True, merge_stderr=merge_stderr, check=True, capture_stderr=False)
+    return proc.stdout.decode(errors="replace")
+
+
+async def run_async(
+    cmd: Sequence[str],
+    cwd: Optional[str] = None,
+    env: Optional[Mapping[str, str]] = None,
+    capture_output: bool = False,
+    merge_stderr: bool = False,
+    check: bool = False,
+    capture_stderr: bool = True,
+) -> subprocess.CompletedProcess[bytes]:
+    "run, without blocking the event loop"
+    return await asyncio.to_thread(run, cmd, cwd, env, capture_output, merge_stderr, check, capture_stderr)
+
+
+class ProcessGroup:
+    "Runs commands from several threads, and can kill whatever is still running"
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._running: Dict[int, subprocess.Popen[bytes]] = {}
+        self.cancelled = False
+
+    def run(self, name: str, cmd: Sequence[str], log: Optional[Path] = None) -> ProcessResult:
+        with tempfile.TemporaryFile() if log is None else open(log, "w+b") as out:
+            start = time.perf_counter()
+            with self._lock:
+                if self.cancelled:
+                    return ProcessResult(name, list(cmd), "cancelled")
+                try:
+                    proc = subprocess.Popen(cmd, stdout=out, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+                except OSError as e:
+                    return ProcessResult(name, list(cmd), "failed", output=str(e), log=log)
+                self._running[proc.pid] = proc
+            try:
+                returncode, rusage = _wait(proc)
+            finally:
+                with self._lock:
+                    del self._running[proc.pid]
+            seconds = time.perf_counter() - start
+            out.seek(0)
+            data = out.read()
+        record(cmd, returncode, seconds, rusage, len(data))
+        output = data.decode(errors="replace")
+        max_rss = _max_rss_bytes(rusage.ru_maxrss) if rusage is not None else None
+        if returncode == 0:
+            status = "ok"
+        else:
+            status = "cancelled" if self.cancelled else "failed"
+        return ProcessResult(name, list(cmd), status, returncode, seconds, max_rss, output, log)
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            for proc in self._running.values():
+                if proc.returncode is None:
+                    proc.terminate()
+
+
+async def run_bounded(
+    commands: Sequence[Tuple[str, Sequence[str]]],
+    jobs: Optional[int] = None,
+    log_dir: Optional[Path] = None,
+    report: Callable[[ProcessResult], None] = lambda result: None,
+    fail_fast: bool = True,
+) -> List[ProcessResult]:
+    """
+    Run the named commands with at most `jobs` at once. Output is captured, and written to <log_dir>/<name>.log if
+    log_dir is given. Results are reported in the order of commands, each as soon as it and all the ones before
+    it have finished. With fail_fast the first failure kills everything still running and nothing new is started.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    semaphore = asyncio.Semaphore(jobs)
+    group = ProcessGroup()
+    if log_dir is not None:
+        log_dir.mkdir(parents=True, exist_ok=True)
+
+    async def run_one(name: str, cmd: Sequence[str]) -> ProcessResult:
+        async with semaphore:
+            log = log_dir / f"{name}.log" if log_dir is not None else None
+            result = await asyncio.to_thread(group.run, name, cmd, log)
+            # before giving up the slot, so that nothing new gets started
+            if result.status == "failed" and fail_fast:
+                group.cancel()
+        return result
+
+    tasks = [asyncio.ensure_future(run_one(name, cmd)) for name, cmd in commands]
+    for task in tasks:
+        report(await task)
+    return [task.result() for task in tasks]
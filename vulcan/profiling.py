@@ -0,0 +1,106 @@
+"""
+Opt-in cProfile output for vulcan and the python processes it starts. With VULCAN_PROFILE set to a directory, vulcan
+itself, the build backend hooks and every `python -m <module>` command vulcan runs (pip, shiv, ...) each write a
+pstats file there. The environment variable is inherited, so build backends pip starts profile themselves too.
+"""
+from __future__ import annotations
+import cProfile
+import itertools
+import os
+import pstats
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Generator, List, Optional, Sequence
+
+PROFILE_ENV = "VULCAN_PROFILE"
+COMBINED = "combined.prof"
+REPORT = "report.txt"
+
+# runs a module like `python -m` would, under cProfile. Unlike `python -m cProfile` this keeps the exit code, and it
+# does not need vulcan to be importable, the python may be some other virtualenv's
+_RUN_PROFILED = """\
+import cProfile, runpy, sys
+output, module = sys.argv[1:3]
+sys.argv = [module, *sys.argv[3:]]
+profile = cProfile.Profile()
+try:
+    profile.runcall(runpy.run_module, module, run_name="__main__", alter_sys=True)
+finally:
+    profile.dump_stats(output)
+"""
+
+_counter = itertools.count()
+
+
+def profile_dir() -> Optional[Path]:
+    configured = os.environ.get(PROFILE_ENV)
+    return Path(configured) if configured else None
+
+
+def profile_path(directory: Path, name: str) -> Path:
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"{name}-{os.getpid()}-{next(_counter)}.prof"
+
+
+def python_command(cmd: Sequence[str]) -> List[str]:
+    "cmd, made to write a profile if profiling is on and it runs a module with `python -m` (or e.g. `-Im`)"
+    directory = profile_dir()
+    if directory is None or len(cmd) < 3:
+        return list(cmd)
+    python, flags, module, *args = cmd
+    if not flags.startswith("-") or flags.startswith("--") or not flags.endswith("m"):
+        return list(cmd)
+    options = [flags[:-1]] if len(flags) > 2 else []
+    output = profile_path(directory, module.replace(".", "_"))
+    return [python, *options, "-c", _RUN_PROFILED, str(output), module, *args]
+
+
+@contextmanager
+def profiled(name: str) -> Generator[None, None, None]:
+    "Profile the block into VULCAN_PROFILE, if it is set"
+    directory = profile_dir()
+    if directory is None:
+        yield
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(str(profile_path(directory, name)))
+
+
+def combine(directory: Path) -> Optional[Path]:
+    """
+    Merge every profile in directory into one, and write a report of where the time went: the total per process
+    and the functions with the most cumulative time over all of them. Returns the report, or None without profiles.
+    """
+    stats: Optional[pstats.Stats] = None
+    totals = []
+    for path in sorted(directory.glob("*.prof")):
+        if path.name == COMBINED:
+            continue
+        try:
+            single = pstats.Stats(str(path))
+        except (EOFError, TypeError, ValueError):
+            # a process that was killed before it could write its profile
+            continue
+        totals.append((single.total_tt, path.name))  # type: ignore[attr-defined]
+        if stats is None:
+            stats = single
+        else:
+            stats.add(single)
+    if stats is None:
+        return None
+    stats.dump_stats(str(directory / COMBINED))
+
+    report = directory / REPORT
+    with report.open("w") as f:
+        f.write("seconds  process\n")
+        for total, name in sorted(totals, reverse=True):
+            f.write(f"{total:7.2f}  {name}\n")
+        f.write("\n")
+        stats.stream = f  # type: ignore[attr-defined]
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(40)
+    return report
@@ -0,0 +1,85 @@
+"""
+What the conversion scripts share: converting the current directory like they always have, or a whole batch of
+project directories in a process pool with a summary at the end.
+"""
+import json
+import sys
+import time
+from argparse import ArgumentParser, Namespace
+from functools import partial
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from vulcan.batch import BatchResult, run_batch
+
+
+class MigrationError(Exception):
+    "A project the script refuses to convert, with the reason"
+
+
+def add_batch_arguments(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "projects",
+        nargs="*",
+        type=Path,
+        help="project directories to convert in parallel, instead of the current directory",
+    )
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="number of projects to convert at once")
+    parser.add_argument("--report", type=Path, default=None, help="write a JSON report of every project to this file")
+
+
+def report_result(result: BatchResult) -> None:
+    if result.status == "ok":
+        print(f"[ok]      {result.project} ({result.seconds:.1f}s): {result.output}", file=sys.stderr)
+    else:
+        print(f"[{result.status}]{' ' * (8 - len(result.status))}{result.project}: {result.error}", file=sys.stderr)
+
+
+def write_report(path: Path, results: List[BatchResult], seconds: float) -> None:
+    report = {
+        "seconds": round(seconds, 3),
+        "converted": sum(r.status == "ok" for r in results),
+        "failed": sum(r.status != "ok" for r in results),
+        "projects": [
+            {
+                "project": str(r.project),
+                "status": r.status,
+                "seconds": round(r.seconds, 3),
+                "output": r.output,
+                "error": r.error,
+            }
+            for r in results
+        ],
+    }
+    path.write_text(json.dumps(report, indent=2) + "\n")
+
+
+def convert_batch(
+    convert_project: Callable[[Path], str],
+    projects: List[Path],
+    jobs: Optional[int] = None,
+    report: Optional[Path] = None,
+) -> List[BatchResult]:
+    "Convert every project with convert_project, which must be picklable, reporting on each as it finishes"
+    start = time.perf_counter()
+    # conversions don't depend on each other
+    results = run_batch({project.absolute(): set() for project in projects}, convert_project, jobs, report_result)
+    seconds = time.perf_counter() - start
+    converted = sum(r.status == "ok" for r in results)
+    print(f"Converted {converted} of {len(results)} projects in {seconds:.1f}s", file=sys.stderr)
+    if report is not None:
+        write_report(report, results, seconds)
+    return results
+
+
+def main(args: Namespace, convert_project: Callable[..., str], **options: object) -> None:
+    "Convert the projects given on the command line, or the current directory, exiting non-zero if any failed"
+    if not args.projects and args.report is None:
+        try:
+            convert_project(Path(), **options)
+        except MigrationError as e:
+            exit(str(e))
+        return
+    results = convert_batch(partial(convert_project, **options), args.projects or [Path()], args.jobs, args.report)
+    if any(r.status != "ok" for r in results):
+        exit(1)
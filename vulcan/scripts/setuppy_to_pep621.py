@@ -1,4 +1,6 @@
-import subprocess
+import os
+import shutil
+import sys
 import tempfile
 import zipfile
 from argparse import ArgumentParser
@@ -6,15 +8,34 @@ from collections import defaultdict
 from configparser import ConfigParser
 from io import StringIO
 from pathlib import Path
-from typing import Dict, List, NamedTuple, Optional, cast
+from typing import Dict, List, NamedTuple, Optional, Set, cast
 
 import pkginfo
 import tomlkit
 from pkg_resources import Requirement
 
+from vulcan.process import run
+from vulcan.scripts.migrate import MigrationError, add_batch_arguments, main
+
+
+# runs the project's PEP 517 prepare_metadata_for_build_wheel hook in the project directory. For setuptools that's
+# an egg_info run, much cheaper than building the whole wheel
+_PREPARE_METADATA = """\
+import importlib, sys
+backend_path, outdir = sys.argv[1:3]
+module, _, attrs = backend_path.partition(":")
+backend = importlib.import_module(module)
+for attr in filter(None, attrs.split(".")):
+    backend = getattr(backend, attr)
+if not hasattr(backend, "prepare_metadata_for_build_wheel"):
+    sys.exit(3)
+print(backend.prepare_metadata_for_build_wheel(outdir))
+"""
+LEGACY_BACKEND = "setuptools.build_meta:__legacy__"
+
 
 class BuildData(NamedTuple):
-    wheel: pkginfo.Wheel
+    wheel: pkginfo.Distribution
     table: tomlkit.items.Table
     packages: List[str]
 
@@ -22,32 +43,24 @@ class BuildData(NamedTuple):
 def make_parser() -> ArgumentParser:
     parser = ArgumentParser()
     parser.add_argument("--shiv-console-scripts", action="store_true")
+    parser.add_argument(
+        "--full-build",
+        action="store_true",
+        help="always read the metadata from a wheel built with pip, instead of only when the backend can't prepare it",
+    )
+    add_batch_arguments(parser)
     return parser
 
 
-def wheel() -> BuildData:
-
-    with tempfile.TemporaryDirectory(suffix=".vulcan-migrate") as tmp:
-        subprocess.run(["pip", "wheel", "--no-deps", "-w", tmp, "."])
-        whl = pkginfo.Wheel(str(next(Path(tmp).glob("*.whl"))))
-        eps: Dict[str, Dict[str, str]] = defaultdict(dict)
-        with zipfile.ZipFile(whl.filename) as zf:
-            dist_info = f'{whl.name.replace("-", "_")}-{whl.version}.dist-info'
-            try:
-                with zf.open(f"{dist_info}/entry_points.txt") as f:
-                    cp = ConfigParser()
-                    cp.read_file(StringIO(f.read().decode()))
-                    for section in cp.sections():
-                        for key in cp[section]:
-                            eps[section][key] = cp[section][key]
-            except KeyError:
-                eps = {}
-            try:
-                with zf.open(f"{dist_info}/top_level.txt") as f:
-                    data = f.read().decode()
-                    packages = [line.strip() for line in data.split("\n") if line.strip()]
-            except KeyError:
-                packages = []
+def _build_data(dist: pkginfo.Distribution, entry_points: Optional[str], top_level: Optional[str]) -> BuildData:
+    eps: Dict[str, Dict[str, str]] = defaultdict(dict)
+    if entry_points is not None:
+        cp = ConfigParser()
+        cp.read_file(StringIO(entry_points))
+        for section in cp.sections():
+            for key in cp[section]:
+                eps[section][key] = cp[section][key]
+    packages = [line.strip() for line in (top_level or "").split("\n") if line.strip()]
 
     ep_table = tomlkit.table()
     ep_table._is_super_table = True
@@ -55,7 +68,78 @@ def wheel() -> BuildData:
         t = tomlkit.table()
         ep_table[epname] = t
         t.update(ep)
-    return BuildData(whl, ep_table, packages)
+    return BuildData(dist, ep_table, packages)
+
+
+def wheel(project: Path = Path()) -> BuildData:
+
+    with tempfile.TemporaryDirectory(suffix=".vulcan-migrate") as tmp:
+        run(["pip", "wheel", "--no-deps", "-w", tmp, "."], cwd=str(project))
+        built = next(Path(tmp).glob("*.whl"), None)
+        if built is None:
+            raise MigrationError("pip wheel failed, see its output above")
+        whl = pkginfo.Wheel(str(built))
+        with zipfile.ZipFile(whl.filename) as zf:
+            dist_info = f'{whl.name.replace("-", "_")}-{whl.version}.dist-info'
+
+            def read(name: str) -> Optional[str]:
+                try:
+                    with zf.open(f"{dist_info}/{name}") as f:
+                        return f.read().decode()
+                except KeyError:
+                    return None
+
+            return _build_data(whl, read("entry_points.txt"), read("top_level.txt"))
+
+
+def build_backend(project: Path) -> str:
+    try:
+        pyproject = tomlkit.loads((project / "pyproject.toml").read_text())
+    except FileNotFoundError:
+        return LEGACY_BACKEND
+    return str(pyproject.get("build-system", {}).get("build-backend", LEGACY_BACKEND))
+
+
+def _egg_infos(project: Path) -> Set[Path]:
+    # setuptools puts it next to the packages, in the project or e.g. its src directory
+    return {*project.glob("*.egg-info"), *project.glob("*/*.egg-info")}
+
+
+def prepared_metadata(project: Path) -> Optional[BuildData]:
+    """
+    The metadata from the build backend's prepare_metadata_for_build_wheel, run with this python and without build
+    isolation. None if the backend doesn't have the hook or can't be imported here. Leaves the project as it was.
+    """
+    existing = _egg_infos(project)
+    with tempfile.TemporaryDirectory(suffix=".vulcan-migrate") as tmp:
+        metadata_dir = Path(tmp) / "metadata"
+        metadata_dir.mkdir()
+        # setuptools writes the egg-info it derives the metadata from into the project by default
+        (Path(tmp) / "egg-base").mkdir()
+        extra_config = Path(tmp) / "setup.cfg"
+        extra_config.write_text(f"[egg_info]\negg_base = {Path(tmp) / 'egg-base'}\n")
+        try:
+            result = run(
+                [sys.executable, "-c", _PREPARE_METADATA, build_backend(project), str(metadata_dir)],
+                cwd=str(project),
+                env={**os.environ, "DIST_EXTRA_CONFIG": str(extra_config)},
+                capture_output=True,
+            )
+        finally:
+            # setuptools versions that don't read DIST_EXTRA_CONFIG
+            for egg_info in _egg_infos(project) - existing:
+                shutil.rmtree(egg_info, ignore_errors=True)
+        if result.returncode != 0:
+            return None
+        dist_info = metadata_dir / result.stdout.decode().strip().splitlines()[-1]
+        dist = pkginfo.Distribution()
+        dist.parse((dist_info / "METADATA").read_bytes())
+
+        def read(name: str) -> Optional[str]:
+            path = dist_info / name
+            return path.read_text() if path.is_file() else None
+
+        return _build_data(dist, read("entry_points.txt"), read("top_level.txt"))
 
 
 def contributors(author: Optional[str], author_email: Optional[str]) -> List[tomlkit.items.Table]:
@@ -80,16 +164,17 @@ def shiv_from_console_scripts(console_scripts: Dict[str, str]) -> List[Dict[str,
     return shivs
 
 
-def convert() -> None:
+def convert_project(directory: Path, shiv_console_scripts: bool = False, full_build: bool = False) -> str:
+    "Write the vulcan pyproject.toml for the setuptools project in directory, returning how its metadata was read"
     try:
-        with open("./pyproject.toml") as f:
+        with open(directory / "pyproject.toml") as f:
             pyproject = tomlkit.loads(f.read())
     except FileNotFoundError:
         pyproject = tomlkit.document()
     if "project" in pyproject:
-        exit("refusing to overwrite current project configuration")
-    args = make_parser().parse_args()
-    whl, entry_points, packages = wheel()
+        raise MigrationError("refusing to overwrite current project configuration")
+    prepared = None if full_build else prepared_metadata(directory)
+    whl, entry_points, packages = prepared if prepared is not None else wheel(directory)
     project = tomlkit.table()
     vulcan = tomlkit.table()
     pyproject["project"] = project
@@ -119,8 +204,8 @@ def convert() -> None:
     if whl.project_urls:
         project["urls"] = {k: v for k, v in [u.split(", ") for u in whl.project_urls]}
     try:
-        readme = next(p for p in Path().iterdir() if p.name.lower().startswith("readme"))
-        project["readme"] = str(readme)
+        readme = next(p for p in directory.iterdir() if p.name.lower().startswith("readme"))
+        project["readme"] = readme.name
     except StopIteration:
         pass
 
@@ -161,7 +246,7 @@ def convert() -> None:
         del entry_points["gui_scripts"]
     if entry_points:
         project["entry-points"] = entry_points
-    if args.shiv_console_scripts and "scripts" in project:
+    if shiv_console_scripts and "scripts" in project:
         vulcan["shiv"] = shiv_from_console_scripts(project["scripts"])  # type: ignore
 
     build_system = tomlkit.table()
@@ -169,5 +254,11 @@ def convert() -> None:
     build_system["requires"] = ["vulcan-py~=1.0"]
     build_system["build-backend"] = "vulcan.build_backend"
 
-    with open("./pyproject.toml", "w+") as f:
+    with open(directory / "pyproject.toml", "w+") as f:
         f.write(tomlkit.dumps(pyproject))
+    return "metadata from the build backend" if prepared is not None else "metadata from a wheel build"
+
+
+def convert() -> None:
+    args = make_parser().parse_args()
+    main(args, convert_project, shiv_console_scripts=args.shiv_console_scripts, full_build=args.full_build)
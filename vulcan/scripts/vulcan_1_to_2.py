@@ -1,15 +1,19 @@
+from argparse import ArgumentParser
 from pathlib import Path
 import sys
 
 import tomlkit
 
+from vulcan.scripts.migrate import MigrationError, add_batch_arguments, main
 
-def convert() -> None:
-    with open("./pyproject.toml") as f:
+
+def convert_project(directory: Path) -> str:
+    "Migrate the vulcan 1 pyproject.toml in directory to vulcan 2"
+    with open(directory / "pyproject.toml") as f:
         pyproject = tomlkit.loads(f.read())
         project = pyproject.get("project")
         if not project:
-            exit("Refusing to try and migrate a pyproject.toml without any [project] section")
+            raise MigrationError("Refusing to try and migrate a pyproject.toml without any [project] section")
         tool = pyproject.setdefault("tool", tomlkit.table(is_super_table=True))
         setuptools = tool.setdefault("setuptools", tomlkit.table(is_super_table=True))
         vulcan = tool.get("vulcan", {})
@@ -26,7 +30,7 @@ def convert() -> None:
             dynamic.append(real_key)
 
     # fix version discovery
-    version_file = next(Path().rglob("VERSION"), None)
+    version_file = next(directory.rglob("VERSION"), None)
     if "version" not in project and version_file is not None:
         dynamic.append("version")
         if "version" in setuptools_dynamic:
@@ -37,7 +41,7 @@ def convert() -> None:
         else:
             version_table = tomlkit.table(is_super_table=True)
             setuptools_dynamic["version"] = version_table
-            version_table["file"] = str(version_file)
+            version_table["file"] = str(version_file.relative_to(directory))
         if "version" in vulcan:
             del vulcan["version"]
 
@@ -57,5 +61,12 @@ def convert() -> None:
     if dynamic:
         project["dynamic"] = dynamic
 
-    with open("./pyproject.toml", "w+") as f:
+    with open(directory / "pyproject.toml", "w+") as f:
         f.write(tomlkit.dumps(pyproject))
+    return "migrated to vulcan 2"
+
+
+def convert() -> None:
+    parser = ArgumentParser()
+    add_batch_arguments(parser)
+    main(parser.parse_args(), convert_project)
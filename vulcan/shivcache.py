@@ -0,0 +1,86 @@
+"""
+Skip rebuilding shiv executables whose inputs haven't changed since the last build.
+
+Each executable gets a <bin_name>.vulcan-cache.json next to it recording what it was built from. Only the contents
+of the wheel are hashed, not the wheel file itself, as the file changes with every build because of timestamps.
+"""
+from __future__ import annotations
+import dataclasses
+import hashlib
+import json
+import sys
+import zipfile
+from importlib.metadata import PackageNotFoundError, version
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from vulcan import ShivOpts
+
+CACHE_SUFFIX = ".vulcan-cache.json"
+
+
+def _sha256(data: Iterable[bytes]) -> str:
+    h = hashlib.sha256()
+    for chunk in data:
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def wheel_digest(wheel: Path) -> str:
+    def members() -> Iterable[bytes]:
+        with zipfile.ZipFile(wheel) as whl:
+            for info in sorted(whl.infolist(), key=lambda i: i.filename):
+                yield info.filename.encode() + b"\0"
+                yield hashlib.sha256(whl.read(info)).digest()
+
+    return _sha256(members())
+
+
+def file_digest(path: Path) -> str:
+    with path.open("rb") as f:
+        return _sha256(iter(lambda: f.read(1 << 20), b""))
+
+
+def app_pins(app: ShivOpts, base: List[str], extras: Dict[str, List[str]]) -> List[str]:
+    return sorted(set(chain(base, *(extras.get(extra, []) for extra in app.with_extras or []))))
+
+
+def _version(distribution: str) -> str:
+    try:
+        return version(distribution)
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def cache_key(app: ShivOpts, wheel: str, pins: List[str], backend: str = "shiv") -> Dict[str, str]:
+    "Everything that goes into an executable. wheel is the wheel_digest"
+    return {
+        "wheel": wheel,
+        # only the pins this app installs, a change to another app's extras doesn't matter
+        "lock": _sha256(pin.encode() + b"\n" for pin in pins),
+        "shiv-options": json.dumps(dataclasses.asdict(app), sort_keys=True),
+        "backend": backend,
+        "python": f"{sys.executable} {sys.version}",
+        "shiv": _version("shiv"),
+        "vulcan": _version("vulcan-py"),
+    }
+
+
+def manifest_path(output: Path) -> Path:
+    return output.with_name(output.name + CACHE_SUFFIX)
+
+
+def is_up_to_date(output: Path, key: Dict[str, str]) -> bool:
+    try:
+        manifest = json.loads(manifest_path(output).read_text())
+    except (OSError, ValueError):
+        return False
+    if manifest.get("inputs") != key or not output.is_file():
+        return False
+    # and nobody has touched the executable since
+    return bool(manifest.get("output") == file_digest(output))
+
+
+def write_manifest(output: Path, key: Dict[str, str]) -> None:
+    manifest_path(output).write_text(json.dumps({"inputs": key, "output": file_digest(output)}, indent=2) + "\n")
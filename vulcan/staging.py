@@ -0,0 +1,118 @@
+"""
+Install the locked dependencies for all shiv apps of a project once.
+
+Every app gets the project wheel and the base pins from the shared base directory, plus a directory holding only
+the pins its extras add on top of that. Apps with the same extras share that directory as well. The site-packages
+directories are passed to shiv as they are, so shiv itself installs nothing, and the pip options in the apps'
+extra_args go to these installs instead.
+"""
+from __future__ import annotations
+import asyncio
+import shlex
+import sys
+from itertools import chain
+from pathlib import Path
+from typing import Any, Coroutine, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from packaging.requirements import Requirement
+from packaging.utils import canonicalize_name
+
+from vulcan import ShivOpts, VulcanConfigError
+from vulcan.process import run_async
+from vulcan.profiling import python_command
+
+ExtrasKey = Tuple[str, ...]
+
+# options in a shiv app's extra_args that shiv would hand to pip. vulcan installs the dependencies itself, so they
+# are given to that install instead of shiv. Those that take a value, then the flags
+_PIP_OPTIONS = frozenset(["--index-url", "-i", "--extra-index-url", "--find-links", "-f", "--trusted-host"])
+_PIP_FLAGS = frozenset(["--pre", "--no-index"])
+
+
+def extras_key(app: ShivOpts) -> ExtrasKey:
+    return tuple(sorted(set(app.with_extras or [])))
+
+
+def split_pip_args(extra_args: Optional[str]) -> Tuple[List[str], List[str]]:
+    "A shiv app's extra_args as (the options for pip, the rest)"
+    pip: List[str] = []
+    rest: List[str] = []
+    args = shlex.split(extra_args or "")
+    while args:
+        arg = args.pop(0)
+        name, eq, _ = arg.partition("=")
+        if arg in _PIP_FLAGS:
+            pip.append(arg)
+        elif name in _PIP_OPTIONS:
+            pip.append(arg)
+            if not eq:
+                if not args:
+                    raise VulcanConfigError(f"shiv option {arg} needs a value")
+                pip.append(args.pop(0))
+        else:
+            rest.append(arg)
+    return pip, rest
+
+
+def staging_pip_args(apps: Iterable[ShivOpts]) -> List[str]:
+    "The pip options from the apps' extra_args, which have to be the same for all of them since they share installs"
+    found = {tuple(split_pip_args(app.extra_args)[0]) for app in apps}
+    if len(found) > 1:
+        raise VulcanConfigError(
+            "shiv apps built together need the same pip options (--index-url, --pre, ...) in extra_args, found "
+            + " and ".join(repr(" ".join(args)) for args in sorted(found))
+        )
+    return list(next(iter(found), ()))
+
+
+def extras_delta(base: Iterable[str], extras: Dict[str, List[str]], with_extras: ExtrasKey) -> List[str]:
+    "The pins needed for with_extras for distributions the base pins don't already provide"
+    try:
+        wanted = set(chain.from_iterable(extras[extra] for extra in with_extras))
+    except KeyError as e:
+        raise VulcanConfigError(f"shiv extra {e} is not in the lockfile, is it in tool.vulcan.extras?") from e
+    # by name, a second pin of something in the base would only install it twice
+    installed = {canonicalize_name(Requirement(pin).name) for pin in base}
+    return sorted(pin for pin in wanted if canonicalize_name(Requirement(pin).name) not in installed)
+
+
+async def pip_install_target(
+    target: Path, requirements: Sequence[str], wheelhouse: Optional[Path] = None, pip_args: Sequence[str] = ()
+) -> None:
+    # the lockfile already has the full closure, so there is nothing for pip to resolve
+    cmd = [sys.executable, "-m", "pip", "install", "--disable-pip-version-check", "--no-deps", "--target", str(target)]
+    if wheelhouse is not None:
+        cmd += ["--no-index", "--find-links", str(wheelhouse)]
+    proc = await run_async(python_command([*cmd, *pip_args, *requirements]))
+    if proc.returncode != 0:
+        raise RuntimeError(f"failed to install dependencies into {target}")
+
+
+async def stage_site_packages(
+    wheel: str,
+    base: List[str],
+    extras: Dict[str, List[str]],
+    apps: Iterable[ShivOpts],
+    staging: Path,
+    wheelhouse: Optional[Path] = None,
+    pip_args: Sequence[str] = (),
+) -> Dict[ExtrasKey, List[Path]]:
+    "Install everything needed by apps under staging, returning the site-packages directories for each extras key"
+    base_dir = staging / "base"
+    await pip_install_target(base_dir, [wheel, *base], wheelhouse, pip_args)
+
+    dirs: Dict[ExtrasKey, List[Path]] = {}
+    installs: List[Coroutine[Any, Any, None]] = []
+    for key in sorted({extras_key(app) for app in apps}):
+        delta = extras_delta(base, extras, key)
+        if not delta:
+            dirs[key] = [base_dir]
+            continue
+        delta_dir = staging / f"extras-{len(installs)}"
+        dirs[key] = [base_dir, delta_dir]
+        installs.append(pip_install_target(delta_dir, delta, wheelhouse, pip_args))
+    # let every install finish before raising, the caller removes the staging directory afterwards
+    for result in await asyncio.gather(*installs, return_exceptions=True):
+        if isinstance(result, BaseException):
+            raise result
+    return dirs
@@ -0,0 +1,121 @@
+"""
+Make a virtualenv match the lockfile exactly: install what is missing or at the wrong version, and remove what
+nothing needs. Everything is worked out from the installed metadata, pip only runs for the actual changes.
+"""
+from __future__ import annotations
+import sys
+from dataclasses import dataclass, field
+from importlib import metadata
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.utils import canonicalize_name
+
+from vulcan import Vulcan, VulcanConfigError
+from vulcan.develop import dev_groups, project_name, venv_environment
+from vulcan.installed import installed_distributions, site_packages, unsatisfied
+
+# never removed, the venv isn't much use without them
+PROTECTED = frozenset(["pip", "setuptools", "wheel", "editables"])
+
+
+@dataclass
+class SyncPlan:
+    install: List[str]  # requirements not satisfied by the venv
+    remove: List[str]  # installed distributions nothing asks for
+    satisfied: List[str] = field(default_factory=list)
+    locked: List[str] = field(default_factory=list)  # for constraining the install
+
+    @property
+    def up_to_date(self) -> bool:
+        return not self.install and not self.remove
+
+
+def selected_pins(config: Vulcan, extras: Optional[Iterable[str]] = None) -> List[str]:
+    "The locked pins for the project and the given extras (all of them if None)"
+    if config.dependencies is None or config.extras is None or config.no_lock:
+        raise VulcanConfigError("vulcan sync needs a lockfile")
+    names = list(config.extras) if extras is None else list(extras)
+    unknown = [name for name in names if name not in config.extras]
+    if unknown:
+        raise VulcanConfigError(f"No such extra {', '.join(unknown)}")
+    return list(dict.fromkeys(chain(config.dependencies, *(config.extras[name] for name in names))))
+
+
+def _requirement(line: str) -> Optional[Requirement]:
+    try:
+        return Requirement(line)
+    except InvalidRequirement:
+        return None
+
+
+def needed(
+    roots: Iterable[str], installed: Mapping[str, metadata.Distribution], environment: Dict[str, str]
+) -> Set[str]:
+    "Canonical names of the roots and everything they depend on, going by the installed metadata"
+    seen: Set[Tuple[str, str]] = set()
+    names: Set[str] = set()
+    stack = [req for req in map(_requirement, roots) if req is not None]
+    while stack:
+        req = stack.pop()
+        if req.marker is not None and not req.marker.evaluate({**environment, "extra": ""}):
+            continue
+        name = canonicalize_name(req.name)
+        names.add(name)
+        dist = installed.get(name)
+        if dist is None:
+            continue
+        for extra in ["", *req.extras]:
+            if (name, extra) in seen:
+                continue
+            seen.add((name, extra))
+            for dep in map(_requirement, dist.requires or []):
+                if dep is None:
+                    continue
+                # an extra's requirements only count when the extra is asked for
+                if dep.marker is None or dep.marker.evaluate({**environment, "extra": extra}):
+                    dep.marker = None
+                    stack.append(dep)
+    return names
+
+
+def plan_sync(
+    config: Vulcan, venv: Path, extras: Optional[Iterable[str]] = None, dev: Optional[Iterable[str]] = None
+) -> SyncPlan:
+    """
+    What it takes to make venv hold exactly the locked pins for extras plus the dev groups dev (all of them if None)
+    and whatever those need, and the project itself.
+    """
+    pins = selected_pins(config, extras)
+    groups = dev_groups(config)
+    if dev is not None:
+        groups = {name: dev_groups(config, name)[name] for name in dev}
+    dev_reqs = list(dict.fromkeys(chain.from_iterable(groups.values())))
+
+    installed = installed_distributions(site_packages(venv))
+    environment = venv_environment(venv)
+    wanted = [*pins, *dev_reqs]
+    install = unsatisfied(wanted, installed, environment)
+
+    # whatever's installed for the dev groups is kept, their dependencies aren't in the lockfile
+    keep = needed([*pins, *dev_reqs, project_name(config)], installed, environment) | PROTECTED
+    remove = sorted(name for name in installed if name not in keep)
+    satisfied = [req for req in wanted if req not in install]
+    return SyncPlan(install, [str(installed[name].metadata["Name"]) for name in remove], satisfied, pins)
+
+
+def constraints(pins: Iterable[str]) -> List[str]:
+    "pins as pip constraints, which may not have extras"
+    lines = []
+    for req in map(_requirement, pins):
+        if req is not None:
+            req.extras = set()
+            lines.append(str(req))
+    return lines
+
+
+def same_python(venv: Path) -> bool:
+    "Whether the venv has the python version vulcan runs with, so wheels that suit one suit the other"
+    return venv_environment(venv)["python_version"] == f"{sys.version_info[0]}.{sys.version_info[1]}"
@@ -0,0 +1,56 @@
+"""
+Opt-in timing of the build backend hooks and their phases. With VULCAN_TRACE set to a file, each span is appended to
+it as a JSON line when it ends, so the file can collect many builds and be aggregated afterwards.
+"""
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Generator, Tuple
+
+TRACE_ENV = "VULCAN_TRACE"
+
+# the open spans as (name, trace id), a context variable so work handed to other threads with its context copied
+# (contextvars.copy_context) nests under the span that started it
+_spans: ContextVar[Tuple[Tuple[str, str], ...]] = ContextVar("vulcan_trace_spans", default=())
+_write_lock = threading.Lock()
+
+
+@contextmanager
+def span(name: str, **fields: Any) -> Generator[None, None, None]:
+    """
+    Time the block as name, if VULCAN_TRACE is set. Nested spans share the trace id of the outermost one and record
+    their parent's name. Any fields are added to the record.
+    """
+    path = os.environ.get(TRACE_ENV)
+    if not path:
+        yield
+        return
+    stack = _spans.get()
+    trace_id = stack[0][1] if stack else uuid.uuid4().hex
+    parent = stack[-1][0] if stack else None
+    token = _spans.set((*stack, (name, trace_id)))
+    start, wall = time.perf_counter(), time.time()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        _spans.reset(token)
+        record = {
+            "trace": trace_id,
+            "name": name,
+            "parent": parent,
+            "start": round(wall, 6),
+            "seconds": round(time.perf_counter() - start, 6),
+            "ok": ok,
+            "pid": os.getpid(),
+            **fields,
+        }
+        line = json.dumps(record, default=str) + "\n"
+        with _write_lock, open(path, "a") as f:
+            f.write(line)
@@ -0,0 +1,106 @@
+"""
+Check that an environment has exactly the versions pinned in a lockfile, in process and without pip: the pins come
+from the lockfile, the installed versions from the distributions' metadata. Meant for asserting at startup that an
+image still matches the lockfile it was built from:
+
+    python -m vulcan.verify vulcan.lock --extra server
+"""
+from __future__ import annotations
+import sys
+import time
+from argparse import ArgumentParser
+from dataclasses import dataclass
+from importlib import metadata
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.utils import canonicalize_name
+
+from vulcan import VulcanConfigError, get_requires
+from vulcan.installed import installed_distributions
+
+
+@dataclass
+class Mismatch:
+    requirement: str  # the pin from the lockfile
+    installed: Optional[str]  # the installed version, None if not installed
+
+    def __str__(self) -> str:
+        if self.installed is None:
+            return f"{self.requirement} is not installed"
+        return f"{self.requirement} is locked, {self.installed} is installed"
+
+
+def locked_requirements(lockfile: Path, extras: Iterable[str] = ()) -> List[str]:
+    "The lockfile's pins for the project and the given extras"
+    install_requires, extras_require = get_requires(lockfile)
+    names = list(extras)
+    unknown = [name for name in names if name not in extras_require]
+    if unknown:
+        raise VulcanConfigError(f"No such extra {', '.join(unknown)} in {lockfile}")
+    return list(dict.fromkeys(chain(install_requires, *(extras_require[name] for name in names))))
+
+
+def mismatches(
+    requirements: Iterable[str],
+    installed: Mapping[str, metadata.Distribution],
+    environment: Optional[Dict[str, str]] = None,
+) -> List[Mismatch]:
+    "The requirements that the installed distributions don't satisfy, skipping those whose markers don't apply"
+    found = []
+    for line in requirements:
+        try:
+            req = Requirement(line)
+        except InvalidRequirement:
+            found.append(Mismatch(line, None))
+            continue
+        if req.marker is not None and not req.marker.evaluate(environment):
+            continue
+        dist = installed.get(canonicalize_name(req.name))
+        if dist is None:
+            found.append(Mismatch(line, None))
+        elif not req.specifier.contains(dist.version, prereleases=True):
+            found.append(Mismatch(line, dist.version))
+    return found
+
+
+def verify(
+    lockfile: Path,
+    extras: Iterable[str] = (),
+    paths: Optional[Sequence[Path]] = None,
+    environment: Optional[Dict[str, str]] = None,
+) -> List[Mismatch]:
+    """
+    How the distributions installed on paths (sys.path by default) differ from the pins in lockfile for the project
+    and extras. Markers are evaluated for environment, the running python's by default. Empty if they all match.
+    """
+    requirements = locked_requirements(lockfile, extras)
+    installed = installed_distributions(paths if paths is not None else [Path(p) for p in sys.path])
+    return mismatches(requirements, installed, environment)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = ArgumentParser(prog="python -m vulcan.verify", description="Check the environment against a lockfile")
+    parser.add_argument("lockfile", nargs="?", type=Path, default=Path("vulcan.lock"))
+    parser.add_argument("--extra", "-e", dest="extras", action="append", default=[], help="also check this extra")
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    try:
+        found = verify(args.lockfile, args.extras)
+    except (OSError, VulcanConfigError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    for mismatch in found:
+        print(mismatch, file=sys.stderr)
+    elapsed = (time.perf_counter() - start) * 1000
+    if found:
+        print(f"{len(found)} locked requirements don't match the environment ({elapsed:.0f}ms)", file=sys.stderr)
+        return 1
+    print(f"The environment matches {args.lockfile} ({elapsed:.0f}ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+Change a built wheel in place without unpacking it. Entries can be added, replaced or dropped, and on commit the wheel
+is written once: the members nobody touched are copied over as their raw compressed bytes, without being inflated and
+deflated again, and RECORD is regenerated to match.
+"""
+from __future__ import annotations
+import base64
+import csv
+import hashlib
+import io
+import os
+import stat
+import struct
+import time
+import zipfile
+from pathlib import Path
+from types import TracebackType
+from typing import BinaryIO, Dict, List, Set, Tuple, Type, Union
+
+from vulcan.zipwriter import Member, ZipWriter, compress, dos_date_time
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_LOCAL_SIGNATURE = 0x04034B50
+# signatures of RECORD itself, which RECORD can't list
+_SIGNATURES = ("RECORD.jws", "RECORD.p7s")
+
+
+def record_hash(data: bytes) -> str:
+    "The hash of data as RECORD lists it"
+    digest = hashlib.sha256(data).digest()
+    return "sha256=" + base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+class WheelRewriter:
+    """
+    Reads a wheel and collects changes to it, which commit writes back to the same path. Used as a context manager
+    it commits when the block succeeds and leaves the wheel alone when it raises.
+    """
+
+    def __init__(self, wheel: Path) -> None:
+        self.path = wheel
+        self._open()
+
+    def _open(self) -> None:
+        "Read the wheel as it is on disk, with nothing changed yet"
+        self._zip = zipfile.ZipFile(self.path)
+        self._raw: BinaryIO = open(self.path, "rb")
+        self._infos = {info.filename: info for info in self._zip.infolist()}
+        records = [name for name in self._infos if name.count("/") == 1 and name.endswith(".dist-info/RECORD")]
+        if len(records) != 1:
+            self.close()
+            raise ValueError(f"{self.path.name} does not have exactly one .dist-info/RECORD")
+        self.record_path = records[0]
+        self.dist_info = self.record_path.rsplit("/", 1)[0]
+        self._record: Dict[str, Tuple[str, str]] = {}
+        for row in csv.reader(io.StringIO(self._zip.read(self.record_path).decode())):
+            if len(row) >= 3:
+                self._record[row[0]] = (row[1], row[2])
+        self._written: Dict[str, Tuple[bytes, int]] = {}
+        self._dropped: Set[str] = set()
+
+    @property
+    def changed(self) -> bool:
+        return bool(self._written or self._dropped)
+
+    def names(self) -> List[str]:
+        "The entries the wheel will have, in the order they will be written"
+        names = [name for name in self._infos if name not in self._dropped]
+        names += [name for name in self._written if name not in self._infos]
+        # the .dist-info directory goes last, and RECORD last of all
+        return sorted(names, key=lambda name: (name.startswith(f"{self.dist_info}/"), name == self.record_path))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._written or (name in self._infos and name not in self._dropped)
+
+    def read(self, name: str) -> bytes:
+        if name in self._written:
+            return self._written[name][0]
+        if name in self._dropped or name not in self._infos:
+            raise KeyError(name)
+        return self._zip.read(name)
+
+    def write(self, name: str, data: Union[bytes, str], mode: int = 0o644) -> None:
+        "Add name to the wheel, or replace it if it's already there"
+        self._check_name(name)
+        if isinstance(data, str):
+            data = data.encode()
+        self._dropped.discard(name)
+        self._written[name] = (data, mode)
+
+    def drop(self, name: str) -> None:
+        self._check_name(name)
+        if name not in self:
+            raise KeyError(name)
+        self._written.pop(name, None)
+        if name in self._infos:
+            self._dropped.add(name)
+
+    def _check_name(self, name: str) -> None:
+        if name == self.record_path:
+            raise ValueError(f"{name} is generated when the wheel is written")
+        if name.startswith("/") or ".." in name.split("/"):
+            raise ValueError(f"{name!r} is not a path inside the wheel")
+
+    def _hash_and_size(self, name: str) -> Tuple[str, str]:
+        if name in self._written:
+            data = self._written[name][0]
+            return record_hash(data), str(len(data))
+        if name in self._record and self._record[name][0]:
+            return self._record[name]
+        # not in the old RECORD, or listed without a hash
+        data = self._zip.read(name)
+        return record_hash(data), str(len(data))
+
+    def record(self) -> str:
+        "RECORD as it will be written, for plugins that sign it into RECORD.jws or RECORD.p7s"
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator="\n")
+        signatures = [f"{self.dist_info}/{signature}" for signature in _SIGNATURES]
+        for name in self.names():
+            if name.endswith("/") or name in signatures:
+                continue
+            if name == self.record_path:
+                writer.writerow([name, "", ""])
+            else:
+                writer.writerow([name, *self._hash_and_size(name)])
+        return out.getvalue()
+
+    def _copy(self, writer: ZipWriter, info: zipfile.ZipInfo) -> None:
+        "Copy info's compressed data straight from the old wheel"
+        if info.flag_bits & 0x1:
+            raise ValueError(f"{info.filename} is encrypted")
+        self._raw.seek(info.header_offset)
+        header = _LOCAL_HEADER.unpack(self._raw.read(_LOCAL_HEADER.size))
+        if header[0] != _LOCAL_SIGNATURE:
+            raise zipfile.BadZipFile(f"bad local header for {info.filename}")
+        self._raw.seek(header[-2] + header[-1], os.SEEK_CUR)
+        member = Member(
+            info.filename,
+            info.CRC,
+            info.file_size,
+            b"",
+            info.compress_type,
+            info.external_attr >> 16,
+            date_time=dos_date_time(info.date_time),
+        )
+        writer.copy(member, info.compress_size, self._raw)
+
+    def commit(self) -> Path:
+        "Write the changes back to the wheel, unless there are none, and carry on from the written wheel"
+        if not self.changed:
+            return self.path
+        record = self.record().encode()
+        record_mode = self._infos[self.record_path].external_attr >> 16 or stat.S_IFREG | 0o644
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp, "wb") as fp:
+                writer = ZipWriter(fp, int(os.environ.get("SOURCE_DATE_EPOCH", time.time())))
+                for name in self.names():
+                    if name == self.record_path:
+                        writer.write(compress(name, record, record_mode, compressed=True))
+                    elif name in self._written:
+                        data, mode = self._written[name]
+                        writer.write(compress(name, data, stat.S_IFREG | stat.S_IMODE(mode), compressed=True))
+                    else:
+                        self._copy(writer, self._infos[name])
+                writer.close()
+            # windows won't replace a file that is still open
+            self.close()
+            try:
+                os.replace(tmp, self.path)
+            finally:
+                self._open()
+        finally:
+            tmp.unlink(missing_ok=True)
+        return self.path
+
+    def close(self) -> None:
+        self._zip.close()
+        self._raw.close()
+
+    def __enter__(self) -> "WheelRewriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Type[BaseException] | None = None,
+        exc_value: BaseException | None = None,
+        tb: TracebackType | None = None,
+    ) -> None:
+        try:
+            if exc_type is None:
+                self.commit()
+        finally:
+            self.close()
@@ -0,0 +1,76 @@
+"""
+A directory of wheels for every pin in a lockfile, so installing the locked dependencies needs neither an index nor
+a resolver.
+"""
+from __future__ import annotations
+import sys
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.tags import Tag, sys_tags
+from packaging.utils import InvalidWheelFilename, canonicalize_name, parse_wheel_filename
+from packaging.version import Version
+
+from vulcan import cache_dir
+from vulcan.process import check_call
+from vulcan.profiling import python_command
+
+
+def default_wheelhouse() -> Path:
+    return cache_dir() / "wheelhouse"
+
+
+def locked_pins(base: Iterable[str], extras: Dict[str, List[str]]) -> List[str]:
+    return sorted(set(chain(base, *extras.values())))
+
+
+def _available(wheelhouse: Path, tags: Set[Tag]) -> Set[Tuple[str, Version]]:
+    available: Set[Tuple[str, Version]] = set()
+    for whl in wheelhouse.glob("*.whl"):
+        try:
+            name, version, _, whl_tags = parse_wheel_filename(whl.name)
+        except InvalidWheelFilename:
+            continue
+        if not whl_tags.isdisjoint(tags):
+            available.add((name, version))
+    return available
+
+
+def missing_pins(pins: Iterable[str], wheelhouse: Path, tags: Optional[Iterable[Tag]] = None) -> List[str]:
+    "The pins without a wheel in wheelhouse that the running interpreter can install"
+    available = _available(wheelhouse, set(tags if tags is not None else sys_tags()))
+    missing = []
+    for pin in pins:
+        try:
+            req = Requirement(pin)
+        except InvalidRequirement:
+            missing.append(pin)
+            continue
+        if req.marker is not None and not req.marker.evaluate():
+            # pip skips these too
+            continue
+        if not any(
+            name == canonicalize_name(req.name) and req.specifier.contains(version, prereleases=True)
+            for name, version in available
+        ):
+            missing.append(pin)
+    return missing
+
+
+def fill_wheelhouse(pins: Iterable[str], wheelhouse: Path, pip_args: Sequence[str] = ()) -> List[str]:
+    "Download or build a wheel for every pin not in wheelhouse yet, returning the pins that were added"
+    missing = missing_pins(pins, wheelhouse)
+    if missing:
+        wheelhouse.mkdir(parents=True, exist_ok=True)
+        # the pins are the complete closure already, there is nothing to resolve
+        check_call(
+            python_command(
+                [
+                    *(sys.executable, "-m", "pip", "wheel", "--disable-pip-version-check", "--no-deps"),
+                    *("--wheel-dir", str(wheelhouse), *pip_args, *missing),
+                ]
+            )
+        )
+    return missing
@@ -0,0 +1,217 @@
+"""
+Build shiv executables in-process instead of running `python -m shiv`.
+
+The archive has the same layout as shiv's (site-packages/, shiv's _bootstrap/, environment.json and __main__.py), so
+it runs exactly like one built by shiv. The difference is in how it's written: files are read and compressed in a
+thread pool straight from the staged site-packages directories, and every timestamp is fixed, so the same inputs
+always give the same executable.
+"""
+from __future__ import annotations
+import hashlib
+import os
+import shlex
+import stat
+import subprocess
+import sys
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from importlib.resources import files
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+import shiv.bootstrap
+from shiv.bootstrap.environment import Environment
+from shiv.cli import __version__ as shiv_version
+from shiv.cli import console_script_exists, find_entry_point, get_interpreter_path
+from shiv.constants import BUILD_AT_TIMESTAMP_FORMAT, SOURCE_DATE_EPOCH_DEFAULT, SOURCE_DATE_EPOCH_ENV
+
+from vulcan import ShivOpts, VulcanConfigError
+from vulcan.process import check_output
+from vulcan.staging import split_pip_args
+from vulcan.zipwriter import Member, ZipWriter, compress
+
+# shiv's own limit, the kernel truncates longer shebang lines
+MAX_SHEBANG = 128
+MAIN_PY = "# -*- coding: utf-8 -*-\nimport _bootstrap\n_bootstrap.bootstrap()\n"
+
+_GENERATED_MODE = stat.S_IFREG | 0o644
+PRUNED_DIRS = frozenset(["test", "tests"])
+
+# run by the target interpreter. The pycs have to be hash based, shiv doesn't keep the mtimes when extracting. ddir
+# keeps the staging directory out of them, so they are the same on every build. force replaces the timestamp based
+# pycs pip already wrote when staging, compileall would otherwise consider them up to date
+_PRECOMPILE = """
+import compileall, py_compile, sys
+for directory in sys.argv[1:]:
+    compileall.compile_dir(
+        directory, ddir="site-packages", quiet=2, workers=0, force=True,
+        invalidation_mode=py_compile.PycInvalidationMode.CHECKED_HASH,
+    )
+print(sys.implementation.cache_tag)
+"""
+
+# shiv options that only change what goes into environment.json
+_FLAGS: Dict[str, Tuple[str, bool]] = {
+    "--compressed": ("compressed", True),
+    "--uncompressed": ("compressed", False),
+    "--compile-pyc": ("compile_pyc", True),
+    "-E": ("extend_pythonpath", True),
+    "--extend-pythonpath": ("extend_pythonpath", True),
+    "--no-modify": ("no_modify", True),
+}
+
+
+@dataclass
+class ZipappOptions:
+    compressed: bool = True
+    compile_pyc: bool = False
+    extend_pythonpath: bool = False
+    no_modify: bool = False
+    root: Optional[str] = None
+
+
+def parse_extra_args(extra_args: Optional[str]) -> ZipappOptions:
+    opts = ZipappOptions()
+    # the pip options were used when staging the dependencies
+    args = split_pip_args(extra_args)[1]
+    while args:
+        arg = args.pop(0)
+        name, eq, value = arg.partition("=")
+        if name == "--root":
+            if not eq:
+                if not args:
+                    raise VulcanConfigError("shiv option --root needs a value")
+                value = args.pop(0)
+            opts.root = value
+        elif arg in _FLAGS:
+            setattr(opts, *_FLAGS[arg])
+        elif arg != "--reproducible":  # native builds always are
+            raise VulcanConfigError(
+                f"shiv option {arg!r} is not supported by the native backend, build with --shiv-backend shiv"
+            )
+    return opts
+
+
+def build_timestamp() -> int:
+    return int(os.environ.get(SOURCE_DATE_EPOCH_ENV, SOURCE_DATE_EPOCH_DEFAULT))
+
+
+def _read_and_compress(name: str, path: Path, compressed: bool) -> Member:
+    st = path.stat()
+    return compress(name, path.read_bytes(), stat.S_IMODE(st.st_mode) | stat.S_IFMT(st.st_mode), compressed)
+
+
+def precompile(interpreter: Optional[str], sources: List[Path]) -> str:
+    "Compile everything in sources with the interpreter the executable will run with, and return its cache tag"
+    cmd = shlex.split(interpreter) if interpreter else [sys.executable]
+    try:
+        output = check_output([*cmd, "-c", _PRECOMPILE, *map(str, sources)])
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise VulcanConfigError(f"could not precompile with {' '.join(cmd)}: {e}") from e
+    return output.split()[-1]
+
+
+def _include(relative: Path, prune: bool, pyc_tag: Optional[str]) -> bool:
+    directories = relative.parts[:-1]
+    if prune and not PRUNED_DIRS.isdisjoint(directories):
+        return False
+    if relative.suffix == ".pyc":
+        # only the ones compiled for the target interpreter at build time
+        return pyc_tag is not None and directories[-1:] == ("__pycache__",) and f".{pyc_tag}." in relative.name
+    return not (prune and "__pycache__" in directories)
+
+
+def site_packages_files(
+    sources: List[Path], prune: bool = False, pyc_tag: Optional[str] = None
+) -> List[Tuple[str, Path]]:
+    """
+    (archive name, path) of everything to put in the archive, in the same order as shiv. By default that is the same
+    files as shiv too, prune leaves out test directories and pyc_tag includes the pycs for that interpreter.
+    """
+    members = []
+    for source in sources:
+        for path in sorted(source.rglob("*"), key=str):
+            if path.is_dir() or not _include(path.relative_to(source), prune, pyc_tag):
+                continue
+            members.append((f"site-packages/{path.relative_to(source).as_posix()}", path))
+    return members
+
+
+def resolve_entry_point(app: ShivOpts, sources: List[Path]) -> Tuple[Optional[str], Optional[str]]:
+    "(entry_point, console_script) as shiv puts them in environment.json"
+    if app.entry_point is not None or app.console_script is None:
+        return app.entry_point, app.console_script
+    try:
+        # shiv nulls the console script once it has the callable, so the bootstrap leaves sys.argv alone
+        return find_entry_point(sources, app.console_script), None
+    except KeyError:
+        if not console_script_exists(sources, app.console_script):
+            raise VulcanConfigError(f"no console_script {app.console_script!r} in the site-packages") from None
+        return None, app.console_script
+
+
+def build_zipapp(app: ShivOpts, sources: List[Path], output: Path, jobs: Optional[int] = None) -> None:
+    """
+    Build the shiv executable for app from the site-packages directories in sources, using up to `jobs` threads to
+    read and compress files.
+    """
+    opts = parse_extra_args(app.extra_args)
+    interpreter = app.interpreter or get_interpreter_path()
+    if len(interpreter) > MAX_SHEBANG:
+        raise VulcanConfigError(f"interpreter path is too long for a shebang: {interpreter}")
+    entry_point, console_script = resolve_entry_point(app, sources)
+    pyc_tag = precompile(app.interpreter, sources) if app.precompile else None
+    timestamp = build_timestamp()
+    jobs = jobs or os.cpu_count() or 1
+    # shiv hashes the site-packages contents for the build id, which names the directory the app is extracted to
+    contents = hashlib.sha256()
+    hashes: Dict[str, str] = {}
+
+    with output.open("wb") as fp:
+        fp.write(b"#!" + interpreter.encode() + b"\n")
+        archive = ZipWriter(fp, timestamp)
+        with ThreadPoolExecutor(jobs) as pool:
+            # bounded, so memory stays at a few files per thread rather than the whole compressed site-packages
+            pending: Deque[Future[Member]] = deque()
+
+            def write_next() -> None:
+                member = pending.popleft().result()
+                contents.update(member.name.encode() + b"\0" + bytes.fromhex(member.sha256))
+                if opts.no_modify and member.name.endswith(".py"):
+                    hashes[member.name.replace("site-packages/", "", 1).replace("/", os.sep)] = member.sha256
+                archive.write(member)
+
+            for name, path in site_packages_files(sources, app.prune, pyc_tag):
+                pending.append(pool.submit(_read_and_compress, name, path, opts.compressed))
+                if len(pending) > 4 * jobs:
+                    write_next()
+            while pending:
+                write_next()
+
+        bootstrap = files(shiv.bootstrap)
+        for resource in sorted(bootstrap.iterdir(), key=lambda r: r.name):
+            if resource.is_file():
+                archive.write(
+                    compress(f"_bootstrap/{resource.name}", resource.read_bytes(), _GENERATED_MODE, opts.compressed)
+                )
+
+        env = Environment(
+            built_at=datetime.fromtimestamp(timestamp, timezone.utc).strftime(BUILD_AT_TIMESTAMP_FORMAT),
+            shiv_version=shiv_version,
+            build_id=contents.hexdigest(),
+            # nothing left to compile when extracting
+            compile_pyc=opts.compile_pyc and not app.precompile,
+            entry_point=entry_point,
+            extend_pythonpath=opts.extend_pythonpath,
+            hashes=hashes,
+            no_modify=opts.no_modify,
+            reproducible=True,
+            script=console_script,
+            root=app.extract_root or opts.root,
+        )
+        archive.write(compress("environment.json", env.to_json().encode(), _GENERATED_MODE, opts.compressed))
+        archive.write(compress("__main__.py", MAIN_PY.encode(), _GENERATED_MODE, opts.compressed))
+        archive.close()
+    output.chmod(output.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
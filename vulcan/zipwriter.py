@@ -0,0 +1,165 @@
+"""
+A zip writer for entries that are already compressed, so compressing can happen in other threads or not at all when
+the data comes straight out of another zip.
+"""
+from __future__ import annotations
+import hashlib
+import struct
+import time
+import zlib
+from dataclasses import dataclass
+from typing import IO, List, Optional, Tuple
+
+_ZIP64_LIMIT = 0xFFFFFFFF
+_ZIP64_COUNT_LIMIT = 0xFFFF
+_UTF8_FLAG = 0x800
+_COPY_CHUNK = 1 << 20
+
+
+@dataclass
+class Member:
+    "An entry ready to be written, its data already compressed"
+
+    name: str
+    crc: int
+    size: int
+    data: bytes  # compressed unless method is ZIP_STORED
+    method: int
+    mode: int
+    sha256: str = ""
+    date_time: Optional[Tuple[int, int]] = None  # as dos (date, time), the writer's timestamp if not given
+
+
+@dataclass
+class _CentralEntry:
+    member: Member
+    compressed_size: int
+    offset: int
+
+
+def _dos_date_time(timestamp: int) -> Tuple[int, int]:
+    return dos_date_time(time.gmtime(timestamp)[:6])
+
+
+def dos_date_time(date_time: Tuple[int, ...]) -> Tuple[int, int]:
+    y, m, d, hh, mm, ss = date_time[:6]
+    # the zip format can't go earlier than 1980
+    if y < 1980:
+        y, m, d, hh, mm, ss = 1980, 1, 1, 0, 0, 0
+    return (y - 1980) << 9 | m << 5 | d, hh << 11 | mm << 5 | ss // 2
+
+
+class ZipWriter:
+    """
+    Writes entries whose data has already been compressed, so the compression can happen elsewhere. Offsets count
+    from the start of the file, shebang included, as zipfile and `zip -A` write them.
+    """
+
+    def __init__(self, fp: IO[bytes], timestamp: int) -> None:
+        self._fp = fp
+        self._date, self._time = _dos_date_time(timestamp)
+        self._entries: List[_CentralEntry] = []
+
+    def write(self, member: Member) -> None:
+        self._write_header(member, len(member.data))
+        self._fp.write(member.data)
+        # nothing needs the data anymore, and whole site-packages add up
+        member.data = b""
+
+    def copy(self, member: Member, compressed_size: int, source: IO[bytes]) -> None:
+        "Write member with the next compressed_size bytes of source as its data, a chunk at a time"
+        self._write_header(member, compressed_size)
+        remaining = compressed_size
+        while remaining:
+            chunk = source.read(min(remaining, _COPY_CHUNK))
+            if not chunk:
+                raise EOFError(f"{member.name} is truncated")
+            self._fp.write(chunk)
+            remaining -= len(chunk)
+
+    def _date_time(self, member: Member) -> Tuple[int, int]:
+        return member.date_time or (self._date, self._time)
+
+    def _write_header(self, member: Member, csize: int) -> None:
+        name = member.name.encode()
+        flags = 0 if member.name.isascii() else _UTF8_FLAG
+        offset = self._fp.tell()
+        extra = b""
+        sizes = (csize, member.size)
+        if max(sizes) >= _ZIP64_LIMIT:
+            extra = struct.pack("<HHQQ", 1, 16, member.size, csize)
+            sizes = (_ZIP64_LIMIT, _ZIP64_LIMIT)
+        version = 45 if extra else 20
+        date, time_ = self._date_time(member)
+        header = struct.pack(
+            "<IHHHHHIIIHH",
+            0x04034B50,
+            version,
+            flags,
+            member.method,
+            time_,
+            date,
+            member.crc,
+            *sizes,
+            len(name),
+            len(extra),
+        )
+        self._fp.write(header + name + extra)
+        self._entries.append(_CentralEntry(member, csize, offset))
+
+    def close(self) -> None:
+        cd_offset = self._fp.tell()
+        for entry in self._entries:
+            self._fp.write(self._central_header(entry))
+        cd_size = self._fp.tell() - cd_offset
+        count = len(self._entries)
+        if count > _ZIP64_COUNT_LIMIT or max(cd_offset, cd_size) >= _ZIP64_LIMIT:
+            zip64_offset = self._fp.tell()
+            self._fp.write(struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0, count, count, cd_size, cd_offset))
+            self._fp.write(struct.pack("<IIQI", 0x07064B50, 0, zip64_offset, 1))
+            count = min(count, _ZIP64_COUNT_LIMIT)
+            cd_size, cd_offset = min(cd_size, _ZIP64_LIMIT), min(cd_offset, _ZIP64_LIMIT)
+        self._fp.write(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, count, count, cd_size, cd_offset, 0))
+
+    def _central_header(self, entry: _CentralEntry) -> bytes:
+        member = entry.member
+        name = member.name.encode()
+        flags = 0 if member.name.isascii() else _UTF8_FLAG
+        # the zip64 extra only holds the fields that overflowed, uncompressed size first
+        overflowed = [value for value in (member.size, entry.compressed_size, entry.offset) if value >= _ZIP64_LIMIT]
+        extra = struct.pack(f"<HH{len(overflowed)}Q", 1, 8 * len(overflowed), *overflowed) if overflowed else b""
+        csize, size, offset = (min(value, _ZIP64_LIMIT) for value in (entry.compressed_size, member.size, entry.offset))
+        version = 45 if extra else 20
+        date, time_ = self._date_time(member)
+        header = struct.pack(
+            "<IHHHHHHIIIHHHHHII",
+            0x02014B50,
+            3 << 8 | version,  # made on unix, so the modes below mean something
+            version,
+            flags,
+            member.method,
+            time_,
+            date,
+            member.crc,
+            csize,
+            size,
+            len(name),
+            len(extra),
+            0,
+            0,
+            0,
+            member.mode << 16,
+            offset,
+        )
+        return header + name + extra
+
+
+def compress(name: str, data: bytes, mode: int, compressed: bool) -> Member:
+    "The member for data, deflated if compressed"
+    crc = zlib.crc32(data)
+    sha256 = hashlib.sha256(data).hexdigest()
+    if not compressed:
+        return Member(name, crc, len(data), data, 0, mode, sha256)
+    # raw deflate, same as zipfile's default level. zlib lets go of the GIL while it works
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return Member(name, crc, len(data), compressor.compress(data) + compressor.flush(), 8, mode, sha256)